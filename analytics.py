@@ -0,0 +1,435 @@
+"""
+Base d'analyse des sessions de détection (SQLite embarqué).
+
+YoloApp et app.py y écrivent chaque session (image, vidéo, webcam) :
+les détections sont agrégées en mémoire par minute et par classe, puis
+ajoutées en une transaction toutes les quelques secondes, au niveau
+minute et au niveau heure. Les requêtes ne lisent que ces agrégats,
+indexés par source et par temps : les heures entières de la période
+viennent de la table horaire, seuls les bords viennent des minutes —
+quelques millisecondes même sur des mois de données. Le détail ligne
+par ligne reste dans les rapports structurés (reports.py).
+
+Tables (`minute` = minutes depuis l'époque ; début de l'heure pour *_hours) :
+    sessions                    une ligne par session (source, type, début, fin,
+                                totaux, rapport)
+    class_minutes, class_hours  (source, minute, classe) → détections, objets
+                                suivis nouveaux, maximum sur une frame, somme
+                                des confiances
+    frame_minutes, frame_hours  (source, minute) → frames analysées
+
+En ligne de commande :
+    python analytics.py counts --since 7d --bucket hour --class person
+    python analytics.py totals --since 2024-05-01 --source webcam
+    python analytics.py sessions --since 24h
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_DB = BASE_DIR / "analytics" / "analytics.sqlite"
+BUCKETS = {"minute": 1, "hour": 60, "day": 24 * 60}
+METRICS = ("detections", "objects", "peak")
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS class_{level} (
+    source     TEXT NOT NULL,
+    minute     INTEGER NOT NULL,
+    class      TEXT NOT NULL,
+    detections INTEGER NOT NULL,
+    objects    INTEGER NOT NULL,
+    peak       INTEGER NOT NULL,
+    conf_sum   REAL NOT NULL,
+    PRIMARY KEY (source, minute, class)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_class_{level}_time ON class_{level}(minute, class);
+
+CREATE TABLE IF NOT EXISTS frame_{level} (
+    source TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    PRIMARY KEY (source, minute)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_frame_{level}_time ON frame_{level}(minute);
+"""
+LEVELS = ("minutes", "hours")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id         INTEGER PRIMARY KEY,
+    source     TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at   REAL,
+    frames     INTEGER NOT NULL DEFAULT 0,
+    detections INTEGER NOT NULL DEFAULT 0,
+    report     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_time ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_source_time ON sessions(source, started_at);
+""" + "".join(ROLLUP_SCHEMA.format(level=level) for level in LEVELS)
+
+
+# ─────────────────────────────────────────────
+# Base
+# ─────────────────────────────────────────────
+class AnalyticsStore:
+    """
+    Une connexion partagée entre threads (verrou), en mode WAL : l'interface
+    Tkinter et Streamlit peuvent écrire dans la même base en même temps.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def session(self, source: str, kind: str, time_origin: float = 0.0, **kwargs):
+        """
+        Nouvelle session. Les horodatages passés à `write_frame` sont
+        `time_origin + timestamp` : 0 pour des heures de capture (webcam),
+        l'heure de début pour des positions dans une vidéo (index / fps).
+        """
+        return SessionRecorder(self, source, kind, time_origin, **kwargs)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ── requêtes ──────────────────────────────
+    def counts(self, start: float = None, end: float = None, bucket: str = "hour",
+               source: str = None, classes=None, metric: str = "detections"):
+        """
+        Série temporelle [(début du créneau, classe, valeur)], créneaux en heure
+        locale. `metric` : "detections" (somme), "objects" (objets suivis
+        apparus), "peak" (maximum sur une frame).
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"Créneau inconnu : {bucket} (attendu : {', '.join(BUCKETS)})")
+        if metric not in METRICS:
+            raise ValueError(f"Mesure inconnue : {metric} (attendu : {', '.join(METRICS)})")
+        size = BUCKETS[bucket]
+        # Créneaux alignés sur l'heure locale (décalage courant, changement d'heure ignoré)
+        offset = _utc_offset_minutes()
+        # Agrégats horaires utilisables si chaque heure tombe dans un seul créneau
+        hourly = size % 60 == 0 and offset % 60 == 0
+        rollup, params = _rollup("class", start, end, source, classes, hourly)
+        aggregate = "MAX(peak)" if metric == "peak" else f"SUM({metric})"
+        rows = self._query(
+            f"SELECT ((minute + ?) / ?) * ? - ? AS slot, class, {aggregate} "
+            f"FROM ({rollup}) GROUP BY slot, class ORDER BY slot, class",
+            (offset, size, size, offset, *params),
+        )
+        return [(slot * 60.0, class_name, value) for slot, class_name, value in rows]
+
+    def totals(self, start: float = None, end: float = None, source: str = None, classes=None):
+        """{classe: {"detections", "objects", "peak", "mean_confidence"}} sur la période."""
+        rollup, params = _rollup("class", start, end, source, classes)
+        rows = self._query(
+            "SELECT class, SUM(detections), SUM(objects), MAX(peak), SUM(conf_sum) "
+            f"FROM ({rollup}) GROUP BY class ORDER BY SUM(detections) DESC",
+            params,
+        )
+        return {
+            class_name: {
+                "detections": detections,
+                "objects": objects,
+                "peak": peak,
+                "mean_confidence": round(conf_sum / detections, 4) if detections else 0.0,
+            }
+            for class_name, detections, objects, peak, conf_sum in rows
+        }
+
+    def frames(self, start: float = None, end: float = None, source: str = None) -> int:
+        rollup, params = _rollup("frame", start, end, source)
+        return self._query(f"SELECT COALESCE(SUM(frames), 0) FROM ({rollup})", params)[0][0]
+
+    def sessions(self, start: float = None, end: float = None, source: str = None, limit: int = 100):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("started_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("started_at < ?")
+            params.append(end)
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._query(
+            "SELECT id, source, kind, started_at, ended_at, frames, detections, report "
+            f"FROM sessions {where} ORDER BY started_at DESC LIMIT ?",
+            (*params, limit),
+        )
+        keys = ("id", "source", "kind", "started_at", "ended_at", "frames", "detections", "report")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def sources(self):
+        return [row[0] for row in self._query("SELECT DISTINCT source FROM sessions ORDER BY source")]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _utc_offset_minutes() -> int:
+    offset = datetime.now().astimezone().utcoffset()
+    return int(offset.total_seconds() // 60) if offset else 0
+
+
+def _time_ranges(start, end, hourly: bool = True):
+    """
+    Découpe [start, end) en [(niveau, première minute, minute de fin exclue)] :
+    les heures entières depuis les agrégats horaires, les bords depuis les
+    minutes. None = pas de borne.
+    """
+    lo = int(start // 60) if start is not None else None
+    hi = int(-(-end // 60)) if end is not None else None
+    if not hourly:
+        return [("minutes", lo, hi)]
+    hour_lo = -(-lo // 60) * 60 if lo is not None else None
+    hour_hi = (hi // 60) * 60 if hi is not None else None
+    if hour_lo is not None and hour_hi is not None and hour_lo >= hour_hi:
+        return [("minutes", lo, hi)]
+    ranges = [("hours", hour_lo, hour_hi)]
+    if lo is not None and lo < hour_lo:
+        ranges.append(("minutes", lo, hour_lo))
+    if hi is not None and hour_hi < hi:
+        ranges.append(("minutes", hour_hi, hi))
+    return ranges
+
+
+def _rollup(table: str, start, end, source, classes=None, hourly: bool = True):
+    """Sous-requête (UNION ALL) sur les agrégats couvrant [start, end), filtrée."""
+    parts, params = [], []
+    for level, lo, hi in _time_ranges(start, end, hourly):
+        clauses = []
+        if lo is not None:
+            clauses.append("minute >= ?")
+            params.append(lo)
+        if hi is not None:
+            clauses.append("minute < ?")
+            params.append(hi)
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        if classes:
+            clauses.append(f"class IN ({', '.join('?' * len(classes))})")
+            params.extend(classes)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        parts.append(f"SELECT * FROM {table}_{level}{where}")
+    return " UNION ALL ".join(parts), params
+
+
+# ─────────────────────────────────────────────
+# Enregistrement d'une session
+# ─────────────────────────────────────────────
+class SessionRecorder:
+    """
+    Agrège les détections d'une session par minute et par classe, et les
+    ajoute à la base toutes les `flush_interval` secondes (une transaction).
+    Les totaux de la session sont mis à jour à chaque vidage : une session
+    interrompue sans `close()` (page Streamlit rechargée) reste exploitable.
+    """
+
+    def __init__(self, store: AnalyticsStore, source: str, kind: str, time_origin: float = 0.0,
+                 flush_interval: float = 5.0):
+        self.store = store
+        self.source = source
+        self.kind = kind
+        self.time_origin = time_origin
+        self.flush_interval = flush_interval
+        self.frames = 0
+        self.detections = 0
+        self.report = None
+
+        self._lock = threading.Lock()
+        self._classes = {}  # (minute, classe) → [détections, objets, pic, somme des confiances]
+        self._frames = defaultdict(int)  # minute → frames
+        self._seen_tracks = set()
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self.id = store._execute(
+            "INSERT INTO sessions (source, kind, started_at) VALUES (?, ?, ?)",
+            (source, kind, time.time()),
+        ).lastrowid
+
+    def write_frame(self, timestamp: float, names, xyxy, conf, cls, track_ids=None):
+        """Détections d'une frame (tableaux NumPy, cf. detections.result_arrays)."""
+        minute = int((self.time_origin + timestamp) // 60)
+        per_class = defaultdict(lambda: [0, 0, 0.0])  # détections, nouveaux objets, confiances
+        for i in range(len(cls)):
+            entry = per_class[names[int(cls[i])]]
+            entry[0] += 1
+            entry[2] += float(conf[i])
+            if track_ids is not None and int(track_ids[i]) not in self._seen_tracks:
+                self._seen_tracks.add(int(track_ids[i]))
+                entry[1] += 1
+
+        with self._lock:
+            self.frames += 1
+            self.detections += len(cls)
+            self._frames[minute] += 1
+            for class_name, (count, new_objects, conf_sum) in per_class.items():
+                totals = self._classes.setdefault((minute, class_name), [0, 0, 0, 0.0])
+                totals[0] += count
+                totals[1] += new_objects
+                totals[2] = max(totals[2], count)
+                totals[3] += conf_sum
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def write_result(self, timestamp: float, res, track_ids=None):
+        """Raccourci pour un Results Ultralytics."""
+        from detections import result_arrays
+
+        xyxy, conf, cls = result_arrays(res)
+        self.write_frame(timestamp, res.names, xyxy, conf, cls, track_ids)
+
+    def flush(self):
+        with self._lock:
+            classes, self._classes = self._classes, {}
+            frames, self._frames = self._frames, defaultdict(int)
+            totals = (time.time(), self.frames, self.detections, self.report, self.id)
+            self._last_flush = time.monotonic()
+        # Même agrégation au niveau heure (début de l'heure en minutes)
+        hours = {}
+        for (minute, class_name), (count, new_objects, peak, conf_sum) in classes.items():
+            totals_h = hours.setdefault((minute // 60 * 60, class_name), [0, 0, 0, 0.0])
+            totals_h[0] += count
+            totals_h[1] += new_objects
+            totals_h[2] = max(totals_h[2], peak)
+            totals_h[3] += conf_sum
+        frame_hours = defaultdict(int)
+        for minute, count in frames.items():
+            frame_hours[minute // 60 * 60] += count
+
+        store = self.store
+        with store._lock:
+            conn = store._conn
+            for level, class_rows, frame_rows in (("minutes", classes, frames),
+                                                  ("hours", hours, frame_hours)):
+                conn.executemany(
+                    f"INSERT INTO class_{level} VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(source, minute, class) DO UPDATE SET "
+                    "detections = detections + excluded.detections, "
+                    "objects = objects + excluded.objects, "
+                    "peak = MAX(peak, excluded.peak), "
+                    "conf_sum = conf_sum + excluded.conf_sum",
+                    [(self.source, minute, class_name, *values)
+                     for (minute, class_name), values in class_rows.items()],
+                )
+                conn.executemany(
+                    f"INSERT INTO frame_{level} VALUES (?, ?, ?) "
+                    "ON CONFLICT(source, minute) DO UPDATE SET frames = frames + excluded.frames",
+                    [(self.source, minute, count) for minute, count in frame_rows.items()],
+                )
+            conn.execute(
+                "UPDATE sessions SET ended_at = ?, frames = ?, detections = ?, report = ? WHERE id = ?",
+                totals,
+            )
+            conn.commit()
+
+    def close(self, report=None):
+        if self._closed:
+            return
+        self._closed = True
+        if report is not None:
+            self.report = str(report)
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ─────────────────────────────────────────────
+# Ligne de commande
+# ─────────────────────────────────────────────
+def parse_time(value: str):
+    """"7d", "12h", "30m" (il y a…) ou date/heure ISO locale → horodatage."""
+    if value is None:
+        return None
+    units = {"m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requêtes sur la base d'analyse des détections.")
+    parser.add_argument("command", choices=["counts", "totals", "sessions", "sources"])
+    parser.add_argument("--db", default=str(DEFAULT_DB))
+    parser.add_argument("--since", default=None, help="Début : 7d, 12h, 30m ou date ISO.")
+    parser.add_argument("--until", default=None, help="Fin (exclue) : même format.")
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--class", dest="classes", action="append", default=None,
+                        help="Classe à garder (répétable).")
+    parser.add_argument("--bucket", default="hour", choices=list(BUCKETS))
+    parser.add_argument("--metric", default="detections", choices=list(METRICS))
+    parser.add_argument("--json", action="store_true", help="Sortie JSON.")
+    args = parser.parse_args(argv)
+
+    store = AnalyticsStore(args.db)
+    start, end = parse_time(args.since), parse_time(args.until)
+    t0 = time.perf_counter()
+    if args.command == "counts":
+        rows = store.counts(start, end, args.bucket, args.source, args.classes, args.metric)
+        result = [{"time": _format_time(slot), "class": c, args.metric: v} for slot, c, v in rows]
+    elif args.command == "totals":
+        result = {"frames": store.frames(start, end, args.source),
+                  "classes": store.totals(start, end, args.source, args.classes)}
+    elif args.command == "sessions":
+        result = store.sessions(start, end, args.source)
+    else:
+        result = store.sources()
+    elapsed_ms = 1000.0 * (time.perf_counter() - t0)
+    store.close()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+    if args.command == "counts":
+        for row in result:
+            print(f"{row['time']}  {row['class']:<16} {row[args.metric]}")
+    elif args.command == "totals":
+        print(f"Frames analysées : {result['frames']}")
+        for class_name, info in result["classes"].items():
+            print(f"- {class_name} : {info['detections']} détections, {info['objects']} objets suivis, "
+                  f"max {info['peak']} par frame, confiance moyenne {info['mean_confidence']:.3f}")
+    elif args.command == "sessions":
+        for s in result:
+            print(f"#{s['id']} {_format_time(s['started_at'])} → {_format_time(s['ended_at'])}  "
+                  f"{s['kind']:<7} {s['source']}  {s['frames']} frames, {s['detections']} détections")
+    else:
+        print("\n".join(result))
+    print(f"({elapsed_ms:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+API HTTP de détection (FastAPI, asyncio) — même détecteur que l'interface graphique.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+    python api.py
+
+Routes :
+    POST /detect          une image (champ "file")
+    POST /detect/batch    plusieurs images (champ "files")
+    POST /jobs/video      dépôt d'une vidéo → identifiant de tâche
+    GET  /jobs/{job_id}   avancement et résultats d'une tâche vidéo
+    GET  /health          état du service
+    GET  /metrics         compteurs au format texte Prometheus
+
+Les images de requêtes concurrentes sont regroupées en lots (fenêtre de
+quelques millisecondes). Au-delà de API_MAX_QUEUE images en attente, les
+nouvelles requêtes sont refusées avec un 429. Tant que le modèle se charge,
+/health répond "starting" et les détections un 503.
+
+Une tâche vidéo soumet ses frames d'avance (API_VIDEO_READAHEAD) pour que
+le batcher en fasse des lots complets. Les résultats sont écrits au fil de l'eau dans
+api_jobs/<id>.jsonl (rien n'est gardé en mémoire) ; une tâche terminée est
+oubliée, fichier compris, API_JOB_TTL_S secondes après sa fin.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import PlainTextResponse
+
+from detections import result_to_dicts
+from detector import load_detector
+from metrics import REGISTRY
+
+MAX_BATCH = int(os.environ.get("API_MAX_BATCH", "8"))
+BATCH_WINDOW_MS = float(os.environ.get("API_BATCH_WINDOW_MS", "10"))
+MAX_QUEUE = int(os.environ.get("API_MAX_QUEUE", "64"))
+JOB_TTL_S = float(os.environ.get("API_JOB_TTL_S", "3600"))
+# Frames d'une tâche vidéo soumises d'avance (défaut : deux lots)
+VIDEO_READAHEAD = int(os.environ.get("API_VIDEO_READAHEAD", str(2 * MAX_BATCH)))
+JOBS_DIR = Path(__file__).resolve().parent / "api_jobs"
+UPLOAD_CHUNK = 1 << 20
+
+
+# ─────────────────────────────────────────────
+# Regroupement des requêtes en lots
+# ─────────────────────────────────────────────
+class AsyncBatcher:
+    """
+    File bornée d'images à analyser. Une tâche de fond prend jusqu'à
+    `max_batch` images arrivées dans la même fenêtre et les envoie au
+    modèle en un appel, exécuté dans un thread pour ne pas bloquer la boucle.
+    """
+
+    def __init__(self, model, max_batch: int, window_ms: float, max_queue: int):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.stats = Counter()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def submit_nowait(self, image):
+        """Requête HTTP : refusée tout de suite si la file est pleine (429)."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image, future))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise HTTPException(status_code=429, detail="Service saturé, réessayez plus tard.")
+        return future
+
+    async def submit(self, image):
+        """Tâche interne (vidéo) : attend une place au lieu d'être refusée."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            images = [image for image, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    None, lambda: self.model(images, verbose=False)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["images"] += len(images)
+            self.stats["inference_ms_total"] += int(1000 * (time.perf_counter() - t0))
+            for (_, future), res in zip(batch, results):
+                if not future.done():
+                    future.set_result(res)
+
+
+# ─────────────────────────────────────────────
+# Application
+# ─────────────────────────────────────────────
+state = {"model": None, "batcher": None, "error": None, "jobs": {}, "started_at": time.time()}
+# Tâches de fond : une référence est gardée jusqu'à leur fin (sinon le
+# ramasse-miettes peut les détruire en cours de route)
+background_tasks = set()
+
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def load_model():
+    # Chargement du modèle hors de la boucle d'événements : /health répond pendant ce temps
+    loop = asyncio.get_running_loop()
+    try:
+        model = await loop.run_in_executor(None, load_detector)
+    except Exception as e:
+        state["error"] = str(e)
+        return
+    state["model"] = model
+    state["batcher"] = AsyncBatcher(model, MAX_BATCH, BATCH_WINDOW_MS, MAX_QUEUE)
+    state["batcher"].start()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    JOBS_DIR.mkdir(exist_ok=True)
+    spawn(load_model())
+    yield
+    if state["batcher"] is not None:
+        await state["batcher"].stop()
+
+
+def ready_batcher():
+    """Le batcher, ou 503 tant que le modèle n'est pas chargé."""
+    if state["batcher"] is None:
+        detail = f"Modèle indisponible : {state['error']}" if state["error"] else "Modèle en cours de chargement."
+        raise HTTPException(status_code=503, detail=detail)
+    return state["batcher"]
+
+
+app = FastAPI(title="YOLOv8 – API de détection", lifespan=lifespan)
+
+
+async def decode_upload(upload: UploadFile):
+    data = await upload.read()
+    image = await asyncio.get_running_loop().run_in_executor(
+        None, cv2.imdecode, np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR
+    )
+    if image is None:
+        raise HTTPException(status_code=400, detail=f"Image illisible : {upload.filename}")
+    return image
+
+
+def format_result(res, filename: str):
+    detections = result_to_dicts(res)
+    return {
+        "filename": filename,
+        "detections": detections,
+        "counts": dict(Counter(d["class"] for d in detections)),
+    }
+
+
+@app.post("/detect")
+async def detect(file: UploadFile = File(...)):
+    batcher = ready_batcher()
+    image = await decode_upload(file)
+    res = await batcher.submit_nowait(image)
+    return format_result(res, file.filename)
+
+
+@app.post("/detect/batch")
+async def detect_batch(files: List[UploadFile] = File(...)):
+    batcher = ready_batcher()
+    images = [await decode_upload(f) for f in files]
+    if batcher.queue.maxsize - batcher.queue.qsize() < len(images):
+        batcher.stats["rejected"] += 1
+        raise HTTPException(status_code=429, detail="Service saturé, réessayez plus tard.")
+    futures = [batcher.submit_nowait(image) for image in images]
+    results = await asyncio.gather(*futures)
+    return [format_result(res, f.filename) for f, res in zip(files, results)]
+
+
+# ─────────────────────────────────────────────
+# Tâches vidéo
+# ─────────────────────────────────────────────
+def evict_finished_jobs():
+    """Oublie les tâches terminées depuis plus de JOB_TTL_S secondes (et leurs résultats)."""
+    now = time.time()
+    expired = [job_id for job_id, job in state["jobs"].items()
+               if job.get("finished_at") and now - job["finished_at"] > JOB_TTL_S]
+    for job_id in expired:
+        job = state["jobs"].pop(job_id)
+        Path(job["results_path"]).unlink(missing_ok=True)
+
+
+async def run_video_job(job_id: str, path: Path, frame_stride: int):
+    job = state["jobs"][job_id]
+    loop = asyncio.get_running_loop()
+    cap = cv2.VideoCapture(str(path))
+    results = None
+    pending = []
+    try:
+        results = open(job["results_path"], "w", encoding="utf-8")
+        if not cap.isOpened():
+            raise RuntimeError("vidéo illisible")
+        job["total_frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        async def flush():
+            # Résultats attendus ensemble, écrits dans l'ordre des frames
+            indices = [index for index, _ in pending]
+            batch = await asyncio.gather(*(task for _, task in pending))
+            pending.clear()
+            for index, res in zip(indices, batch):
+                detections = result_to_dicts(res)
+                job["counts"].update(d["class"] for d in detections)
+                results.write(json.dumps({
+                    "index": index,
+                    "timestamp": round(index / fps, 3) if fps else None,
+                    "detections": detections,
+                }, ensure_ascii=False) + "\n")
+            job["frames_analysed"] += len(batch)
+
+        index = 0
+        job["status"] = "running"
+        while True:
+            # Lecture dans un thread : le décodage ne bloque pas les autres requêtes
+            ret, frame = await loop.run_in_executor(None, cap.read)
+            if not ret:
+                break
+            if index % frame_stride == 0:
+                # Soumission sans attendre le résultat : le batcher peut remplir
+                # ses lots pendant que les frames suivantes sont décodées
+                pending.append((index, asyncio.ensure_future(state["batcher"].submit(frame))))
+                if len(pending) >= VIDEO_READAHEAD:
+                    await flush()
+            index += 1
+            job["frames_read"] = index
+        await flush()
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+    finally:
+        for _, task in pending:
+            task.cancel()
+        cap.release()
+        if results is not None:
+            results.close()
+        path.unlink(missing_ok=True)
+        job["finished_at"] = time.time()
+
+
+@app.post("/jobs/video", status_code=202)
+async def create_video_job(file: UploadFile = File(...), frame_stride: int = Query(1, ge=1)):
+    ready_batcher()
+    evict_finished_jobs()
+    job_id = uuid.uuid4().hex
+    suffix = Path(file.filename or "").suffix or ".mp4"
+    fd, tmp_name = tempfile.mkstemp(suffix=suffix)
+    # Écriture par morceaux : la vidéo n'est jamais entièrement en mémoire
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK):
+            out.write(chunk)
+
+    state["jobs"][job_id] = {
+        "status": "queued",
+        "filename": file.filename,
+        "frames_read": 0,
+        "frames_analysed": 0,
+        "counts": Counter(),
+        "results_path": str(JOBS_DIR / f"{job_id}.jsonl"),
+        "created_at": time.time(),
+    }
+    spawn(run_video_job(job_id, Path(tmp_name), frame_stride))
+    return {"job_id": job_id}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, include_frames: bool = False):
+    evict_finished_jobs()
+    job = state["jobs"].get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tâche inconnue.")
+    payload = {k: v for k, v in job.items() if k != "results_path"}
+    payload["counts"] = dict(job["counts"])
+    if include_frames:
+        # Relu depuis le disque, hors de la boucle d'événements
+        text = await asyncio.get_running_loop().run_in_executor(
+            None, Path(job["results_path"]).read_text, "utf-8"
+        )
+        payload["frames"] = [json.loads(line) for line in text.splitlines() if line]
+    return payload
+
+
+# ─────────────────────────────────────────────
+# Supervision
+# ─────────────────────────────────────────────
+@app.get("/health")
+async def health():
+    batcher = state["batcher"]
+    if batcher is not None:
+        status = "ok"
+    else:
+        status = "error" if state["error"] else "starting"
+    return {
+        "status": status,
+        "error": state["error"],
+        "model": repr(state["model"]),
+        "queue_depth": batcher.queue.qsize() if batcher else 0,
+        "queue_capacity": MAX_QUEUE,
+        "uptime_s": round(time.time() - state["started_at"], 1),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    batcher = state["batcher"]
+    stats = batcher.stats if batcher else Counter()
+    jobs = Counter(job["status"] for job in state["jobs"].values())
+    lines = [
+        f"yolo_api_images_total {stats['images']}",
+        f"yolo_api_batches_total {stats['batches']}",
+        f"yolo_api_rejected_total {stats['rejected']}",
+        f"yolo_api_inference_seconds_total {stats['inference_ms_total'] / 1000.0}",
+        f"yolo_api_queue_depth {batcher.queue.qsize() if batcher else 0}",
+    ]
+    lines += [f'yolo_api_jobs{{status="{status}"}} {count}' for status, count in jobs.items()]
+    # Métriques communes (metrics.py) des autres boucles de ce processus
+    return "\n".join(lines) + "\n" + REGISTRY.render()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=8000)
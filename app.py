@@ -1,11 +1,36 @@
 import streamlit as st
-from ultralytics import YOLO
 from PIL import Image
-import cv2
-import tempfile
+import json
+import numpy as np
+import os
+import threading
 import time
 from pathlib import Path
-from collections import Counter
+from collections import Counter, deque
+
+from analytics import AnalyticsStore
+from batching import make_batch_sizer, predict_batched, read_frames
+from clips import ClipRecorder
+from cache import DetectionCache, cached_predict, weights_fingerprint
+from decoder import ThreadedDecoder
+from cascade import stream_detector
+from detector import MODEL_ZOO, BackgroundDetector, detector_config_from_env
+from governor import QualityGovernor
+from live import LiveSession
+from metrics import LoopMetrics, start_from_env as start_metrics
+from render import FrameRenderer
+from reports import DetectionReportWriter, available_formats as report_formats, new_report_path
+from scheduler import InferenceScheduler
+from streams import POLICIES as STREAM_POLICIES, StreamManager
+from tiling import SlicedDetector
+from tracker import IoUTracker
+from video_jobs import VideoJob, store_upload
+from zones import RoiDetector, ZoneSet, load_zones
+
+# Largeur des frames vidéo/webcam envoyées au navigateur
+STREAM_DISPLAY_WIDTH = 960
+# Aperçu pendant l'analyse d'une vidéo : images envoyées par seconde au plus
+ANALYSIS_PREVIEW_FPS = 5
 
 # Configuration de la page
 st.set_page_config(
@@ -47,17 +72,226 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Chargement du modèle (mis en cache pour la performance)
+# Chargement du modèle (mis en cache pour la performance, un par choix de modèles)
+@st.cache_resource
+def load_model(weights, cascade):
+    # Backend choisi par configuration (PyTorch, ONNX Runtime, OpenVINO).
+    # Chargement et chauffe en arrière-plan : la page s'affiche tout de suite,
+    # seule la première détection attend si le modèle n'est pas encore prêt.
+    return BackgroundDetector(weights=weights, cascade=cascade).start()
+
+@st.cache_resource
+def weights_fingerprint_for(weights, cascade):
+    """Empreinte des poids, une par choix de modèles (le modèle lui-même n'est pas hachable)."""
+    return weights_fingerprint(load_model(weights, cascade))
+
+@st.cache_resource
+def load_detection_cache():
+    """Cache disque des détections sur image, partagé par toutes les sessions."""
+    return DetectionCache(Path(__file__).resolve().parent / "cache" / "detections.sqlite")
+
 @st.cache_resource
-def load_model():
-    return YOLO("yolov8n.pt")
+def load_analytics():
+    """Base d'analyse (comptes par minute et par classe), partagée avec detect_yolo.py."""
+    return AnalyticsStore(Path(__file__).resolve().parent / "analytics" / "analytics.sqlite")
 
-try:
-    model = load_model()
-except Exception as e:
-    st.error(f"Erreur lors du chargement du modèle : {e}")
+# Modèle du registre (detector.MODEL_ZOO) ; cascade : un plus grand modèle
+# revérifie les détections douteuses (voir cascade.py)
+with st.sidebar.expander("🧠 Modèle"):
+    model_config = detector_config_from_env()
+    model_options = list(dict.fromkeys([*MODEL_ZOO, model_config["weights"]]))
+    model_weights = st.selectbox("Modèle", model_options,
+                                 index=model_options.index(model_config["weights"]))
+    cascade_options = ["Aucune", *(m for m in MODEL_ZOO if m != model_weights)]
+    cascade_choice = st.selectbox(
+        "Vérification des détections douteuses par", cascade_options,
+        index=cascade_options.index(model_config["cascade"]) if model_config["cascade"] in cascade_options else 0,
+        help="Le petit modèle analyse chaque frame ; le grand ne revoit que les régions douteuses.",
+    )
+model_choice = (model_weights, "" if cascade_choice == "Aucune" else cascade_choice)
+model = load_model(*model_choice)
+if model.error is not None:
+    st.error(f"Erreur lors du chargement du modèle : {model.error}")
     st.stop()
 
+detection_cache = load_detection_cache()
+analytics = load_analytics()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Métriques partagées par toutes les sessions (voir metrics.py)."""
+    return start_metrics()
+
+start_metrics_endpoint()
+
+@st.cache_resource
+def model_lock():
+    """Flux en direct de toutes les sessions : un seul appel au modèle à la fois."""
+    return threading.Lock()
+
+# ─────────────────────────────────────────────
+# Flux en direct (webcam, lecture d'une vidéo) : un LiveSession par session,
+# analysé en arrière-plan ; la page tire la dernière image en JPEG
+# ─────────────────────────────────────────────
+def stream_delivery_options(key):
+    """Taille, qualité et cadence des images envoyées au navigateur."""
+    with st.expander("📡 Envoi au navigateur"):
+        return {
+            "display_width": st.select_slider(
+                "Largeur des images", [480, 640, 960, 1280], value=640, key=f"width_{key}"
+            ),
+            "jpeg_quality": st.slider("Qualité JPEG", 40, 95, 75, key=f"quality_{key}"),
+            "refresh_fps": st.slider("Images affichées par seconde", 1, 15, 8, key=f"refresh_{key}"),
+        }
+
+def make_clip_recorder(source, clips, **options):
+    """Enregistreur de clips sur événement (réglages de la barre latérale), ou None."""
+    if not clips or not clips["rules"]:
+        return None
+    return ClipRecorder(clips["rules"], source=source, **clips["recording"], **options)
+
+def show_clips(paths):
+    """Clips enregistrés : lecture et téléchargement."""
+    if not paths:
+        return
+    st.markdown(f"**🎞️ Clips enregistrés ({len(paths)}) :**")
+    for path in paths:
+        with st.expander(path.name):
+            st.video(str(path))
+            st.download_button("📥 Télécharger", data=path.read_bytes(), file_name=path.name,
+                               key=f"clip_{path.name}")
+
+def start_live(source, label, scheduler=None, target_fps=None, display_width=640,
+               jpeg_quality=75, refresh_fps=8, clips=None):
+    """Démarre le flux de cette session (le précédent est arrêté)."""
+    stop_live()
+    st.session_state.pop("live_error", None)
+    scheduler = InferenceScheduler(**scheduler) if scheduler else None
+    governor = QualityGovernor(target_fps=target_fps, scheduler=scheduler) if target_fps else None
+    kind = "webcam" if isinstance(source, int) else "video"
+    # Cascade : vérifications propres à ce flux (verdicts non partagés entre sessions)
+    live_model = stream_detector(model)
+    if zone_set is not None:
+        live_model = RoiDetector(live_model, zone_set)
+    try:
+        st.session_state["live"] = LiveSession(
+            live_model, source, display_width=display_width, jpeg_quality=jpeg_quality,
+            scheduler=scheduler, governor=governor, model_lock=model_lock(),
+            # Lecture tirée par la page : arrêt si elle ne tire plus pendant 5 rafraîchissements
+            idle_timeout=max(10.0, 5.0 / refresh_fps),
+            analytics=analytics.session(label, kind), recorder=make_clip_recorder(label, clips),
+            metrics_source=f"streamlit-live-{label}",
+        ).start()
+    except RuntimeError as e:
+        st.session_state["live_error"] = str(e)
+
+def stop_live():
+    live = st.session_state.get("live")
+    if live is not None:
+        live.stop()
+
+def live_view():
+    """Fragment relancé à la cadence choisie : seule cette partie de la page est recalculée."""
+    live = st.session_state.get("live")
+    if live is None:
+        return
+    if not live.running:
+        # Source épuisée, erreur, inactivité : toute la page se met à jour
+        st.rerun()
+    _, jpeg = live.latest_jpeg()
+    if jpeg is None:
+        st.info("⏳ Démarrage du flux…")
+        return
+    st.image(jpeg, output_format="JPEG", use_container_width=True)
+    snap = live.snapshot()
+    caption = f"{snap['fps']:.1f} frames analysées/s"
+    if "quality" in snap:
+        caption += f" · {snap['quality']}"
+    if "clips" in snap:
+        clips = snap["clips"]
+        caption += f" · {'🔴 enregistrement' if clips['recording'] else 'clips'} : {clips['clips']}"
+    st.caption(caption)
+    if snap["last_counts"]:
+        summary = ", ".join(f"{k}: {v}" for k, v in snap["last_counts"].items())
+        st.info(f"**Détecté :** {summary}")
+    else:
+        st.info("Rien détecté.")
+
+def live_controls(source, label, key, refresh_fps=8, **options):
+    """Boutons Démarrer / Arrêter et affichage du flux de cette session."""
+    live = st.session_state.get("live")
+    mine = live is not None and live.source == source
+    active = mine and live.running
+    col_start, col_stop = st.columns(2)
+    col_start.button("▶️ Démarrer", key=f"start_{key}", on_click=start_live, args=(source, label),
+                     kwargs={"refresh_fps": refresh_fps, **options}, disabled=active)
+    col_stop.button("⏹️ Arrêter", key=f"stop_{key}", on_click=stop_live, disabled=not active)
+    if st.session_state.get("live_error"):
+        st.error(st.session_state["live_error"])
+    if active:
+        st.fragment(live_view, run_every=1.0 / refresh_fps)()
+    elif mine:
+        live.stop("erreur" if live.error else "source terminée")
+        snap = live.snapshot()
+        st.info(f"Flux arrêté ({snap['stop_reason']}).")
+        if snap["error"] is not None:
+            st.error(f"Erreur : {snap['error']}")
+        if snap["class_counts"]:
+            st.markdown("**Détections sur toute la session :**")
+            st.json(snap["class_counts"])
+        if live.recorder is not None:
+            show_clips(live.recorder.clips)
+
+# ─────────────────────────────────────────────
+# Plusieurs flux sur le modèle partagé (streams.StreamManager), un par session
+# ─────────────────────────────────────────────
+def start_streams(sources, max_batch, policy, refresh_fps):
+    """Démarre les flux de cette session (les précédents sont arrêtés)."""
+    stop_streams()
+    # Cascade : vérifications propres à ces flux ; zones et classes de la barre latérale
+    streams_model = stream_detector(model)
+    if zone_set is not None:
+        streams_model = RoiDetector(streams_model, zone_set)
+    st.session_state["streams"] = StreamManager(
+        streams_model, sources, max_batch, policy, model_lock=model_lock(), prefix="streamlit-flux",
+        # Arrêt si la page ne tire plus d'image pendant 5 rafraîchissements
+        idle_timeout=max(10.0, 5.0 / refresh_fps),
+    ).start()
+    st.session_state["stream_renderers"] = {}
+
+def stop_streams():
+    manager = st.session_state.get("streams")
+    if manager is not None:
+        manager.stop()
+
+def streams_view():
+    """Fragment : dernière image analysée et état de chaque flux."""
+    manager = st.session_state.get("streams")
+    if manager is None:
+        return
+    if not manager.running:
+        st.rerun()
+    manager.touch()
+    renderers = st.session_state.setdefault("stream_renderers", {})
+    columns = st.columns(min(2, len(manager.streams)))
+    for i, stream in enumerate(manager.streams):
+        stats = stream.stats()
+        with columns[i % len(columns)]:
+            packet = stream.last_packet
+            if packet is not None:
+                renderer = renderers.setdefault(stream.name, FrameRenderer(width=640))
+                st.image(renderer.render_jpeg(packet.frame, packet.result), output_format="JPEG",
+                         use_container_width=True)
+            elif stats["error"]:
+                st.error(f"{stream.source} : {stats['error']}")
+            else:
+                st.info(f"⏳ {stream.source} : en attente de la première image…")
+            caption = (f"{stream.source} · analysé {stats['inference_fps']} / lu {stats['read_fps']} FPS"
+                       f" · perdues {stats['dropped']} · latence {stats['latency_ms']} ms")
+            if stats["errors"]:
+                caption += f" · ⚠️ {stats['errors']} erreurs ({stats['error']})"
+            st.caption(caption)
+
 # Titre et Introduction
 st.title("🤖 Projet 3 : Exploration IA avec YOLOv8")
 st.markdown("### Détection d'objets en temps réel")
@@ -65,7 +299,64 @@ st.markdown("---")
 
 # Sidebar pour la navigation
 st.sidebar.title("Navigation")
-mode = st.sidebar.radio("Choisir le mode :", ["🖼️ Image", "🎬 Vidéo", "📷 Webcam"])
+mode = st.sidebar.radio("Choisir le mode :", ["🖼️ Image", "🎬 Vidéo", "📷 Webcam", "📡 Multi-flux"])
+
+# Indicateur de chargement du modèle
+if model.ready:
+    st.sidebar.success(f"✅ Modèle prêt (chargé en {model.ready_s:.1f} s)")
+else:
+    st.sidebar.info("⏳ Chargement du modèle en arrière-plan…")
+
+# Zones d'intérêt et classes utiles (vidéo et webcam) : inférence recadrée
+with st.sidebar.expander("🎯 Zones et classes (vidéo, webcam)"):
+    default_zones = load_zones(Path(__file__).resolve().parent / "zones.json")
+    default_classes = default_zones.classes if default_zones and default_zones.classes else []
+    # Liste des classes connue une fois le modèle chargé (pas d'attente ici)
+    class_options = list(model.names.values()) if model.ready else default_classes
+    allowed_classes = st.multiselect(
+        "Classes à détecter (vide = toutes)", class_options, default=default_classes,
+    )
+    if not model.ready:
+        st.caption("Toutes les classes seront proposées une fois le modèle chargé.")
+    zones_text = st.text_area(
+        "Zones (JSON, coordonnées relatives 0–1)",
+        value=json.dumps(
+            {k: v.tolist() for k, v in default_zones.zones.items()} if default_zones else {}
+        ),
+        help='Exemple : {"voie_1": [[0.1, 0.55], [0.45, 0.55], [0.6, 1.0], [0.0, 1.0]]}',
+    )
+    try:
+        zone_set = ZoneSet(json.loads(zones_text or "{}"), allowed_classes)
+    except ValueError as e:
+        st.error(f"Zones invalides : {e}")
+        zone_set = ZoneSet()
+if zone_set.zones or zone_set.classes:
+    stream_model = RoiDetector(model, zone_set)
+else:
+    zone_set, stream_model = None, model
+
+# Clips sur événement : pré-enregistrement en mémoire, clip écrit quand la règle se déclenche
+with st.sidebar.expander("🎞️ Clips sur événement (vidéo, webcam)"):
+    clips_enabled = st.checkbox("Enregistrer un clip quand…")
+    clip_classes = st.multiselect(
+        "…ces classes apparaissent (vide = toutes)", class_options,
+        default=[c for c in ("person",) if c in class_options], disabled=not clips_enabled,
+    )
+    clip_min_count = st.number_input(
+        "…au moins ce nombre à la fois", min_value=1, max_value=100, value=1, disabled=not clips_enabled,
+    )
+    clip_pre_s, clip_post_s = st.slider(
+        "Secondes avant / après l'événement", 0.0, 30.0, (5.0, 5.0), step=1.0, disabled=not clips_enabled,
+    )
+clip_settings = {
+    "rules": [{
+        "name": "_".join(clip_classes) or "objets",
+        "classes": clip_classes,
+        "min_count": int(clip_min_count),
+        "cooldown_s": 10.0,
+    }] if clips_enabled else [],
+    "recording": {"pre_s": clip_pre_s, "post_s": clip_post_s},
+}
 
 st.sidebar.markdown("---")
 st.sidebar.info(
@@ -85,10 +376,47 @@ if mode == "🖼️ Image":
         image = Image.open(uploaded_file)
         st.image(image, caption="Image originale", use_container_width=True)
         
+        # Inférence par tuiles : petits objets sur les grandes images
+        use_tiling = st.checkbox("Analyse par tuiles (petits objets)", value=max(image.size) > 640)
+        col_tile, col_overlap = st.columns(2)
+        with col_tile:
+            tile_size = st.number_input(
+                "Taille des tuiles (px)", min_value=320, max_value=1280, value=640, step=32,
+                disabled=not use_tiling,
+            )
+        with col_overlap:
+            tile_overlap = st.slider(
+                "Recouvrement des tuiles", 0.0, 0.5, 0.2, 0.05, disabled=not use_tiling
+            )
+
         if st.button("Lancer la détection"):
             with st.spinner("Analyse en cours..."):
-                results = model(image)
-                res = results[0]
+                # Même image déjà analysée → résultat repris du cache
+                image_bytes = uploaded_file.getvalue()
+                image_bgr = np.array(image.convert("RGB"))[:, :, ::-1].copy()
+                tiling = (
+                    {"tile_size": int(tile_size), "tile_overlap": float(tile_overlap)}
+                    if use_tiling else {}
+                )
+                image_metrics = LoopMetrics("streamlit-image")
+                t0 = time.perf_counter()
+                weights_hash = weights_fingerprint_for(*model_choice)
+                # Même verrou que les flux en direct (prédicteur partagé)
+                with model_lock():
+                    res, hit = cached_predict(
+                        SlicedDetector(model) if use_tiling else model, detection_cache,
+                        image_bgr, image_bytes, weights_hash,
+                        path=uploaded_file.name, **tiling,
+                    )
+                image_metrics.frame_read()
+                image_metrics.stage("cache" if hit else "inference", time.perf_counter() - t0)
+                if not hit:
+                    image_metrics.frames_inferred()
+                image_metrics.detections(res)
+                with analytics.session(uploaded_file.name, "image") as session:
+                    session.write_result(time.time(), res)
+                if hit:
+                    st.caption("⚡ Résultat repris du cache.")
                 annotated_img = res.plot()
                 st.image(annotated_img, caption="Résultat de la détection", use_container_width=True)
                 
@@ -131,32 +459,128 @@ elif mode == "🎬 Vidéo":
     uploaded_video = st.file_uploader("Choisissez une vidéo...", type=['mp4', 'mov', 'avi', 'mkv'])
     
     if uploaded_video is not None:
-        tfile = tempfile.NamedTemporaryFile(delete=False)
-        tfile.write(uploaded_video.read())
-        video_path = tfile.name
+        # Copie par morceaux dans video_jobs/<empreinte>/ : une seule fois par
+        # fichier, conservée entre les réexécutions de la page et les redémarrages
+        stored = st.session_state.setdefault("stored_videos", {})
+        if uploaded_video.file_id not in stored:
+            uploaded_video.seek(0)
+            stored[uploaded_video.file_id] = store_upload(uploaded_video, Path(uploaded_video.name).suffix)
+        video_path = str(stored[uploaded_video.file_id])
         
         st.video(video_path)
         
+        # Inférence par lots : plusieurs frames par appel au modèle
+        col_auto, col_size = st.columns(2)
+        with col_auto:
+            batch_auto = st.checkbox("Taille de lot automatique", value=True)
+        with col_size:
+            batch_size = st.number_input(
+                "Frames par lot", min_value=1, max_value=64, value=8, disabled=batch_auto
+            )
+        # Parquet proposé seulement si pyarrow est installé
+        report_format = st.selectbox("Format du rapport détaillé", report_formats())
+        # Décodage dans un thread ; aperçu rapide : résolution réduite ou images clés
+        with st.expander("Décodage"):
+            decode_width = st.selectbox(
+                "Largeur de décodage", ["Pleine résolution", 1280, 960, 640],
+                help="Les coordonnées des rapports sont celles de la frame décodée.",
+            )
+            keyframes_only = st.checkbox("Aperçu rapide : images clés seulement")
+
+        # Lecture en direct : analyse en arrière-plan à la cadence de la vidéo
+        with st.expander("▶️ Lecture en direct"):
+            delivery = stream_delivery_options("video")
+            live_controls(video_path, uploaded_video.name, "video", clips=clip_settings, **delivery)
+
+        # Analyse complète hors ligne : segments en parallèle, reprise après interruption
+        with st.expander("Analyse complète (tous les cœurs, reprise possible)"):
+            workers = st.number_input(
+                "Processus", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1
+            )
+            if st.button("Lancer l'analyse complète"):
+                # Même modèle que celui choisi dans la barre latérale
+                job = VideoJob(video_path, workers=int(workers),
+                               model={"weights": model_choice[0], "cascade": model_choice[1]})
+                progress = st.progress(0.0, text="Analyse des segments…")
+                summary = job.run(on_progress=lambda done, total: progress.progress(
+                    done / total, text=f"Segment {done}/{total}"
+                ))
+                progress.progress(1.0, text="Analyse terminée")
+                st.json(summary)
+                st.download_button(
+                    "📥 Télécharger les résultats (JSONL)",
+                    data=job.results_path.read_bytes(),
+                    file_name=f"{Path(uploaded_video.name).stem}_results.jsonl",
+                )
+
         if st.button("Analyser la vidéo"):
             st.warning("L'analyse vidéo peut prendre du temps...")
             
             st_frame = st.empty()
             st_results = st.empty() # Placeholder pour les résultats sous la vidéo
             
-            cap = cv2.VideoCapture(video_path)
+            cap = ThreadedDecoder(
+                video_path,
+                max_width=decode_width if isinstance(decode_width, int) else None,
+                keyframes_only=keyframes_only,
+            )
+            sizer = make_batch_sizer("auto" if batch_auto else batch_size)
+            # Un lot complet reste en vie pendant son affichage
+            cap.reserve(max(sizer.max_batch_size, sizer.batch_size) + 2)
+            renderer = FrameRenderer(width=STREAM_DISPLAY_WIDTH)
+            fps = cap.fps
+            tracker = IoUTracker()
+            # Rapport détaillé écrit au fil de l'eau (une ligne par détection)
+            reports_dir = Path(__file__).resolve().parent / "reports"
+            report_path = new_report_path(reports_dir, "detections", report_format)
+            # Horodatages = position dans la vidéo, comptée à partir de maintenant
+            report = DetectionReportWriter(
+                report_path, fmt=report_format, source=uploaded_video.name, zones=zone_set,
+                analytics=analytics.session(uploaded_video.name, "video", time.time()),
+            )
+            # Fichier : aucune frame sautée dans les clips
+            recorder = make_clip_recorder(uploaded_video.name, clip_settings, fps=fps, block=True)
+            n_frames = 0
+            start = time.time()
+            loop_metrics = LoopMetrics(f"streamlit-{uploaded_video.name}")
             
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                results = model(frame)
-                res = results[0]
-                annotated_frame = res.plot()
+            # Position de chaque frame dans la vidéo (les lots sont lus en avance,
+            # et l'aperçu par images clés saute des frames)
+            positions = deque()
+            last_preview = 0.0
+
+            def decoded_frames():
+                for decoded in read_frames(cap):
+                    positions.append(cap.position)
+                    yield decoded
+
+            def locked_model(frames, **kwargs):
+                # Un lot à la fois sous le verrou partagé : les flux en direct des
+                # autres sessions utilisent le même prédicteur
+                with model_lock():
+                    return stream_model(frames, **kwargs)
+
+            for frame, res in predict_batched(locked_model, decoded_frames(), sizer):
+                position = positions.popleft()
+                loop_metrics.frame_read()
+                loop_metrics.frames_inferred()
+                loop_metrics.detections(res)
+                loop_metrics.stage("inference", sizer.last_per_frame_s)
+                # Suivi : identifiants persistants → objets uniques, pas détections
+                track_ids = tracker.update_from_result(res, position / fps)
+                report.write_result(position, position / fps, res, track_ids)
+                if recorder is not None:
+                    recorder.add(frame, position / fps, res)
+                n_frames += 1
                 
-                # Convertir BGR vers RGB
-                frame_rgb = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-                st_frame.image(frame_rgb, caption="Traitement en cours...", use_container_width=True)
+                # Aperçu limité à ANALYSIS_PREVIEW_FPS images/s, déjà en JPEG : l'analyse
+                # ne paie plus le dessin et l'envoi de chaque frame au navigateur
+                now = time.monotonic()
+                if now - last_preview < 1.0 / ANALYSIS_PREVIEW_FPS:
+                    continue
+                last_preview = now
+                st_frame.image(renderer.render_jpeg(frame, res), caption="Traitement en cours...",
+                               output_format="JPEG", use_container_width=True)
                 
                 # Afficher les résultats du frame courant sous la vidéo
                 boxes = res.boxes
@@ -169,15 +593,43 @@ elif mode == "🎬 Vidéo":
                 else:
                     st_results.info("Rien détecté dans ce cadre.")
             
+            report.close()
+            clip_paths = recorder.close() if recorder is not None else []
+            elapsed = time.time() - start
+            if n_frames:
+                decode = cap.stats()
+                st.caption(
+                    f"{n_frames} frames en {elapsed:.1f} s "
+                    f"({n_frames / elapsed:.1f} FPS, lots de {sizer.batch_size}, "
+                    f"décodage {decode['decode_ms']:.1f} ms/frame en arrière-plan, "
+                    f"attente {decode['consumer_wait_ms']:.1f} ms/frame)"
+                )
+            
+            # Objets uniques sur toute la vidéo (suivi IoU)
+            tracks = tracker.summary(model.names)
+            if tracks:
+                st.markdown("**Objets uniques par classe (temps de présence moyen) :**")
+                col_metrics = st.columns(len(tracks))
+                for idx, (name, info) in enumerate(tracks.items()):
+                    with col_metrics[idx % len(col_metrics)]:
+                        st.metric(
+                            label=name,
+                            value=info["objects"],
+                            delta=f"{info['mean_dwell_s']:.1f} s",
+                            delta_color="off",
+                        )
+            if zone_set is not None and zone_set.zones:
+                st.markdown("**Détections par zone :**")
+                st.json({zone: dict(c) for zone, c in report.zone_counts.items()})
             cap.release()
             st.success("Analyse terminée !")
-            
-            # Nettoyage du fichier temporaire
-            try:
-                import os
-                os.unlink(video_path)
-            except Exception as e:
-                print(f"Erreur lors de la suppression du fichier temporaire : {e}")
+            st.download_button(
+                "📥 Télécharger le rapport détaillé",
+                data=report_path.read_bytes(),
+                file_name=report_path.name,
+            )
+            show_clips(clip_paths)
+
 
 # ─────────────────────────────────────────────
 # MODE WEBCAM
@@ -185,43 +637,67 @@ elif mode == "🎬 Vidéo":
 elif mode == "📷 Webcam":
     st.header("Détection Webcam en Temps Réel")
     
-    run = st.checkbox('Démarrer la Webcam')
-    FRAME_WINDOW = st.image([])
-    RESULTS_WINDOW = st.empty() # Placeholder pour les résultats
+    # Planification : les frames statiques réutilisent les dernières détections
+    with st.expander("⚙️ Planification de l'inférence"):
+        stride = st.slider("Analyser au plus une frame sur", 1, 10, 1)
+        motion_threshold = st.slider(
+            "Seuil de mouvement (0 = toujours analyser)", 0.0, 20.0, 3.0, step=0.5
+        )
+        max_skip = st.slider("Frames sautées au maximum", 1, 60, 15)
+        # Régulateur : imgsz, pas et taille d'affichage ajustés pour tenir l'objectif
+        adaptive_quality = st.checkbox("Qualité adaptative (objectif de FPS)", value=True)
+        target_fps = st.slider("FPS cible", 5, 30, 15, disabled=not adaptive_quality)
+    delivery = stream_delivery_options("webcam")
     
-    if run:
-        cap = cv2.VideoCapture(0)
-        
-        if not cap.isOpened():
-            st.error("Impossible d'accéder à la webcam.")
-        else:
-            while run:
-                ret, frame = cap.read()
-                if not ret:
-                    st.error("Erreur de lecture du flux webcam.")
-                    break
-                
-                results = model(frame)
-                res = results[0]
-                annotated_frame = res.plot()
-                
-                frame_rgb = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-                FRAME_WINDOW.image(frame_rgb)
-                
-                # Afficher les résultats sous la webcam
-                boxes = res.boxes
-                if boxes:
-                    names = res.names
-                    detected_in_frame = [f"{names[int(c)]}" for c in boxes.cls.tolist()]
-                    counts = Counter(detected_in_frame)
-                    summary = ", ".join([f"{k}: {v}" for k, v in counts.items()])
-                    RESULTS_WINDOW.info(f"**Détecté :** {summary}")
-                else:
-                    RESULTS_WINDOW.info("Rien détecté.")
-            
-            cap.release()
-    else:
-        st.info("Cochez la case ci-dessus pour activer la webcam.")
+    # Capture et inférence en arrière-plan ; la page ne fait qu'afficher
+    live_controls(
+        0, "webcam", "webcam",
+        scheduler={"stride": stride, "motion_threshold": motion_threshold or None,
+                   "max_skip": max_skip},
+        target_fps=target_fps if adaptive_quality else None,
+        clips=clip_settings,
+        **delivery,
+    )
+
+# ─────────────────────────────────────────────
+# MODE MULTI-FLUX
+# ─────────────────────────────────────────────
+elif mode == "📡 Multi-flux":
+    st.header("Plusieurs caméras sur un seul modèle")
+    st.markdown("Chaque flux ne garde que sa dernière image ; le modèle les analyse par lots.")
+
+    sources_text = st.text_area(
+        "Sources (une par ligne : index de webcam, fichier vidéo ou URL RTSP)", value="0",
+    )
+    stream_sources = [line.strip() for line in sources_text.splitlines() if line.strip()]
+    col_batch, col_policy, col_refresh = st.columns(3)
+    with col_batch:
+        streams_batch = st.slider("Frames par lot (au plus)", 1, 16, 8)
+    with col_policy:
+        streams_policy = st.selectbox(
+            "Ordre de passage", STREAM_POLICIES,
+            format_func={"round_robin": "Chacun son tour", "deadline": "La plus ancienne d'abord"}.get,
+        )
+    with col_refresh:
+        streams_refresh = st.slider("Images affichées par seconde", 1, 10, 4)
+
+    manager = st.session_state.get("streams")
+    active = manager is not None and manager.running
+    col_start, col_stop = st.columns(2)
+    col_start.button("▶️ Démarrer", key="start_streams", on_click=start_streams,
+                     args=(stream_sources, streams_batch, streams_policy, streams_refresh),
+                     disabled=active or not stream_sources)
+    col_stop.button("⏹️ Arrêter", key="stop_streams", on_click=stop_streams, disabled=not active)
+    if active:
+        st.fragment(streams_view, run_every=1.0 / streams_refresh)()
+    elif manager is not None:
+        st.info(f"Flux arrêtés ({manager.stop_reason or 'arrêt demandé'}).")
+        for stream in manager.streams:
+            stats = stream.stats()
+            st.markdown(f"**{stream.source}** — {stats['frames_inferred']} frames analysées, "
+                        f"{stats['dropped']} perdues, {stats['errors']} erreurs")
+            if stream.class_counts:
+                st.json(dict(stream.class_counts))
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,299 @@
+"""
+Détection YOLOv8 en ligne de commande, sans interface graphique.
+
+Exemples :
+    python batch_cli.py archives/2025-11/ --output-dir batch_output
+    python batch_cli.py "photos/**/*.jpg" video0-115-2.mov --workers 4
+
+Chaque entrée produit un fichier JSON dans le dossier de sortie, et
+manifest.jsonl y note l'empreinte du modèle et des réglages qui l'ont
+produit. Une entrée dont le JSON existe déjà avec la même empreinte est
+sautée : relancer la même commande reprend un traitement interrompu, mais
+changer de modèle, de seuil ou de taille d'entrée refait l'analyse
+(utiliser --overwrite pour tout refaire).
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv"}
+MANIFEST_NAME = "manifest.jsonl"
+
+# Modèle chargé une seule fois par processus de travail
+_MODEL = None
+_PREDICT_KWARGS = {}
+
+
+# ─────────────────────────────────────────────
+# Collecte des entrées
+# ─────────────────────────────────────────────
+def media_kind(path: Path):
+    ext = path.suffix.lower()
+    if ext in IMAGE_EXTENSIONS:
+        return "image"
+    if ext in VIDEO_EXTENSIONS:
+        return "video"
+    return None
+
+
+def collect_inputs(patterns):
+    """Développe dossiers (récursivement), globs et fichiers en une liste triée sans doublons."""
+    found = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = path.rglob("*")
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        for candidate in candidates:
+            if candidate.is_file() and media_kind(candidate):
+                found.add(candidate.resolve())
+    return sorted(found)
+
+
+def result_path_for(source: Path, output_dir: Path) -> Path:
+    """Nom de sortie déterministe (nom du fichier + empreinte du chemin complet)."""
+    digest = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:10]
+    return output_dir / f"{source.stem}_{digest}.json"
+
+
+def load_manifest(output_dir: Path) -> dict:
+    """Nom du fichier de sortie → empreinte des réglages qui l'ont produit (la dernière ligne l'emporte)."""
+    manifest = {}
+    path = output_dir / MANIFEST_NAME
+    if not path.exists():
+        return manifest
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # ligne tronquée par une interruption
+            manifest[entry["output"]] = entry["fingerprint"]
+    return manifest
+
+
+# ─────────────────────────────────────────────
+# Processus de travail
+# ─────────────────────────────────────────────
+def init_worker(model_path: str, backend: str, threads: int, predict_kwargs: dict,
+                cascade: str = None):
+    """Initialisation d'un processus : threads PyTorch + chargement du modèle (et du grand modèle)."""
+    global _MODEL, _PREDICT_KWARGS
+    import torch
+    from detector import Detector
+
+    torch.set_num_threads(threads)
+    imgsz = predict_kwargs.get("imgsz", 640)
+    _MODEL = Detector(model_path, backend=backend, imgsz=imgsz)
+    if cascade:
+        from cascade import CascadeDetector
+
+        _MODEL = CascadeDetector(_MODEL, Detector(cascade, backend=backend, imgsz=imgsz))
+    _PREDICT_KWARGS = dict(predict_kwargs, verbose=False)
+
+
+def analyse_image(source: Path):
+    from detections import result_to_dicts
+
+    res = _MODEL(str(source), **_PREDICT_KWARGS)[0]
+    detections = result_to_dicts(res)
+    return {
+        "type": "image",
+        "image_size": list(res.orig_shape[::-1]),
+        "detections": detections,
+        "counts": dict(Counter(d["class"] for d in detections)),
+    }
+
+
+def analyse_video(source: Path, batch_size: int, frame_stride: int):
+    import cv2
+    from batching import BatchSizer, predict_batched
+    from detections import result_to_dicts
+
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise RuntimeError("impossible d'ouvrir la vidéo")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+    # Index des frames réellement envoyées au modèle (dans l'ordre)
+    indices = []
+
+    def frames():
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % frame_stride == 0:
+                indices.append(index)
+                yield frame
+            index += 1
+
+    records = []
+    counts = Counter()
+    sizer = BatchSizer(batch_size=batch_size)
+    try:
+        for i, (_, res) in enumerate(predict_batched(_MODEL, frames(), sizer, **_PREDICT_KWARGS)):
+            detections = result_to_dicts(res)
+            counts.update(d["class"] for d in detections)
+            index = indices[i]
+            records.append({
+                "index": index,
+                "timestamp": round(index / fps, 3) if fps else None,
+                "detections": detections,
+            })
+    finally:
+        cap.release()
+
+    return {
+        "type": "video",
+        "fps": fps,
+        "frame_stride": frame_stride,
+        "frames_analysed": len(records),
+        "frames": records,
+        "counts": dict(counts),
+    }
+
+
+def process_one(job):
+    """Traite une entrée et écrit son JSON. Retourne (source, statut, message)."""
+    source, output_path, batch_size, frame_stride, settings = job
+    source = Path(source)
+    output_path = Path(output_path)
+    start = time.time()
+    try:
+        if media_kind(source) == "image":
+            payload = analyse_image(source)
+        else:
+            payload = analyse_video(source, batch_size, frame_stride)
+    except Exception as e:
+        return str(source), "error", str(e)
+
+    payload = {
+        "source": str(source),
+        "processed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_s": round(time.time() - start, 3),
+        "settings": settings,
+        **payload,
+    }
+    # Écriture atomique : un JSON présent est toujours complet (reprise fiable)
+    tmp_path = output_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, output_path)
+    return str(source), "ok", str(output_path)
+
+
+# ─────────────────────────────────────────────
+# Point d'entrée
+# ─────────────────────────────────────────────
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Détection YOLOv8 par lots sur des dossiers, globs ou vidéos (sans affichage)."
+    )
+    parser.add_argument("inputs", nargs="+", help="Dossiers, fichiers ou motifs glob (\"**/*.jpg\").")
+    parser.add_argument("--output-dir", default="batch_output", help="Dossier des fichiers JSON.")
+    parser.add_argument("--model", default="nano",
+                        help="Modèle : nom du registre (nano, small, medium…) ou chemin des poids.")
+    parser.add_argument("--cascade", default=None,
+                        help="Grand modèle qui revérifie les détections douteuses (voir cascade.py).")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"],
+                        help="Runtime d'inférence (l'export est fait une seule fois).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Nombre de processus (défaut : tous les cœurs).")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Threads PyTorch par processus (défaut : cœurs / processus).")
+    parser.add_argument("--conf", type=float, default=0.25, help="Seuil de confiance.")
+    parser.add_argument("--imgsz", type=int, default=640, help="Taille d'entrée du modèle.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames par lot (vidéos).")
+    parser.add_argument("--frame-stride", type=int, default=1,
+                        help="N'analyser qu'une frame sur N (vidéos).")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Retraiter les entrées déjà présentes dans le dossier de sortie.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sources = collect_inputs(args.inputs)
+    if not sources:
+        print("Aucune image ni vidéo trouvée.")
+        return 1
+
+    from video_jobs import model_fingerprint
+
+    frame_stride = max(1, args.frame_stride)
+    # Tout ce qui change les détections : un résultat n'est repris que s'il a
+    # été produit avec les mêmes réglages (et les mêmes fichiers de poids)
+    settings = {
+        "weights": args.model, "cascade": args.cascade, "backend": args.backend,
+        "conf": args.conf, "imgsz": args.imgsz, "frame_stride": frame_stride,
+    }
+    fingerprint = model_fingerprint(settings)
+    manifest = load_manifest(output_dir)
+
+    jobs = []
+    skipped = 0
+    for source in sources:
+        output_path = result_path_for(source, output_dir)
+        if (not args.overwrite and output_path.exists()
+                and manifest.get(output_path.name) == fingerprint):
+            skipped += 1
+            continue
+        jobs.append((str(source), str(output_path), args.batch_size, frame_stride, settings))
+
+    print(f"{len(sources)} entrées, {skipped} déjà traitées, {len(jobs)} à traiter.")
+    if not jobs:
+        return 0
+
+    workers = max(1, min(args.workers, len(jobs)))
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    predict_kwargs = {"conf": args.conf, "imgsz": args.imgsz}
+
+    if args.backend != "torch":
+        # Export fait ici, avant le lancement des processus (sinon chacun exporterait)
+        from detector import export_model
+        export_model(args.model, args.backend, imgsz=args.imgsz)
+        if args.cascade:
+            export_model(args.cascade, args.backend, imgsz=args.imgsz)
+
+    failures = 0
+    start = time.time()
+    # "spawn" : chaque processus démarre proprement (PyTorch n'aime pas fork)
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=init_worker,
+                  initargs=(args.model, args.backend, threads, predict_kwargs, args.cascade)) as pool, \
+            open(output_dir / MANIFEST_NAME, "a", encoding="utf-8") as manifest_file:
+        for done, (source, status, message) in enumerate(
+            pool.imap_unordered(process_one, jobs), start=1
+        ):
+            if status == "ok":
+                # Écrit par le seul processus principal, après le JSON complet
+                manifest_file.write(json.dumps({"output": Path(message).name,
+                                                "fingerprint": fingerprint}) + "\n")
+                manifest_file.flush()
+                print(f"[{done}/{len(jobs)}] {source}")
+            else:
+                failures += 1
+                print(f"[{done}/{len(jobs)}] ERREUR {source} : {message}", file=sys.stderr)
+
+    elapsed = time.time() - start
+    print(f"Terminé en {elapsed:.1f} s ({len(jobs) - failures} ok, {failures} erreurs).")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
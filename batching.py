@@ -0,0 +1,114 @@
+import time
+from typing import Any, Iterable, Iterator, List, Tuple
+
+
+# ─────────────────────────────────────────────
+# Taille de batch (fixe ou adaptative)
+# ─────────────────────────────────────────────
+class BatchSizer:
+    """
+    Choisit combien de frames envoyer au modèle en un seul appel.
+
+    - adaptive=False : taille fixe `batch_size`.
+    - adaptive=True  : on part de 1 et on double la taille tant que le temps
+      moyen *par frame* s'améliore d'au moins `tolerance` (5 % par défaut).
+      Dès qu'il n'y a plus de gain, on garde la meilleure taille mesurée.
+      Le premier appel (chauffe du modèle) n'est pas mesuré.
+    """
+
+    def __init__(self, batch_size: int = 8, adaptive: bool = False,
+                 max_batch_size: int = 32, samples_per_size: int = 3,
+                 tolerance: float = 0.05):
+        self.adaptive = adaptive
+        self.max_batch_size = max(1, max_batch_size)
+        self.samples_per_size = max(1, samples_per_size)
+        self.tolerance = tolerance
+
+        self.batch_size = 1 if adaptive else max(1, batch_size)
+        self.settled = not adaptive
+        self.per_frame_ms = {}  # taille → temps moyen par frame (ms)
+        self.last_per_frame_s = 0.0  # dernier appel, toutes tailles confondues
+
+        self._warmed_up = False
+        self._samples = []
+        self._best_size = self.batch_size
+        self._best_time = float("inf")
+
+    def record(self, n_frames: int, seconds: float):
+        """Enregistre la durée d'un appel au modèle sur `n_frames` frames."""
+        self.last_per_frame_s = seconds / max(1, n_frames)
+        if not self._warmed_up:
+            self._warmed_up = True
+            return
+        if self.settled or n_frames != self.batch_size:
+            # Batch incomplet (fin de vidéo) : pas représentatif
+            return
+
+        self._samples.append(seconds / n_frames)
+        if len(self._samples) < self.samples_per_size:
+            return
+
+        per_frame = sum(self._samples) / len(self._samples)
+        self._samples = []
+        self.per_frame_ms[self.batch_size] = 1000.0 * per_frame
+
+        improved = per_frame < self._best_time * (1.0 - self.tolerance)
+        if improved:
+            self._best_time = per_frame
+            self._best_size = self.batch_size
+
+        next_size = self.batch_size * 2
+        if improved and next_size <= self.max_batch_size:
+            self.batch_size = next_size
+        else:
+            self.batch_size = self._best_size
+            self.settled = True
+            print(f"Taille de batch retenue : {self.batch_size} "
+                  f"(ms/frame mesurés : {self.per_frame_ms})")
+
+
+def make_batch_sizer(batch_size) -> BatchSizer:
+    """Construit un BatchSizer à partir d'un entier ou de "auto"."""
+    if str(batch_size).lower() == "auto":
+        return BatchSizer(adaptive=True)
+    return BatchSizer(batch_size=int(batch_size))
+
+
+# ─────────────────────────────────────────────
+# Inférence par lots
+# ─────────────────────────────────────────────
+def predict_batch(model, frames: List[Any], sizer: BatchSizer = None, **kwargs):
+    """
+    Un seul appel au modèle pour toute la liste de frames.
+    Retourne la liste des Results, dans le même ordre que `frames`.
+    """
+    t0 = time.perf_counter()
+    results = model(frames, **kwargs)
+    if sizer is not None:
+        sizer.record(len(frames), time.perf_counter() - t0)
+    return list(results)
+
+
+def predict_batched(model, frames: Iterable[Any], sizer: BatchSizer,
+                    **kwargs) -> Iterator[Tuple[Any, Any]]:
+    """
+    Regroupe les frames par lots de `sizer.batch_size` et renvoie les paires
+    (frame, result) dans l'ordre d'origine.
+    """
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) >= sizer.batch_size:
+            yield from zip(batch, predict_batch(model, batch, sizer, **kwargs))
+            batch = []
+    if batch:
+        yield from zip(batch, predict_batch(model, batch, sizer, **kwargs))
+
+
+def read_frames(cap) -> Iterator[Any]:
+    """Générateur de frames pour un cv2.VideoCapture (s'arrête à la fin)."""
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
@@ -0,0 +1,331 @@
+"""
+Banc d'essai reproductible sur les médias du dépôt (sans affichage, CPU).
+
+    python benchmark.py --output bench/resultats.json
+    python benchmark.py --output bench/apres.json --compare bench/avant.json
+
+Mesures :
+- démarrage à froid (processus neuf) : import des modules d'interface,
+  interface utilisable, modèle chargé et chauffé en arrière-plan ;
+- chargement du modèle ;
+- latences par étape (p50 / p90 / p99, en ms) : décodage, prétraitement,
+  inférence, post-traitement (temps internes d'Ultralytics), dessin des
+  boîtes (`plot`), conversion pour l'affichage (Tkinter et Streamlit) ;
+- débit (frames/s) de la vidéo en série et via FramePipeline, avec et sans
+  décodeur threadé (decoder.ThreadedDecoder) ;
+- avec `--cascade medium` : petit modèle seul, grand modèle seul et cascade
+  (cascade.py) sur les images, latence et rappel par rapport au grand modèle ;
+- mémoire résidente maximale du processus.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_IMAGES = [
+    "Ydger.jpg",
+    "busy_street_traffic_1764681774994.png",
+    "office_meeting_room_1764681787892.png",
+    "park_picnic_people_1764681803186.png",
+]
+DEFAULT_VIDEO = "video0-115-2.mov"
+DISPLAY_SIZE = (750, 450)  # même taille que YoloApp
+# Modules importés au démarrage des interfaces (aucun ne doit charger torch)
+STARTUP_MODULES = ("detector", "render", "detect_yolo")
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from detector import BackgroundDetector
+model = BackgroundDetector(backend=sys.argv[1] or None).start()
+interactive = time.perf_counter() - t0
+model.wait()
+print(json.dumps({"interactive_s": interactive, "ready_s": time.perf_counter() - t0,
+                  "load_s": model.load_s, "warmup_s": model.warmup_s}))
+"""
+
+
+# ─────────────────────────────────────────────
+# Statistiques
+# ─────────────────────────────────────────────
+class LatencyRecorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def add(self, stage: str, ms: float):
+        self.samples[stage].append(ms)
+
+    def add_speed(self, res):
+        """Temps internes d'Ultralytics (ms) : preprocess, inference, postprocess."""
+        for stage, ms in (res.speed or {}).items():
+            if ms is not None:
+                self.samples[stage].append(float(ms))
+
+    def summary(self):
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p90_ms": round(float(np.percentile(values, 90)), 3),
+                "p99_ms": round(float(np.percentile(values, 99)), 3),
+                "mean_ms": round(float(np.mean(values)), 3),
+            }
+            for stage, values in self.samples.items()
+        }
+
+
+def peak_rss_mb():
+    # ru_maxrss est en kilo-octets sous Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def timed(recorder, stage, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    recorder.add(stage, 1000.0 * (time.perf_counter() - t0))
+    return out
+
+
+def display_tk(annotated):
+    """Conversion faite par YoloApp avant le PhotoImage (sans Tk)."""
+    rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+    return Image.fromarray(rgb).resize(DISPLAY_SIZE)
+
+
+def display_streamlit(annotated):
+    """Conversion faite par app.py avant st.image."""
+    return cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+
+
+# ─────────────────────────────────────────────
+# Scénarios
+# ─────────────────────────────────────────────
+def bench_startup(backend=None):
+    """Démarrage à froid, chaque mesure dans un interpréteur neuf (rien en cache)."""
+    def run(code, *args):
+        out = subprocess.run([sys.executable, "-c", code, *args], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    imports = {}
+    for module in STARTUP_MODULES:
+        try:
+            imports[module] = round(run(
+                "import time; t0 = time.perf_counter(); import " + module
+                + "; print(time.perf_counter() - t0)"
+            ), 3)
+        except subprocess.CalledProcessError as e:
+            # Ex. : tkinter absent sur une machine sans affichage
+            print(f"Import de {module} impossible : {e.stderr.strip().splitlines()[-1]}")
+    timings = run(STARTUP_SCRIPT, backend or "")
+    return {"import_s": imports, **{k: round(v, 3) for k, v in timings.items()}}
+
+
+def bench_images(model, images, repeat):
+    """Chemin image (YoloApp.detect_image / mode Image d'app.py), sans cache."""
+    recorder = LatencyRecorder()
+    for path in images:
+        data = Path(path).read_bytes()
+        for _ in range(repeat):
+            image = timed(recorder, "decode", cv2.imdecode,
+                          np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            res = model(image, verbose=False)[0]
+            recorder.add_speed(res)
+            annotated = timed(recorder, "plot", res.plot)
+            timed(recorder, "display_tk", display_tk, annotated)
+            timed(recorder, "display_streamlit", display_streamlit, annotated)
+    return {"images": [str(p) for p in images], "repeat": repeat, "latency": recorder.summary()}
+
+
+def bench_video_serial(model, video, max_frames):
+    """Boucle vidéo d'origine : lecture → modèle → dessin → conversion, frame par frame."""
+    recorder = LatencyRecorder()
+    cap = cv2.VideoCapture(str(video))
+    frames = 0
+    start = time.perf_counter()
+    while frames < max_frames:
+        ret, frame = timed(recorder, "decode", cap.read)
+        if not ret:
+            break
+        res = model(frame, verbose=False)[0]
+        recorder.add_speed(res)
+        annotated = timed(recorder, "plot", res.plot)
+        timed(recorder, "display_tk", display_tk, annotated)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "latency": recorder.summary(),
+    }
+
+
+def bench_video_pipeline(model, video, max_frames, batch_size, threaded_decode: bool = False):
+    """
+    Chemin de YoloApp.detect_video : FramePipeline (threads + lots), avec
+    `threaded_decode` via decoder.ThreadedDecoder (tampons réutilisés).
+    """
+    from batching import make_batch_sizer, predict_batch
+    from decoder import ThreadedDecoder
+    from pipeline import FramePipeline
+
+    cap = ThreadedDecoder(video) if threaded_decode else cv2.VideoCapture(str(video))
+    sizer = make_batch_sizer(batch_size)
+    pipeline = FramePipeline(
+        cap,
+        infer=lambda frame: model(frame, verbose=False)[0],
+        infer_batch=lambda frames: predict_batch(model, frames, verbose=False),
+        batch_sizer=sizer,
+        render=lambda packet: display_tk(packet.result.plot(img=packet.frame)),
+        drop_oldest=False,
+    ).start()
+
+    frames = 0
+    start = time.perf_counter()
+    while frames < max_frames and not pipeline.finished:
+        if pipeline.get(timeout=0.1) is not None:
+            frames += 1
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "batch_size": sizer.batch_size,
+        "stage_timings": pipeline.timings.summary(),
+        **({"decoder": cap.stats()} if threaded_decode else {}),
+    }
+
+
+def bench_cascade(model, cascade_weights, images, repeat):
+    """Petit modèle, grand modèle et cascade : latence, et rappel par rapport au grand modèle."""
+    from cascade import CascadeDetector
+    from detector import Detector, compare_results
+
+    accurate = Detector(cascade_weights, getattr(model, "backend", "torch"), imgsz=getattr(model, "imgsz", 640))
+    cascade = CascadeDetector(model, accurate)
+    cascade.warmup((480, 640, 3))
+    recorder = LatencyRecorder()
+    recall = defaultdict(list)
+    for path in images:
+        image = cv2.imread(str(path))
+        for _ in range(repeat):
+            reference = timed(recorder, "accurate", accurate, image, verbose=False)[0]
+            for name, detector in (("fast", model), ("cascade", cascade)):
+                res = timed(recorder, name, detector, image, verbose=False)[0]
+                recall[name].append(compare_results(reference, res)["recall"])
+    return {
+        "accurate": repr(accurate),
+        "latency": recorder.summary(),
+        "recall_vs_accurate": {name: round(float(np.mean(v)), 3) for name, v in recall.items()},
+        "cascade": cascade.stats(),
+    }
+
+
+# ─────────────────────────────────────────────
+# Comparaison entre deux exécutions
+# ─────────────────────────────────────────────
+def compare(current, previous):
+    """Affiche l'évolution des p50 et des débits par rapport à une exécution précédente."""
+    def pct(new, old):
+        return f"{100.0 * (new - old) / old:+.1f} %" if old else "n/a"
+
+    print("\nComparaison avec l'exécution précédente :")
+    if "startup" in current and "startup" in previous:
+        for key in ("interactive_s", "ready_s"):
+            print(f"- démarrage/{key} : {current['startup'][key]} s "
+                  f"({pct(current['startup'][key], previous['startup'][key])})")
+    print(f"- chargement du modèle : {current['model_load_s']} s "
+          f"({pct(current['model_load_s'], previous.get('model_load_s', 0))})")
+    for scenario in ("images", "video_serial", "cascade"):
+        cur = current.get(scenario, {}).get("latency", {})
+        old = previous.get(scenario, {}).get("latency", {})
+        for stage, stats in cur.items():
+            if stage in old:
+                print(f"- {scenario}/{stage} p50 : {stats['p50_ms']} ms "
+                      f"({pct(stats['p50_ms'], old[stage]['p50_ms'])})")
+    for scenario in ("video_serial", "video_pipeline", "video_decoder"):
+        if scenario in current and scenario in previous:
+            print(f"- {scenario} : {current[scenario]['fps']} FPS "
+                  f"({pct(current[scenario]['fps'], previous[scenario]['fps'])})")
+    print(f"- RSS max : {current['peak_rss_mb']} Mo "
+          f"({pct(current['peak_rss_mb'], previous.get('peak_rss_mb', 0))})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai YOLOv8 sur les médias du dépôt.")
+    parser.add_argument("--images", nargs="*", default=[str(BASE_DIR / p) for p in DEFAULT_IMAGES])
+    parser.add_argument("--video", default=str(BASE_DIR / DEFAULT_VIDEO))
+    parser.add_argument("--repeat", type=int, default=5, help="Passages par image.")
+    parser.add_argument("--max-frames", type=int, default=300, help="Frames vidéo maximum.")
+    parser.add_argument("--batch-size", default="auto", help="Lots du scénario pipeline (entier ou auto).")
+    parser.add_argument("--backend", default=None, help="torch, onnx ou openvino (défaut : YOLO_BACKEND).")
+    parser.add_argument("--cascade", default=None,
+                        help="Grand modèle du scénario cascade (nom du registre ou poids).")
+    parser.add_argument("--output", default=None, help="Fichier JSON de résultats.")
+    parser.add_argument("--compare", default=None, help="JSON d'une exécution précédente.")
+    args = parser.parse_args(argv)
+
+    from detector import load_detector
+
+    # Avant tout import lourd dans ce processus
+    startup = bench_startup(args.backend)
+
+    t0 = time.perf_counter()
+    # Modèle seul : la cascade a son propre scénario
+    model = load_detector(backend=args.backend, cascade="")
+    model_load_s = time.perf_counter() - t0
+
+    # Chauffe : le premier appel n'est pas représentatif
+    model(np.zeros((480, 640, 3), dtype=np.uint8), verbose=False)
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "model": repr(model),
+        "model_load_s": round(model_load_s, 3),
+        "startup": startup,
+    }
+    results["images"] = bench_images(model, args.images, args.repeat)
+    if args.video and Path(args.video).exists():
+        results["video_serial"] = bench_video_serial(model, args.video, args.max_frames)
+        results["video_pipeline"] = bench_video_pipeline(
+            model, args.video, args.max_frames, args.batch_size
+        )
+        results["video_decoder"] = bench_video_pipeline(
+            model, args.video, args.max_frames, args.batch_size, threaded_decode=True
+        )
+    if args.cascade:
+        results["cascade"] = bench_cascade(model, args.cascade, args.images, args.repeat)
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+        print(f"Résultats écrits : {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
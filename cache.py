@@ -0,0 +1,192 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# ─────────────────────────────────────────────
+# Clés de cache
+# ─────────────────────────────────────────────
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def weights_fingerprint(model) -> str:
+    """Empreinte des poids du modèle (contenu du fichier si on le trouve, sinon son nom)."""
+    ckpt = getattr(model, "ckpt_path", None) or getattr(model, "model_name", None) or str(model)
+    path = Path(str(ckpt))
+    if path.is_file():
+        return file_sha256(path)
+    if path.is_dir():
+        # Modèle exporté en dossier (OpenVINO) : empreinte de tous ses fichiers
+        digest = hashlib.sha256()
+        for child in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(child.name.encode("utf-8"))
+            digest.update(file_sha256(child).encode("ascii"))
+        return digest.hexdigest()
+    return hashlib.sha256(str(ckpt).encode("utf-8")).hexdigest()
+
+
+def cache_key(image_bytes: bytes, weights_hash: str, params: dict) -> str:
+    """Clé = contenu de l'image + poids du modèle + paramètres d'inférence."""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(weights_hash.encode("ascii"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ─────────────────────────────────────────────
+# Cache persistant (SQLite, éviction LRU)
+# ─────────────────────────────────────────────
+class DetectionCache:
+    """
+    Cache disque des détections, indexé par `cache_key`.
+
+    Chaque entrée stocke les boîtes sous forme d'un tableau float32 [N, 6]
+    (x1, y1, x2, y2, confiance, classe) — quelques dizaines d'octets par objet.
+    Quand `max_entries` ou `max_bytes` est dépassé, les entrées les moins
+    récemment utilisées sont supprimées. Nombre d'entrées et taille totale
+    sont tenus à jour à chaque écriture (pas de parcours de la table) et
+    recalculés toutes les `RESYNC_EVERY` écritures et avant une éviction :
+    un autre processus peut écrire dans la même base.
+    """
+
+    RESYNC_EVERY = 256
+
+    def __init__(self, db_path, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS detections (
+                key       TEXT PRIMARY KEY,
+                data      BLOB NOT NULL,
+                height    INTEGER NOT NULL,
+                width     INTEGER NOT NULL,
+                size      INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON detections(last_used)")
+        self._conn.commit()
+        self._puts = 0
+        self._resync()
+
+    def _resync(self):
+        self._count, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM detections"
+        ).fetchone()
+
+    def get(self, key: str):
+        """Retourne (tableau [N, 6], (hauteur, largeur)) ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, height, width FROM detections WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE detections SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        self.hits += 1
+        data, height, width = row
+        return np.frombuffer(data, dtype=np.float32).reshape(-1, 6), (height, width)
+
+    def put(self, key: str, boxes: np.ndarray, shape):
+        data = np.ascontiguousarray(boxes, dtype=np.float32).tobytes()
+        with self._lock:
+            # Entrée remplacée : sa taille sort du total (recherche par clé primaire)
+            old = self._conn.execute("SELECT size FROM detections WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, int(shape[0]), int(shape[1]), len(data), time.time()),
+            )
+            if old is None:
+                self._count += 1
+            else:
+                self._bytes -= old[0]
+            self._bytes += len(data)
+            self._puts += 1
+            if self._puts % self.RESYNC_EVERY == 0:
+                self._resync()
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        self._resync()
+        count, total = self._count, self._bytes
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # On retire les plus anciennes entrées jusqu'à repasser sous les deux limites
+        excess = 0
+        for (size,) in self._conn.execute("SELECT size FROM detections ORDER BY last_used"):
+            if count - excess <= self.max_entries and total <= self.max_bytes:
+                break
+            total -= size
+            excess += 1
+        self._conn.execute(
+            "DELETE FROM detections WHERE key IN "
+            "(SELECT key FROM detections ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._count, self._bytes = count - excess, total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ─────────────────────────────────────────────
+# Inférence avec cache
+# ─────────────────────────────────────────────
+def result_from_cache(image_bgr, boxes: np.ndarray, names, path: str = ""):
+    """Reconstruit un Results Ultralytics (plot(), boxes…) à partir d'une entrée du cache."""
+    import torch
+    from ultralytics.engine.results import Results
+
+    return Results(orig_img=image_bgr, path=path, names=names, boxes=torch.from_numpy(boxes.copy()))
+
+
+def cached_predict(model, cache: DetectionCache, image_bgr, image_bytes: bytes,
+                   weights_hash: str, path: str = "", **params):
+    """
+    Lance le modèle sur `image_bgr` sauf si le même contenu a déjà été analysé
+    avec les mêmes poids et paramètres. Retourne (Results, hit).
+    """
+    # Taille d'entrée effective dans la clé, même quand elle vient du modèle
+    # (Detector.imgsz, YOLO_IMGSZ) : changer de taille ne reprend pas l'ancien résultat
+    key_params = dict(params)
+    if "imgsz" not in key_params and getattr(model, "imgsz", None) is not None:
+        key_params["imgsz"] = model.imgsz
+    key = cache_key(image_bytes, weights_hash, key_params)
+    cached = cache.get(key)
+    if cached is not None:
+        boxes, _ = cached
+        return result_from_cache(image_bgr, boxes, model.names, path), True
+
+    res = model(image_bgr, **params)[0]
+    if res.boxes is not None and len(res.boxes):
+        boxes = res.boxes.data[:, :6].cpu().numpy()
+    else:
+        boxes = np.zeros((0, 6), dtype=np.float32)
+    cache.put(key, boxes, res.orig_shape)
+    return res, False
@@ -0,0 +1,379 @@
+"""
+Cascade petit / grand modèle.
+
+Le petit modèle (nano) analyse chaque frame, avec un seuil de confiance
+abaissé (`candidate_conf`) pour voir aussi ce dont il doute. Ses détections
+sûres (≥ `accept_conf`) sont gardées telles quelles ; les régions douteuses
+(boîtes entre les deux seuils, élargies de `pad`) sont revérifiées par le
+grand modèle sur des recadrages seulement. Si la frame entière est peu
+sûre (meilleure confiance < `frame_conf`) ou compte trop de régions, le
+grand modèle revoit toute la frame. Une frame où le petit modèle ne voit
+rien du tout est aussi revue entière : toujours pour une image, au plus
+une fois toutes les `empty_check_s` secondes sur un flux (None : jamais).
+Les détections des deux modèles sont
+fusionnées par NMS dans un Results Ultralytics classique.
+
+    cascade = CascadeDetector(Detector("nano"), Detector("medium"))
+    res = cascade(image_bgr)[0]          # vérification immédiate (images, fichiers)
+    stream = cascade.stream()            # un par flux vidéo / webcam
+    res = stream(frame)[0]               # vérification en arrière-plan
+
+Sur un flux, le grand modèle tourne dans un thread : la frame courante ne
+l'attend pas. Ses verdicts (valables `ttl_s` secondes) s'appliquent aux
+frames suivantes : une boîte douteuse dans une région vérifiée prend la
+classe et la confiance du grand modèle, ou disparaît s'il n'a rien vu.
+Chaque flux a son propre état (`stream()`), le thread du grand modèle est
+partagé ; les appels au grand modèle (thread et appels directs) passent
+par un verrou.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from functools import cached_property
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from tiling import _boxes_data, nms
+from tracker import iou_matrix
+
+
+def _load_images(source):
+    """Image, chemin ou liste → liste d'images BGR."""
+    sources = source if isinstance(source, (list, tuple)) else [source]
+    return [cv2.imread(str(s)) if isinstance(s, (str, Path)) else s for s in sources]
+
+
+def _centers_inside(xyxy: np.ndarray, regions: np.ndarray) -> np.ndarray:
+    """Centre de chaque boîte dans au moins une des régions → bool [N]."""
+    if len(regions) == 0:
+        return np.zeros(len(xyxy), dtype=bool)
+    cx = (xyxy[:, 0] + xyxy[:, 2])[:, None] / 2
+    cy = (xyxy[:, 1] + xyxy[:, 3])[:, None] / 2
+    return ((cx >= regions[None, :, 0]) & (cx <= regions[None, :, 2])
+            & (cy >= regions[None, :, 1]) & (cy <= regions[None, :, 3])).any(axis=1)
+
+# ─────────────────────────────────────────────
+# Détecteur en cascade
+# ─────────────────────────────────────────────
+class CascadeDetector:
+    """
+    Enveloppe deux détecteurs (Detector, RemoteDetector…) et s'utilise comme
+    eux : `cascade(image_bgr_chemin_ou_liste, **kwargs)` → liste de Results.
+    `conf` (défaut 0.25) reste le seuil final ; `classes` est traduit pour le
+    grand modèle par nom de classe.
+    """
+
+    def __init__(self, fast, accurate, accept_conf: float = 0.5, candidate_conf: float = 0.1,
+                 frame_conf: float = 0.4, pad: float = 0.25, min_crop: int = 96,
+                 max_crops: int = 4, iou_threshold: float = 0.5, ttl_s: float = 1.0,
+                 empty_check_s: float = 2.0, queue_size: int = 8):
+        self.fast = fast
+        self.accurate = accurate
+        self.accept_conf = accept_conf
+        self.candidate_conf = candidate_conf
+        self.frame_conf = frame_conf
+        self.pad = pad
+        self.min_crop = min_crop
+        self.max_crops = max_crops
+        self.iou_threshold = iou_threshold
+        self.ttl_s = ttl_s
+        self.empty_check_s = empty_check_s
+
+        self.frames = 0
+        self.crops = 0
+        self.full_frames = 0
+        self.dropped = 0
+        self.verify_s = 0.0
+
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        # Le grand modèle sert le thread de vérification et les appels directs
+        self._accurate_lock = threading.Lock()
+
+    @property
+    def names(self):
+        return self.fast.names
+
+    @property
+    def imgsz(self):
+        return getattr(self.fast, "imgsz", 640)
+
+    @property
+    def ckpt_path(self):
+        # Les deux modèles entrent dans l'empreinte du cache
+        fast = getattr(self.fast, "ckpt_path", str(self.fast))
+        accurate = getattr(self.accurate, "ckpt_path", str(self.accurate))
+        return f"{fast}+{accurate}"
+
+    @cached_property
+    def _class_map(self):
+        """Identifiant de classe du grand modèle → celui du petit (-1 si inconnue)."""
+        by_name = {name: i for i, name in self.fast.names.items()}
+        size = max(self.accurate.names) + 1
+        mapping = np.full(size, -1, dtype=np.int64)
+        for i, name in self.accurate.names.items():
+            mapping[i] = by_name.get(name, -1)
+        return mapping
+
+    def warmup(self, shape):
+        """Chauffe les deux modèles (voir detector.BackgroundDetector)."""
+        image = np.zeros(shape, dtype=np.uint8)
+        self.fast(image, verbose=False)
+        with self._accurate_lock:
+            self.accurate(image, verbose=False)
+
+    # ── première passe (petit modèle) ─────────
+    def _first_pass(self, images, kwargs, check_empty: bool):
+        """→ [(boîtes du petit modèle [N, 6], régions à vérifier [R, 4])], conf finale, kwargs du grand modèle."""
+        conf = kwargs.pop("conf", 0.25)
+        kwargs.setdefault("verbose", False)
+        results = self.fast(images, **dict(kwargs, conf=min(conf, self.candidate_conf)))
+        self.frames += len(images)
+
+        accurate_kwargs = {"verbose": kwargs["verbose"], "conf": conf}
+        if kwargs.get("classes") is not None:
+            wanted = {self.fast.names[int(c)] for c in kwargs["classes"]}
+            accurate_kwargs["classes"] = [i for i, n in self.accurate.names.items() if n in wanted]
+
+        passes = []
+        for image, res in zip(images, results):
+            boxes = _boxes_data(res)
+            passes.append((boxes, self.regions(boxes, image.shape, check_empty)))
+        return passes, conf, accurate_kwargs
+
+    def regions(self, boxes: np.ndarray, shape, check_empty: bool = False) -> np.ndarray:
+        """
+        Régions douteuses, élargies et fusionnées → int [R, 4] (toute la frame
+        si besoin ; frame sans détection : toute la frame avec `check_empty`).
+        """
+        height, width = shape[:2]
+        full = np.array([[0, 0, width, height]], dtype=np.int64)
+        if len(boxes) == 0:
+            # Le petit modèle a pu tout manquer (objet petit, flou, inhabituel)
+            return full if check_empty else np.zeros((0, 4), dtype=np.int64)
+        if boxes[:, 4].max() < self.frame_conf:
+            return full
+        doubtful = boxes[boxes[:, 4] < self.accept_conf, :4]
+        if len(doubtful) == 0:
+            return np.zeros((0, 4), dtype=np.int64)
+
+        # Élargissement : le grand modèle voit l'objet entier et son contexte
+        size = np.maximum(doubtful[:, 2:] - doubtful[:, :2], 1.0)
+        grow = np.maximum(size * self.pad, (self.min_crop - size) / 2)
+        padded = np.concatenate([doubtful[:, :2] - grow, doubtful[:, 2:] + grow], axis=1)
+        padded = np.clip(padded, 0, [width, height, width, height])
+
+        # Régions qui se chevauchent : un seul recadrage
+        merged = []
+        for box in padded[np.argsort(-(padded[:, 2] - padded[:, 0]) * (padded[:, 3] - padded[:, 1]))]:
+            for region in merged:
+                if box[0] < region[2] and box[2] > region[0] and box[1] < region[3] and box[3] > region[1]:
+                    region[:2] = np.minimum(region[:2], box[:2])
+                    region[2:] = np.maximum(region[2:], box[2:])
+                    break
+            else:
+                merged.append(box.copy())
+        if len(merged) > self.max_crops:
+            return full
+        return np.round(np.array(merged)).astype(np.int64)
+
+    # ── grand modèle ──────────────────────────
+    def verify(self, image, regions: np.ndarray, accurate_kwargs: dict) -> np.ndarray:
+        """Grand modèle sur les recadrages `regions` → détections [M, 6] dans le repère de l'image."""
+        crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        return self._verify_crops(crops, regions, image.shape, accurate_kwargs)
+
+    def _verify_crops(self, crops, regions: np.ndarray, shape, accurate_kwargs: dict) -> np.ndarray:
+        if len(regions) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+        t0 = time.perf_counter()
+        # Tous les recadrages de la frame en un lot
+        with self._accurate_lock:
+            results = self.accurate(crops, **accurate_kwargs)
+        parts = []
+        for (x1, y1, _, _), res in zip(regions, results):
+            boxes = _boxes_data(res)
+            boxes[:, [0, 2]] += x1
+            boxes[:, [1, 3]] += y1
+            parts.append(boxes)
+        boxes = np.concatenate(parts)
+        # Classes du grand modèle exprimées dans celles du petit (noms du Results)
+        mapped = self._class_map[boxes[:, 5].astype(np.int64)]
+        boxes = boxes[mapped >= 0]
+        boxes[:, 5] = mapped[mapped >= 0]
+
+        self.verify_s += time.perf_counter() - t0
+        self.crops += len(regions)
+        self.full_frames += int(len(regions) == 1 and tuple(regions[0]) == (0, 0, shape[1], shape[0]))
+        return boxes
+
+    def merge(self, boxes: np.ndarray, regions: np.ndarray, verified: np.ndarray, conf: float):
+        """
+        Détections sûres du petit modèle + détections du grand modèle ; les
+        boîtes douteuses dont le centre est dans une région vérifiée sont remplacées.
+        """
+        replaced = (boxes[:, 4] < self.accept_conf) & _centers_inside(boxes[:, :4], regions)
+        merged = nms(np.concatenate([boxes[~replaced], verified]), self.iou_threshold)
+        return merged[merged[:, 4] >= conf]
+
+    def __call__(self, source, **kwargs):
+        from cache import result_from_cache
+
+        images = _load_images(source)
+        passes, conf, accurate_kwargs = self._first_pass(images, kwargs, self.empty_check_s is not None)
+        out = []
+        for image, (boxes, regions) in zip(images, passes):
+            verified = self.verify(image, regions, accurate_kwargs)
+            out.append(result_from_cache(image, self.merge(boxes, regions, verified, conf), self.names))
+        return out
+
+    # ── flux : vérification en arrière-plan ───
+    def stream(self):
+        """Détecteur pour un flux (état propre), même interface."""
+        return CascadeStream(self)
+
+    def submit(self, image, regions, accurate_kwargs, on_done) -> bool:
+        """File du grand modèle ; False si elle est pleine (la frame reste au verdict du petit)."""
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._verify_loop, name="cascade-verifier",
+                                                daemon=True)
+                self._worker.start()
+        # Seuls les recadrages sont copiés : la frame peut être un tampon réutilisé
+        crops = [image[y1:y2, x1:x2].copy() for x1, y1, x2, y2 in regions]
+        try:
+            self._jobs.put_nowait((crops, regions, image.shape, accurate_kwargs, on_done))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _verify_loop(self):
+        while True:
+            crops, regions, shape, accurate_kwargs, on_done = self._jobs.get()
+            try:
+                boxes = self._verify_crops(crops, regions, shape, accurate_kwargs)
+            except Exception as e:
+                print(f"Vérification par le grand modèle impossible : {e}")
+                boxes = None
+            on_done(regions, boxes)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "crops": self.crops,
+            "full_frames": self.full_frames,
+            "dropped": self.dropped,
+            "verify_ms": round(1000.0 * self.verify_s / self.crops, 1) if self.crops else 0.0,
+        }
+
+    def __repr__(self):
+        return f"CascadeDetector({self.fast!r} → {self.accurate!r}, accept_conf={self.accept_conf})"
+
+
+class CascadeStream:
+    """Vue d'une cascade pour un flux : verdicts du grand modèle reportés sur les frames suivantes."""
+
+    def __init__(self, cascade: CascadeDetector):
+        self.cascade = cascade
+        self._lock = threading.Lock()
+        self._verdicts = deque()     # (expiration, régions [R, 4], détections [M, 6])
+        self._pending = deque()      # (expiration, régions [R, 4]) en cours de vérification
+        self._last_empty_check = None
+
+    @property
+    def names(self):
+        return self.cascade.names
+
+    @property
+    def imgsz(self):
+        return self.cascade.imgsz
+
+    @property
+    def ckpt_path(self):
+        return self.cascade.ckpt_path
+
+    def _done(self, regions, boxes):
+        expires = time.monotonic() + self.cascade.ttl_s
+        with self._lock:
+            self._pending = deque(p for p in self._pending if p[1] is not regions)
+            if boxes is not None:
+                self._verdicts.append((expires, regions, boxes))
+
+    def _empty_check_due(self, now) -> bool:
+        period = self.cascade.empty_check_s
+        if period is None:
+            return False
+        if self._last_empty_check is not None and now - self._last_empty_check < period:
+            return False
+        self._last_empty_check = now
+        return True
+
+    def _known(self, now):
+        """Régions vérifiées (avec leurs détections) et en cours, non expirées."""
+        with self._lock:
+            while self._verdicts and self._verdicts[0][0] < now:
+                self._verdicts.popleft()
+            while self._pending and self._pending[0][0] < now:
+                self._pending.popleft()
+            verdicts = list(self._verdicts)
+            pending = [regions for _, regions in self._pending]
+        return verdicts, pending
+
+    def __call__(self, source, **kwargs):
+        from cache import result_from_cache
+
+        cascade = self.cascade
+        images = _load_images(source)
+        passes, conf, accurate_kwargs = cascade._first_pass(images, kwargs, check_empty=False)
+        out = []
+        for image, (boxes, regions) in zip(images, passes):
+            now = time.monotonic()
+            if len(boxes) == 0 and self._empty_check_due(now):
+                # Frame vide : revue entière de temps en temps, pas à chaque frame
+                regions = cascade.regions(boxes, image.shape, check_empty=True)
+            verdicts, pending = self._known(now)
+            checked = np.concatenate([v[1] for v in verdicts]) if verdicts else np.zeros((0, 4), np.int64)
+            verified = np.concatenate([v[2] for v in verdicts]) if verdicts else np.zeros((0, 6), np.float32)
+
+            # Régions dont le centre n'est dans aucune région vérifiée ou en cours :
+            # envoyées au grand modèle
+            new = ~_centers_inside(regions, np.concatenate([checked, *pending]))
+            if new.any():
+                fresh = regions[new]
+                # Inscrite avant l'envoi : le thread du grand modèle peut finir
+                # (et appeler _done) avant le retour de submit()
+                entry = (now + cascade.ttl_s, fresh)
+                with self._lock:
+                    self._pending.append(entry)
+                if not cascade.submit(image, fresh, accurate_kwargs, self._done):
+                    with self._lock:
+                        self._pending = deque(p for p in self._pending if p is not entry)
+
+            # Détections du grand modèle recalées sur les boîtes actuelles du petit
+            if len(verified) and len(boxes):
+                doubtful = boxes[:, 4] < cascade.accept_conf
+                if doubtful.any():
+                    ious = iou_matrix(verified[:, :4], boxes[doubtful, :4])
+                    best = ious.argmax(axis=1)
+                    moved = ious[np.arange(len(verified)), best] >= 0.3
+                    verified = verified.copy()
+                    verified[moved, :4] = boxes[doubtful][best[moved], :4]
+            out.append(result_from_cache(image, cascade.merge(boxes, checked, verified, conf), cascade.names))
+        return out
+
+    def __repr__(self):
+        return f"CascadeStream({self.cascade!r})"
+
+
+def stream_detector(model):
+    """
+    Détecteur à utiliser pour un flux vidéo / webcam : vue propre au flux si
+    `model` est une cascade, `model` lui-même sinon.
+    """
+    stream = getattr(model, "stream", None)
+    return stream() if callable(stream) else model
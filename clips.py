@@ -0,0 +1,277 @@
+"""
+Enregistrement de clips déclenché par les détections.
+
+Au lieu de tout enregistrer, ClipRecorder garde en mémoire les dernières
+secondes (`pre_s`) sous forme de JPEG réduits, dans un anneau borné en
+durée et en octets. Quand une règle se déclenche, un clip est écrit avec
+ce pré-enregistrement, puis tant que la règle reste vraie et pendant
+`post_s` secondes après : l'espace disque et les écritures sont
+proportionnels aux événements, pas à la durée de la session.
+
+Côté appelant (thread d'inférence), `add()` ne fait que réduire la frame
+et la déposer dans une file ; dessin, compression, évaluation des règles
+et écriture du clip se font dans un thread dédié. Si ce thread prend du
+retard, les frames en trop sont jetées (comptées) plutôt que de ralentir
+l'inférence — sauf avec `block=True` (analyse d'un fichier, où aucune
+frame ne doit manquer au clip).
+
+Règles (liste de dicts, voir EVENT_RULES dans detect_yolo.py) :
+
+    {"name": "personne", "classes": ["person"], "min_count": 1, "cooldown_s": 10}
+
+`classes` vide ou absent = toutes les classes ; la règle se déclenche
+quand le nombre de détections de ces classes dans une frame passe à
+`min_count` ou plus.
+"""
+import json
+import queue
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from render import FrameRenderer
+from reports import new_report_path
+
+BASE_DIR = Path(__file__).resolve().parent
+CLIPS_DIR = BASE_DIR / "clips"
+
+
+# ─────────────────────────────────────────────
+# Règles
+# ─────────────────────────────────────────────
+class EventRule:
+    def __init__(self, name: str, classes=None, min_count: int = 1, cooldown_s: float = 10.0):
+        self.name = name
+        self.classes = set(classes) if classes else None
+        self.min_count = max(1, int(min_count))
+        self.cooldown_s = cooldown_s
+        self._active = False
+        self._last_fired = None
+
+    @classmethod
+    def from_dict(cls, config: dict):
+        return cls(config["name"], config.get("classes"), config.get("min_count", 1),
+                   config.get("cooldown_s", 10.0))
+
+    def matches(self, counts: Counter) -> bool:
+        if self.classes is None:
+            return sum(counts.values()) >= self.min_count
+        return sum(n for name, n in counts.items() if name in self.classes) >= self.min_count
+
+    def update(self, counts: Counter, timestamp: float):
+        """
+        Retourne (déclenchée, vraie) : déclenchée au passage de faux à vrai
+        (hors délai de grâce), vraie tant que la condition tient.
+        """
+        true = self.matches(counts)
+        fired = (true and not self._active
+                 and (self._last_fired is None or timestamp - self._last_fired >= self.cooldown_s))
+        self._active = true
+        if fired:
+            self._last_fired = timestamp
+        return fired, true
+
+    def __repr__(self):
+        return f"EventRule({self.name}, classes={sorted(self.classes) if self.classes else 'toutes'}, ≥{self.min_count})"
+
+
+def load_rules(rules):
+    """Liste de dicts (ou d'EventRule) → liste d'EventRule."""
+    return [r if isinstance(r, EventRule) else EventRule.from_dict(r) for r in rules or []]
+
+
+# ─────────────────────────────────────────────
+# Enregistreur
+# ─────────────────────────────────────────────
+class ClipRecorder:
+    """
+    `add(frame, timestamp, res)` pour chaque frame affichée (détections
+    reprises comprises) ; `close()` termine le clip en cours et arrête le
+    thread. Les clips (MP4, sinon AVI/MJPG) et leur description JSON vont
+    dans `out_dir`.
+    """
+
+    def __init__(self, rules, pre_s: float = 5.0, post_s: float = 5.0, max_clip_s: float = 120.0,
+                 max_width: int = 640, jpeg_quality: int = 80, max_buffer_mb: float = 64,
+                 fps: float = None, out_dir=CLIPS_DIR, source: str = "", annotate: bool = True,
+                 block: bool = False):
+        self.rules = load_rules(rules)
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self.max_clip_s = max_clip_s
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.max_buffer_bytes = int(max_buffer_mb * 1024 * 1024)
+        self.fps = fps
+        self.out_dir = Path(out_dir)
+        self.source = source
+        self.annotate = annotate
+        self.block = block
+
+        self.clips = []           # chemins des clips terminés
+        self.dropped = 0
+        self.buffer_bytes = 0
+
+        self._queue = queue.Queue(maxsize=64)
+        self._ring = deque()      # (horodatage, octets JPEG)
+        self._renderer = None
+        self._event = None
+        self._thread = threading.Thread(target=self._run, name="clip-recorder", daemon=True)
+        self._thread.start()
+
+    # ── côté appelant ─────────────────────────
+    def add(self, frame, timestamp: float, res):
+        """Frame + détections (Results, éventuellement repris d'une frame précédente)."""
+        from detections import result_arrays
+
+        if res is not None:
+            xyxy, conf, cls = result_arrays(res)
+            names = res.names
+        else:
+            xyxy, conf, cls, names = np.zeros((0, 4), np.float32), np.zeros(0), np.zeros(0), {}
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.max_width / width)
+        size = (round(width * scale), round(height * scale))
+        # Copie réduite : la frame d'origine peut appartenir à un tampon réutilisé
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        counts = Counter(names[int(c)] for c in cls)
+        try:
+            self._queue.put((timestamp, small, xyxy * scale, conf, cls, names, counts), block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 10.0):
+        """Termine le clip en cours et attend la fin des écritures."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        return self.clips
+
+    # ── thread d'enregistrement ───────────────
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._process(*item)
+            except Exception as e:
+                print(f"Enregistrement de clip interrompu : {e}")
+                self._finish_event()
+        self._finish_event()
+
+    def _process(self, timestamp, small, xyxy, conf, cls, names, counts):
+        if self._renderer is None or self._renderer.display_size != (small.shape[1], small.shape[0]):
+            self._renderer = FrameRenderer((small.shape[1], small.shape[0]), slots=2)
+        frame = (self._renderer.render(small, xyxy, conf, cls, names, rgb=False)
+                 if self.annotate else small)
+
+        fired, holding = [], False
+        for rule in self.rules:
+            rule_fired, rule_true = rule.update(counts, timestamp)
+            if rule_fired:
+                fired.append(rule.name)
+            holding = holding or rule_true
+
+        if self._event is None and fired:
+            self._start_event(fired, timestamp, frame.shape)
+        if self._event is not None:
+            event = self._event
+            if holding:
+                event["last_true"] = timestamp
+            event["rules"].update(fired)
+            event["counts"].update(counts)
+            event["writer"].write(frame)
+            event["frames"] += 1
+            if timestamp - event["last_true"] > self.post_s:
+                self._finish_event()
+            elif timestamp - event["start"] > self.max_clip_s:
+                # Événement qui dure : découpé en clips successifs
+                self._finish_event()
+                if holding:
+                    self._start_event(sorted(event["rules"]), timestamp, frame.shape, pre_roll=False)
+
+        # Anneau de pré-enregistrement (JPEG), borné en durée et en octets
+        ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            self._ring.append((timestamp, data.tobytes()))
+            self.buffer_bytes += len(data)
+        while self._ring and (timestamp - self._ring[0][0] > self.pre_s
+                              or self.buffer_bytes > self.max_buffer_bytes):
+            self.buffer_bytes -= len(self._ring.popleft()[1])
+
+    def _estimated_fps(self):
+        if self.fps:
+            return self.fps
+        if len(self._ring) >= 2 and self._ring[-1][0] > self._ring[0][0]:
+            return (len(self._ring) - 1) / (self._ring[-1][0] - self._ring[0][0])
+        return 15.0
+
+    def _open_writer(self, path_stem: str, fps: float, shape):
+        height, width = shape[:2]
+        for ext, fourcc in (("mp4", "mp4v"), ("avi", "MJPG")):
+            path = new_report_path(self.out_dir, path_stem, ext)
+            writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+            if writer.isOpened():
+                return path, writer
+            writer.release()
+            path.unlink(missing_ok=True)
+        raise RuntimeError("Aucun encodeur vidéo disponible (mp4v, MJPG).")
+
+    def _start_event(self, fired, timestamp, shape, pre_roll: bool = True):
+        fps = self._estimated_fps()
+        path, writer = self._open_writer(f"clip_{fired[0]}", fps, shape)
+        # Pré-enregistrement : les frames gardées en mémoire avant le déclenchement
+        frames = 0
+        for _, data in (self._ring if pre_roll else ()):
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None and frame.shape == shape:
+                writer.write(frame)
+                frames += 1
+        self._event = {
+            "path": path,
+            "writer": writer,
+            "rules": set(fired),
+            "start": timestamp,
+            "last_true": timestamp,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "pre_roll_frames": frames,
+            "frames": frames,
+            "fps": fps,
+            "counts": Counter(),
+        }
+        print(f"Événement {', '.join(fired)} : enregistrement de {path}")
+
+    def _finish_event(self):
+        event, self._event = self._event, None
+        if event is None:
+            return
+        event["writer"].release()
+        info = {
+            "source": self.source,
+            "clip": event["path"].name,
+            "rules": sorted(event["rules"]),
+            "started_at": event["started_at"],
+            "duration_s": round(event["frames"] / event["fps"], 2),
+            "frames": event["frames"],
+            "pre_roll_frames": event["pre_roll_frames"],
+            "fps": round(event["fps"], 2),
+            "detections": dict(event["counts"]),
+        }
+        sidecar = event["path"].with_suffix(".json")
+        sidecar.write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.clips.append(event["path"])
+        print(f"Clip enregistré : {event['path']} ({info['duration_s']} s)")
+
+    def stats(self):
+        return {
+            "clips": len(self.clips),
+            "recording": self._event is not None,
+            "buffer_frames": len(self._ring),
+            "buffer_mb": round(self.buffer_bytes / (1024 * 1024), 2),
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,308 @@
+"""
+Décodage vidéo dans un thread dédié, dans un tampon circulaire de tableaux
+préalloués.
+
+ThreadedDecoder s'utilise comme un cv2.VideoCapture (`read`, `get`,
+`isOpened`, `release`) : FramePipeline, batching.read_frames… n'ont rien à
+changer. Les frames sont décodées à l'avance (`prefetch`) dans des tableaux
+réutilisés : pas d'allocation par frame, et le décodage ne compte plus
+dans la latence du consommateur (il n'attend que si le décodeur est en
+retard, voir `stats()`).
+
+Options, modifiables en cours de route par `request()` (planificateur,
+aperçu rapide…) :
+- `max_width` : frames réduites dès le décodage (les coordonnées des
+  détections sont alors celles de la frame réduite) ;
+- `keyframes_only` : seulement les images clés (ffprobe, sinon environ
+  une frame par seconde).
+
+En boucle (`loop=True`), un clip court est gardé décodé en mémoire au
+premier passage (`cache_max_mb`) : les passages suivants ne décodent plus
+rien. Un clip trop long est rouvert au lieu d'un `cap.set` (lent sur
+beaucoup de codecs).
+
+Contrat : une frame rendue par `read()` reste intacte tant que le
+consommateur n'a pas lu `hold` frames de plus (voir `reserve()`).
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def open_capture(path, hw_accel: bool = True):
+    """cv2.VideoCapture avec décodage matériel si OpenCV et la machine le permettent."""
+    if hw_accel and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        cap = cv2.VideoCapture(
+            str(path), cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+        )
+        if cap.isOpened():
+            return cap
+    return cv2.VideoCapture(str(path))
+
+
+class ThreadedDecoder:
+    """Lecteur de fichier vidéo à décodage anticipé (voir l'en-tête du module)."""
+
+    def __init__(self, path, loop: bool = False, max_width: int = None,
+                 keyframes_only: bool = False, prefetch: int = 4, hold: int = 4,
+                 cache_max_mb: float = 256, hw_accel: bool = True):
+        self.path = str(path)
+        self.loop = loop
+        self.prefetch = max(1, prefetch)
+        self.hold = max(1, hold)
+        self.cache_max_bytes = int(cache_max_mb * 1024 * 1024)
+        self.hw_accel = hw_accel
+        self.timings = None
+
+        self.cap = open_capture(self.path, hw_accel)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._max_width = max_width
+        self._keyframes_only = keyframes_only
+        self._keyframes = None
+        self._mode_changed = False
+
+        self._slots = []
+        self._scratch = None
+        self._ready = deque()          # (frame, position) décodées, pas encore lues
+        self._produced = 0
+        self._consumed = 0
+        self._next_position = 0        # prochaine frame de la source
+        self._position = -1            # dernière frame rendue par read()
+        self._done = False
+
+        self._cache = []               # (frame, position) du premier passage
+        self._caching = loop
+        self._cache_ready = False
+        self._cache_index = 0
+
+        self.decoded = 0
+        self.decode_s = 0.0
+        self.wait_s = 0.0
+        self.reopens = 0
+        self.cached_frames = 0
+        self.error = None
+
+    # ── configuration ─────────────────────────
+    def reserve(self, frames: int, timings=None):
+        """
+        Le consommateur garde jusqu'à `frames` frames en vie (files, lot en
+        cours…) : autant de tampons en plus. `timings` (pipeline.StageTimings)
+        reçoit le temps de décodage. À appeler avant la première lecture.
+        """
+        self.hold = max(self.hold, frames)
+        if timings is not None:
+            self.timings = timings
+
+    def request(self, max_width=..., keyframes_only=...):
+        """Change la résolution ou le mode de décodage pour les prochaines frames."""
+        with self._cond:
+            if max_width is not ...:
+                self._max_width = max_width
+            if keyframes_only is not ...:
+                self._keyframes_only = keyframes_only
+            self._mode_changed = True
+
+    # ── interface cv2.VideoCapture ────────────
+    def isOpened(self):
+        return self.cap.isOpened() or self._cache_ready
+
+    def get(self, prop):
+        # Valeurs lues à l'ouverture : le fichier est fermé une fois le clip en cache
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position + 1)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            scale = min(1.0, self._max_width / self.width) if self._max_width and self.width else 1.0
+            size = self.width if prop == cv2.CAP_PROP_FRAME_WIDTH else self.height
+            return float(round(size * scale))
+        return self.cap.get(prop)
+
+    @property
+    def position(self) -> int:
+        """Index dans la source de la dernière frame rendue (horodatage = position / fps)."""
+        return self._position
+
+    def read(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._decode_loop, name="video-decoder", daemon=True)
+            self._thread.start()
+
+        t0 = time.perf_counter()
+        with self._cond:
+            while not self._ready and not self._done and not self._stop.is_set():
+                self._cond.wait(0.1)
+            if self._ready:
+                frame, self._position = self._ready.popleft()
+                self._consumed += 1
+                self._cond.notify_all()
+            else:
+                frame = None
+        self.wait_s += time.perf_counter() - t0
+
+        if frame is not None:
+            return True, frame
+        if self._cache_ready and not self._stop.is_set():
+            # 🔁 Passages suivants : frames déjà décodées, aucun décodage
+            frame, self._position = self._cache[self._cache_index % len(self._cache)]
+            self._cache_index += 1
+            return True, frame
+        return False, None
+
+    def release(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+        self.cap.release()
+        self._cache = []
+        self._cache_ready = False
+
+    # ── thread de décodage ────────────────────
+    def _decode_loop(self):
+        try:
+            while not self._stop.is_set():
+                with self._cond:
+                    # Pas plus de `prefetch` frames d'avance : les `hold` dernières
+                    # frames lues ne sont jamais réécrites
+                    while self._produced >= self._consumed + self.prefetch and not self._stop.is_set():
+                        self._cond.wait(0.1)
+                    if self._stop.is_set():
+                        break
+                    if self._mode_changed:
+                        # Le premier passage n'est plus homogène : pas de cache
+                        self._mode_changed = False
+                        self._caching = False
+                        self._cache = []
+                    max_width, keyframes_only = self._max_width, self._keyframes_only
+
+                t0 = time.perf_counter()
+                decoded = self._decode_next(max_width, keyframes_only)
+                elapsed = time.perf_counter() - t0
+                if decoded is None:
+                    if self._end_of_pass():
+                        continue
+                    break
+                frame, position = decoded
+                self.decoded += 1
+                self.decode_s += elapsed
+                if self.timings is not None:
+                    self.timings.add("decode", elapsed)
+                if self._caching:
+                    self._add_to_cache(frame, position)
+
+                with self._cond:
+                    self._ready.append((frame, position))
+                    self._produced += 1
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def _decode_next(self, max_width, keyframes_only):
+        """Décode la frame suivante dans le prochain tampon → (frame, position) ou None."""
+        if keyframes_only and not self._seek_next_keyframe():
+            return None
+        if not self.cap.grab():
+            return None
+        position = self._next_position
+        self._next_position += 1
+
+        slot = self._produced % (self.prefetch + self.hold)
+        if max_width is None:
+            ok, frame = self.cap.retrieve(self._slot(slot, None))
+        else:
+            ok, raw = self.cap.retrieve(self._scratch)
+            if ok:
+                self._scratch = raw
+                height, width = raw.shape[:2]
+                scale = min(1.0, max_width / width)
+                size = (round(width * scale), round(height * scale))
+                frame = cv2.resize(raw, size, dst=self._slot(slot, (size[1], size[0], 3)),
+                                   interpolation=cv2.INTER_AREA)
+        if not ok:
+            return None
+        if not self._slots or frame is not self._slots[slot]:
+            # Taille différente de celle des tampons (première frame, changement
+            # de résolution) : nouveaux tampons, les anciens restent aux consommateurs
+            self._allocate(frame.shape)
+            self._slots[slot] = frame
+        return frame, position
+
+    def _slot(self, slot, shape):
+        if not self._slots:
+            return None
+        buffer = self._slots[slot]
+        return buffer if shape is None or buffer.shape == shape else None
+
+    def _allocate(self, shape):
+        self._slots = [np.empty(shape, dtype=np.uint8) for _ in range(self.prefetch + self.hold)]
+
+    def _seek_next_keyframe(self) -> bool:
+        if self._keyframes is None:
+            from video_jobs import keyframe_indices
+
+            # Sans ffprobe : environ une frame par seconde
+            self._keyframes = keyframe_indices(self.path, self.fps) or list(
+                range(0, self.frame_count or 1 << 31, max(1, round(self.fps)))
+            )
+        target = next((k for k in self._keyframes if k >= self._next_position), None)
+        if target is None:
+            return False
+        if target > self._next_position:
+            # Positionnement sur une image clé : pas de décodage des frames intermédiaires
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            self._next_position = target
+        return True
+
+    def _add_to_cache(self, frame, position):
+        size = frame.nbytes * max(len(self._cache) + 1, self.frame_count)
+        if size > self.cache_max_bytes:
+            # Clip trop long pour la mémoire : on se contentera de rouvrir le fichier
+            self._caching = False
+            self._cache = []
+            return
+        self._cache.append((frame.copy(), position))
+
+    def _end_of_pass(self) -> bool:
+        """Fin du fichier : True si le décodage continue (nouveau passage)."""
+        if not self.loop or self._stop.is_set():
+            return False
+        if self._caching and self._cache:
+            # Tout le clip est en mémoire : read() boucle dessus, plus de décodage
+            self._cache_ready = True
+            self.cached_frames = len(self._cache)
+            self.cap.release()
+            return False
+        self.cap.release()
+        self.cap = open_capture(self.path, self.hw_accel)
+        self._next_position = 0
+        self.reopens += 1
+        return self.cap.isOpened()
+
+    def stats(self):
+        return {
+            "decoded": self.decoded,
+            "decode_ms": round(1000.0 * self.decode_s / self.decoded, 3) if self.decoded else 0.0,
+            "consumer_wait_ms": round(1000.0 * self.wait_s / max(1, self._consumed), 3),
+            "cached_frames": self.cached_frames,
+            "reopens": self.reopens,
+            "buffers": len(self._slots),
+        }
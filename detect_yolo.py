@@ -1,13 +1,59 @@
 import tkinter as tk
 from tkinter import filedialog, Label, Button, messagebox
-from PIL import Image, ImageTk
-from ultralytics import YOLO
 from pathlib import Path
-import cv2
+import threading
 import time
-from datetime import datetime
+from functools import cached_property
 from collections import Counter
 
+# Démarrage rapide : seuls les modules légers sont importés ici. OpenCV,
+# NumPy, PIL et les modules qui en dépendent le sont au premier usage
+# (la fenêtre s'affiche sans les attendre).
+from analytics import AnalyticsStore
+from batching import BatchSizer, make_batch_sizer, predict_batch
+from detector import BackgroundDetector
+from metrics import LoopMetrics, start_from_env as start_metrics
+from reports import DetectionReportWriter, new_report_path
+
+# Taille de la zone d'affichage Tkinter
+DISPLAY_SIZE = (750, 450)
+
+# Taille maximale du dossier des images annotées (les plus anciennes sont supprimées)
+OUTPUT_MAX_BYTES = 500 * 1024 * 1024
+
+# Format des rapports détaillés vidéo/webcam : "jsonl", "csv" ou "parquet"
+REPORT_FORMAT = "jsonl"
+
+# Inférence par tuiles sur les images (petits objets sur grandes scènes) :
+# taille des tuiles en pixels et recouvrement. None pour analyser l'image entière.
+IMAGE_TILING = {"tile_size": 640, "tile_overlap": 0.2}
+
+# Zones d'intérêt et classes utiles pour la vidéo et la webcam (voir zones.py
+# et zones.example.json) : sans ce fichier, toute la frame et toutes les classes.
+ZONES_CONFIG = "zones.json"
+
+# Taille des lots pour l'analyse vidéo : un entier, ou "auto" (adaptatif)
+VIDEO_BATCH_SIZE = "auto"
+
+# Décodage vidéo (voir decoder.ThreadedDecoder) : largeur maximale des frames
+# décodées (None = pleine résolution) et aperçu limité aux images clés.
+VIDEO_DECODE = {"max_width": None, "keyframes_only": False}
+
+# Planification de l'inférence (voir scheduler.InferenceScheduler) :
+# les frames statiques réutilisent les dernières détections.
+VIDEO_SCHEDULER = {"stride": 1, "motion_threshold": 3.0, "max_skip": 15}
+WEBCAM_SCHEDULER = {"stride": 1, "motion_threshold": 3.0, "latency_budget_ms": 66.0, "max_skip": 15}
+
+# Régulateur de qualité webcam (voir governor.QualityGovernor) : taille d'entrée,
+# pas d'inférence et taille d'affichage ajustés pour tenir l'objectif. None pour désactiver.
+WEBCAM_GOVERNOR = {"target_fps": 15.0, "latency_slo_ms": 250.0}
+
+# Clips vidéo enregistrés sur événement (voir clips.py), dans clips/ : une règle
+# se déclenche quand au moins `min_count` objets des classes indiquées sont
+# présents. Les `pre_s` secondes précédentes sont gardées en mémoire. [] pour désactiver.
+EVENT_RULES = [{"name": "personne", "classes": ["person"], "min_count": 1, "cooldown_s": 10.0}]
+CLIP_RECORDING = {"pre_s": 5.0, "post_s": 5.0, "max_width": 640, "max_buffer_mb": 64}
+
 
 class YoloApp:
     def __init__(self, root):
@@ -18,16 +64,38 @@ class YoloApp:
         # Couleur de fond
         self.root.configure(bg="#20232a")
 
-        # Charger le modèle YOLO une seule fois
-        self.model = YOLO("yolov8n.pt")
+        # Charger le modèle YOLO une seule fois (backend choisi par
+        # configuration : PyTorch, ONNX Runtime ou OpenVINO, voir detector.py).
+        # Chargement et chauffe en arrière-plan : la fenêtre s'affiche tout de suite.
+        self.model = BackgroundDetector().start()
+        # Le prédicteur Ultralytics n'est pas prévu pour des appels concurrents :
+        # image (thread Tk) et pipeline (thread d'inférence) passent par ce verrou
+        self.model_lock = threading.Lock()
+
+        # Pipeline vidéo/webcam en cours (un seul à la fois), son rapport,
+        # son régulateur de qualité et son enregistreur de clips
+        self.pipeline = None
+        self.pipeline_report = None
+        self.pipeline_governor = None
+        self.pipeline_recorder = None
 
         # Dossiers de sortie
         base_dir = Path(__file__).resolve().parent
         self.output_dir = base_dir / "detect_output"
         self.reports_dir = base_dir / "reports"
+        self.clips_dir = base_dir / "clips"
         self.output_dir.mkdir(exist_ok=True)
         self.reports_dir.mkdir(exist_ok=True)
 
+        # Base d'analyse : comptes par minute et par classe de toutes les
+        # sessions (requêtes : python analytics.py counts --since 7d)
+        self.analytics = AnalyticsStore(base_dir / "analytics" / "analytics.sqlite")
+
+        # Métriques (compteurs, latences, files) : point d'accès HTTP si
+        # METRICS_PORT est défini, voir metrics.py
+        start_metrics()
+        self.image_metrics = LoopMetrics("image")
+
         # Titre
         title_label = tk.Label(
             root,
@@ -76,6 +144,14 @@ class YoloApp:
             command=self.detect_webcam
         ).grid(row=0, column=2, padx=10)
 
+        Button(
+            self.btn_frame,
+            text="📼 Analyse complète",
+            width=20,
+            font=("Segoe UI", 11),
+            command=self.analyse_video_offline
+        ).grid(row=0, column=3, padx=10)
+
         # Zone d'affichage (image détectée)
         self.display_label = Label(root, bg="#20232a")
         self.display_label.pack(pady=20)
@@ -83,12 +159,88 @@ class YoloApp:
         # Label de statut
         self.status_label = tk.Label(
             root,
-            text="Prêt.",
+            text="⏳ Chargement du modèle…",
             font=("Segoe UI", 10),
             bg="#20232a",
             fg="#bbbbbb"
         )
         self.status_label.pack(pady=5)
+        self.poll_model_ready()
+
+    # ─────────────────────────────────────────────
+    # Modèle chargé en arrière-plan
+    # ─────────────────────────────────────────────
+    def poll_model_ready(self):
+        """Indicateur de chargement dans la barre de statut."""
+        if self.model.error is not None:
+            self.status_label.config(text="Erreur : modèle non chargé.")
+            messagebox.showerror("Erreur", f"Impossible de charger le modèle :\n{self.model.error}")
+        elif self.model.ready:
+            self.status_label.config(text=f"✅ Prêt (modèle chargé en {self.model.ready_s:.1f} s).")
+        else:
+            self.root.after(200, self.poll_model_ready)
+
+    def wait_for_model(self):
+        """Première requête avant la fin de la chauffe : on attend, en le disant."""
+        if not self.model.ready:
+            self.status_label.config(text="⏳ Chargement du modèle, un instant…")
+            self.root.update()
+        return self.model.wait()
+
+    # ─────────────────────────────────────────────
+    # Objets créés au premier usage (imports lourds différés)
+    # ─────────────────────────────────────────────
+    @cached_property
+    def weights_hash(self):
+        """Empreinte des poids pour le cache (calculée au premier usage)."""
+        from cache import weights_fingerprint
+
+        return weights_fingerprint(self.model)
+
+    @cached_property
+    def cache(self):
+        """Cache des détections sur image (clé : contenu + poids + paramètres)."""
+        from cache import DetectionCache
+
+        return DetectionCache(self.output_dir.parent / "cache" / "detections.sqlite")
+
+    @cached_property
+    def output_writer(self):
+        """Images annotées : detect_output/images/AAAAMMJJ/, écrites en arrière-plan."""
+        from output import OutputWriter
+
+        return OutputWriter(self.output_dir / "images", max_bytes=OUTPUT_MAX_BYTES)
+
+    @cached_property
+    def sliced_model(self):
+        """Même modèle, image découpée en tuiles (voir tiling.py)."""
+        from tiling import SlicedDetector
+
+        return SlicedDetector(self.model)
+
+    @cached_property
+    def zones(self):
+        from zones import load_zones
+
+        return load_zones(self.output_dir.parent / ZONES_CONFIG)
+
+    @cached_property
+    def frame_display(self):
+        """PhotoImage persistant du label d'affichage (voir render.TkFrameDisplay)."""
+        from render import TkFrameDisplay
+
+        return TkFrameDisplay(self.display_label)
+
+    def new_stream_model(self):
+        """
+        Vidéo / webcam : inférence recadrée sur les zones, classes filtrées ;
+        avec une cascade (YOLO_CASCADE), vérifications propres à ce flux.
+        """
+        from cascade import stream_detector
+        from zones import RoiDetector
+
+        model = stream_detector(self.model)
+        return RoiDetector(model, self.zones) if self.zones else model
 
     # ─────────────────────────────────────────────
     # Utils : génération de rapport texte
@@ -98,63 +250,77 @@ class YoloApp:
         Génère un rapport texte (résumé des classes + confidences)
         à partir d'une liste de Results Ultralytics.
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_path = self.reports_dir / f"report_{timestamp}.txt"
-
-        lines = []
-        lines.append("===== RAPPORT YOLOv8 =====\n")
-        lines.append(f"Source analysée : {source_label}\n\n")
+        report_path = new_report_path(self.reports_dir, "report", "txt")
 
         total_objects = 0
         class_counts = Counter()
 
-        for r in results:
-            boxes = r.boxes
-            names = r.names  # dict id -> nom de classe
+        # Écriture au fil de l'eau : rien n'est accumulé en mémoire
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write("===== RAPPORT YOLOv8 =====\n")
+            f.write(f"Source analysée : {source_label}\n\n")
 
-            if boxes is None or len(boxes) == 0:
-                continue
+            for r in results:
+                boxes = r.boxes
+                names = r.names  # dict id -> nom de classe
 
-            for cls_id, conf in zip(boxes.cls.tolist(), boxes.conf.tolist()):
-                class_name = names[int(cls_id)]
-                total_objects += 1
-                class_counts[class_name] += 1
-                lines.append(f"- {class_name} (confiance: {conf:.3f})\n")
+                if boxes is None or len(boxes) == 0:
+                    continue
 
-        lines.append("\nRésumé par classe :\n")
-        if class_counts:
-            for class_name, count in class_counts.items():
-                lines.append(f"- {class_name} : {count}\n")
-        else:
-            lines.append("Aucun objet détecté.\n")
+                for cls_id, conf in zip(boxes.cls.tolist(), boxes.conf.tolist()):
+                    class_name = names[int(cls_id)]
+                    total_objects += 1
+                    class_counts[class_name] += 1
+                    f.write(f"- {class_name} (confiance: {conf:.3f})\n")
 
-        lines.append(f"\nTotal d’objets détectés : {total_objects}\n")
-        lines.append("===========================\n")
+            f.write("\nRésumé par classe :\n")
+            if class_counts:
+                for class_name, count in class_counts.items():
+                    f.write(f"- {class_name} : {count}\n")
+            else:
+                f.write("Aucun objet détecté.\n")
+
+            f.write(f"\nTotal d’objets détectés : {total_objects}\n")
+            f.write("===========================\n")
 
-        report_path.write_text("".join(lines), encoding="utf-8")
         print(f"Rapport généré : {report_path}")
         return report_path
 
-    def generate_report_from_counter(self, counter: Counter, source_label: str):
+    def generate_report_from_counter(self, counter: Counter, source_label: str,
+                                     tracks: dict = None):
         """
         Génère un rapport à partir d'un Counter (utilisé pour la webcam).
+        `tracks` : résumé d'IoUTracker.summary() (objets uniques + temps de présence).
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_path = self.reports_dir / f"report_{timestamp}.txt"
+        report_path = new_report_path(self.reports_dir, "report", "txt")
 
         lines = []
         lines.append("===== RAPPORT YOLOv8 (Webcam) =====\n")
         lines.append(f"Source : {source_label}\n\n")
 
+        if tracks is not None:
+            if tracks:
+                lines.append("Objets uniques par classe (suivi) :\n")
+                for class_name, info in tracks.items():
+                    lines.append(
+                        f"- {class_name} : {info['objects']} "
+                        f"(présence moyenne {info['mean_dwell_s']:.1f} s, "
+                        f"max {info['max_dwell_s']:.1f} s)\n"
+                    )
+            else:
+                lines.append("Aucun objet suivi.\n")
+            total_unique = sum(info["objects"] for info in tracks.values())
+            lines.append(f"\nTotal d’objets uniques : {total_unique}\n\n")
+
         total_objects = sum(counter.values())
         if counter:
-            lines.append("Résumé par classe (sur toute la session) :\n")
+            lines.append("Détections par classe (sur toute la session) :\n")
             for class_name, count in counter.items():
                 lines.append(f"- {class_name} : {count}\n")
         else:
             lines.append("Aucune détection enregistrée.\n")
 
-        lines.append(f"\nTotal d’objets détectés : {total_objects}\n")
+        lines.append(f"\nTotal de détections : {total_objects}\n")
         lines.append("===========================\n")
 
         report_path.write_text("".join(lines), encoding="utf-8")
@@ -165,6 +331,12 @@ class YoloApp:
     # 1) Détection sur image
     # ─────────────────────────────────────────────
     def detect_image(self):
+        import cv2
+        import numpy as np
+
+        from cache import cached_predict
+        from output import OutputWriter
+
         fichier = filedialog.askopenfilename(
             title="Choisir une image",
             filetypes=[("Images", "*.jpg *.jpeg *.png *.bmp")]
@@ -172,26 +344,47 @@ class YoloApp:
         if not fichier:
             return
 
-        self.status_label.config(text=f"Analyse de l’image : {fichier}")
-        self.root.update()
-
         try:
-            results = self.model(
-                fichier,
-                save=True,
-                project=str(self.output_dir),
-                exist_ok=True,
-                name="images"  # 🔥 toujours le même dossier
+            self.wait_for_model()
+            self.status_label.config(text=f"Analyse de l’image : {fichier}")
+            self.root.update()
+
+            # Cache : une image déjà analysée (même contenu, mêmes poids,
+            # mêmes paramètres) ne repasse pas dans le modèle.
+            image_bytes = Path(fichier).read_bytes()
+            image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("format d’image non reconnu")
+            t0 = time.perf_counter()
+            with self.model_lock:
+                if IMAGE_TILING:
+                    res, hit = cached_predict(
+                        self.sliced_model, self.cache, image, image_bytes, self.weights_hash,
+                        path=fichier, **IMAGE_TILING
+                    )
+                else:
+                    res, hit = cached_predict(
+                        self.model, self.cache, image, image_bytes, self.weights_hash, path=fichier
+                    )
+            self.image_metrics.frame_read()
+            self.image_metrics.stage("cache" if hit else "inference", time.perf_counter() - t0)
+            if not hit:
+                self.image_metrics.frames_inferred()
+            self.image_metrics.detections(res)
+            results = [res]
+            with self.analytics.session(Path(fichier).name, "image") as session:
+                session.write_result(time.time(), res)
+
+            # Image annotée rendue en mémoire et affichée directement ;
+            # l'écriture sur disque se fait en arrière-plan.
+            annotated = res.plot()
+            self.show_array(annotated)
+            image_sortie = self.output_writer.submit(
+                annotated, OutputWriter.content_name(Path(fichier).stem, image_bytes)
             )
-
-
-            # YOLO crée un fichier dans detect_output/image/
-            
-            output_folder = self.output_dir / "images"
-            images = sorted(output_folder.glob("*.jpg"), key=lambda p: p.stat().st_mtime)
-            if images:
-                image_sortie = images[-1]
-                self.show_image(image_sortie)
+            print(f"Image annotée : {image_sortie}")
+            if hit:
+                print(f"Résultat repris du cache : {fichier}")
 
             report_path = self.generate_report_from_results(results, fichier)
             messagebox.showinfo(
@@ -203,10 +396,200 @@ class YoloApp:
             messagebox.showerror("Erreur", f"Erreur lors de l’analyse de l’image :\n{e}")
             self.status_label.config(text="Erreur lors de l’analyse de l’image.")
 
+    # ─────────────────────────────────────────────
+    # Pipeline vidéo/webcam (capture → inférence → UI)
+    # ─────────────────────────────────────────────
+    def start_pipeline(self, cap, counter: Counter, loop: bool, drop_oldest: bool,
+                       show_fps: bool = False, status_prefix: str = "",
+                       end_message: str = "", batch_sizer: BatchSizer = None,
+                       scheduler: "InferenceScheduler" = None, tracker: "IoUTracker" = None,
+                       report: DetectionReportWriter = None, fps: float = None,
+                       governor: "QualityGovernor" = None, recorder: "ClipRecorder" = None,
+                       metrics_source: str = "pipeline"):
+        """
+        Lance un FramePipeline : la lecture et l'inférence tournent dans des
+        threads, le thread Tk ne fait que construire le PhotoImage.
+        Avec `batch_sizer`, plusieurs frames sont envoyées au modèle en un appel ;
+        avec `scheduler`, l'inférence est sautée sur les frames jugées inutiles ;
+        avec `tracker`, les objets reçoivent un identifiant persistant ;
+        avec `report`, chaque détection est écrite au fil de l'eau ; avec
+        `governor`, la qualité (imgsz, pas, affichage) suit le FPS et la latence
+        mesurés ; avec `recorder`, un clip est enregistré quand une règle se
+        déclenche. Les métriques sont publiées sous le nom `metrics_source`.
+        Les horodatages sont `index / fps` pour une vidéo, l'heure de capture sinon.
+        """
+        from pipeline import FramePipeline
+        from render import FrameRenderer
+
+        self.stop_pipeline()
+        self.pipeline_report = report
+        self.pipeline_governor = governor
+        self.pipeline_recorder = recorder
+
+        fps_state = {"prev": time.time()}
+        stream_model = self.new_stream_model()
+
+        def infer_kwargs():
+            return {"imgsz": governor.imgsz} if governor is not None else {}
+
+        def infer(frame):
+            with self.model_lock:
+                return stream_model(frame, **infer_kwargs())[0]
+
+        def infer_batch(frames):
+            with self.model_lock:
+                return predict_batch(stream_model, frames, **infer_kwargs())
+
+        def on_result(packet):
+            if governor is not None:
+                # Latence capture → résultat, sur toutes les frames livrées
+                governor.observe(time.time() - packet.captured_at, pipeline.frames_read)
+            timestamp = packet.index / fps if fps else packet.captured_at
+            if recorder is not None:
+                # Toutes les frames (détections reprises comprises) : clip fluide
+                recorder.add(packet.frame, timestamp, packet.result)
+            # Count classes (thread d'inférence) — uniquement sur les frames
+            # réellement analysées, pour ne pas recompter les détections reprises
+            if not packet.inferred:
+                return
+            res = packet.result
+            boxes = res.boxes
+            names = res.names
+            if boxes is not None and len(boxes) > 0:
+                for cls_id in boxes.cls.tolist():
+                    counter[names[int(cls_id)]] += 1
+            track_ids = None
+            if tracker is not None:
+                track_ids = tracker.update_from_result(res, timestamp)
+            if report is not None:
+                report.write_result(packet.index, timestamp, res, track_ids)
+
+        # Rendu dans des tampons préalloués à la taille d'affichage
+        # (voir render.FrameRenderer), créé une fois la taille des files connue
+        renderer = None
+
+        def render(packet):
+            overlay = None
+            if show_fps:
+                # FPS calculation
+                current_time = time.time()
+                fps_now = 1.0 / max(current_time - fps_state["prev"], 1e-6)
+                fps_state["prev"] = current_time
+                overlay = f"FPS: {fps_now:.1f}"
+
+            # Draw boxes (sur la frame courante, même si les détections sont reprises)
+            return renderer.render_result(packet.frame, packet.result, overlay)
+
+        self.pipeline = pipeline = FramePipeline(
+            cap,
+            infer=infer,
+            infer_batch=infer_batch if batch_sizer is not None else None,
+            batch_sizer=batch_sizer,
+            render=render,
+            on_result=on_result,
+            scheduler=scheduler,
+            loop=loop,
+            drop_oldest=drop_oldest,
+            metrics=LoopMetrics(metrics_source),
+        )
+        # File de sortie + frame en cours de rendu + frame affichée
+        renderer = FrameRenderer(DISPLAY_SIZE, slots=pipeline.output_queue.maxsize + 2)
+        if governor is not None:
+            governor.on_change = lambda level: renderer.set_display_size((
+                round(DISPLAY_SIZE[0] * level["display_scale"]),
+                round(DISPLAY_SIZE[1] * level["display_scale"]),
+            ))
+        self.pipeline.start()
+        self.poll_pipeline(self.pipeline, status_prefix, end_message, time.time())
+
+    def poll_pipeline(self, pipeline, status_prefix: str, end_message: str, last_status: float):
+        """Consommateur côté UI : affiche la dernière frame prête."""
+        if pipeline is not self.pipeline:
+            return
+
+        packet = pipeline.get_latest()
+        if packet is not None:
+            t0 = time.perf_counter()
+            # PhotoImage persistant, mis à jour sur place
+            self.frame_display.show(packet.display)
+            pipeline.timings.add("display", time.perf_counter() - t0)
+
+        if pipeline.error is not None:
+            self.stop_pipeline()
+            messagebox.showerror("Erreur", f"Erreur pendant l’analyse :\n{pipeline.error}")
+            self.status_label.config(text="Erreur pendant l’analyse.")
+            return
+
+        if pipeline.finished:
+            if end_message:
+                self.status_label.config(text=end_message)
+            return
+
+        # Temps par étape, rafraîchis une fois par seconde
+        now = time.time()
+        if now - last_status >= 1.0:
+            status = f"{status_prefix} {pipeline.timings.format_line()}"
+            if self.pipeline_governor is not None:
+                status += f" – {self.pipeline_governor.describe()}"
+            self.status_label.config(text=status)
+            last_status = now
+
+        self.root.after(
+            15, lambda: self.poll_pipeline(pipeline, status_prefix, end_message, last_status)
+        )
+
+    def stop_pipeline(self):
+        from decoder import ThreadedDecoder
+
+        if self.pipeline is not None:
+            pipeline, self.pipeline = self.pipeline, None
+            pipeline.stop()
+            print(f"Temps par étape : {pipeline.timings.summary()}")
+            if pipeline.scheduler is not None:
+                print(f"Planification : {pipeline.scheduler.stats()}")
+            if isinstance(pipeline.cap, ThreadedDecoder):
+                print(f"Décodage : {pipeline.cap.stats()}")
+        if self.pipeline_governor is not None:
+            print(f"Régulateur de qualité : {self.pipeline_governor.stats()}")
+            self.pipeline_governor = None
+        if self.pipeline_report is not None:
+            self.pipeline_report.close()
+            self.pipeline_report = None
+        if self.pipeline_recorder is not None:
+            clips = self.pipeline_recorder.close()
+            print(f"Clips enregistrés : {len(clips)} ({self.pipeline_recorder.stats()})")
+            self.pipeline_recorder = None
+
+    def open_report_writer(self, source_label: str, kind: str, source: str, time_origin: float = 0.0):
+        """
+        Rapport structuré (une ligne par détection) dans reports/, doublé d'une
+        session dans la base d'analyse sous le nom `source`.
+        """
+        path = new_report_path(self.reports_dir, "detections", REPORT_FORMAT)
+        session = self.analytics.session(source, kind, time_origin)
+        return DetectionReportWriter(path, fmt=REPORT_FORMAT, source=source_label, zones=self.zones,
+                                     analytics=session)
+
+    def open_clip_recorder(self, source: str, fps: float = None):
+        """
+        Enregistreur de clips sur événement (EVENT_RULES), ou None s'il n'y a
+        pas de règle. Pour un fichier (`fps` connu), aucune frame n'est sautée.
+        """
+        from clips import ClipRecorder
+
+        if not EVENT_RULES:
+            return None
+        return ClipRecorder(EVENT_RULES, fps=fps, out_dir=self.clips_dir, source=source,
+                            block=fps is not None, **CLIP_RECORDING)
+
     # ─────────────────────────────────────────────
     # 2) Détection vidéo
     # ─────────────────────────────────────────────
     def detect_video(self):
+        from decoder import ThreadedDecoder
+        from scheduler import InferenceScheduler
+        from tracker import IoUTracker
+
         fichier = filedialog.askopenfilename(
             title="Choose a video",
             filetypes=[("Videos", "*.mp4 *.avi *.mov *.mkv")]
@@ -214,64 +597,107 @@ class YoloApp:
         if not fichier:
             return
 
+        try:
+            self.wait_for_model()
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de charger le modèle :\n{e}")
+            self.status_label.config(text="Erreur : modèle non chargé.")
+            return
         self.status_label.config(text=f"Processing video: {fichier}")
         self.root.update()
 
-        # Open the video
-        cap = cv2.VideoCapture(fichier)
+        # Open the video : décodage dans un thread, clip court gardé en mémoire pour la boucle
+        cap = ThreadedDecoder(fichier, loop=True, **VIDEO_DECODE)
         if not cap.isOpened():
             messagebox.showerror("Error", "Unable to open the video.")
             return
 
         video_class_counter = Counter()
 
-        def process_frame():
-            ret, frame = cap.read()
-
-            # 🔁 If video finished → restart from frame 0
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = cap.read()
-
-            # Safety check
-            if not ret:
-                return
-
-            # YOLO inference
-            results = self.model(frame)
-            res = results[0]
-            boxes = res.boxes
-            names = res.names
-
-            # Count classes
-            if boxes is not None and len(boxes) > 0:
-                for cls_id in boxes.cls.tolist():
-                    video_class_counter[names[int(cls_id)]] += 1
-
-            # Draw boxes
-            annotated = res.plot()
-
-            # Convert BGR → RGB for Tkinter
-            annotated = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-
-            img = Image.fromarray(annotated)
-            img = img.resize((750, 450))
-            img_tk = ImageTk.PhotoImage(img)
-
-            self.display_label.configure(image=img_tk)
-            self.display_label.image = img_tk
-
-            # Process next frame
-            self.root.after(1, process_frame)
-
-        process_frame()
+        # 🔁 La vidéo boucle (par le décodeur) ; aucune frame n'est perdue (drop_oldest=False).
+        # Inférence par lots : on privilégie le débit total au délai par frame.
+        self.start_pipeline(
+            cap,
+            video_class_counter,
+            loop=False,
+            drop_oldest=False,
+            status_prefix="Vidéo :",
+            batch_sizer=make_batch_sizer(VIDEO_BATCH_SIZE),
+            scheduler=InferenceScheduler(**VIDEO_SCHEDULER),
+            # Suivi : identifiant persistant par objet dans le rapport, comme pour la webcam
+            tracker=IoUTracker(),
+            # Horodatages = position dans la vidéo, comptée à partir de maintenant
+            report=self.open_report_writer(fichier, "video", Path(fichier).name, time.time()),
+            fps=cap.fps,
+            recorder=self.open_clip_recorder(fichier, cap.fps),
+            metrics_source=Path(fichier).name,
+        )
 
+    def analyse_video_offline(self):
+        """
+        Analyse complète d'une vidéo (sans boucle ni affichage) : segments
+        traités en parallèle par video_jobs.VideoJob. Une analyse interrompue
+        reprend là où elle s'était arrêtée si on relance la même vidéo.
+        """
+        fichier = filedialog.askopenfilename(
+            title="Choisir une vidéo à analyser entièrement",
+            filetypes=[("Videos", "*.mp4 *.avi *.mov *.mkv")]
+        )
+        if not fichier:
+            return
 
+        from video_jobs import VideoJob, store_upload
+
+        progress = {"done": 0, "total": 0, "summary": None, "error": None}
+
+        def run():
+            try:
+                with open(fichier, "rb") as f:
+                    video_path = store_upload(f, Path(fichier).suffix)
+                job = VideoJob(video_path)
+                progress["total"] = len(job.plan["segments"])
+                progress["summary"] = job.run(
+                    on_progress=lambda done, total: progress.update(done=done)
+                )
+            except Exception as e:
+                progress["error"] = e
+
+        def poll():
+            if progress["error"] is not None:
+                messagebox.showerror("Erreur", f"Erreur pendant l’analyse :\n{progress['error']}")
+                self.status_label.config(text="Erreur pendant l’analyse.")
+            elif progress["summary"] is not None:
+                summary = progress["summary"]
+                self.generate_report_from_counter(Counter(summary["class_counts"]), fichier)
+                self.status_label.config(
+                    text=f"Analyse terminée : {summary['frames_analysed']} frames → {summary['results']}"
+                )
+            else:
+                self.status_label.config(
+                    text=f"Analyse complète : segment {progress['done']}/{progress['total'] or '?'}"
+                )
+                self.root.after(500, poll)
+
+        self.status_label.config(text=f"Préparation de l’analyse : {fichier}")
+        threading.Thread(target=run, name="video-job", daemon=True).start()
+        poll()
 
     # ─────────────────────────────────────────────
     # 3) Détection via webcam (avec FPS + rapport)
     # ─────────────────────────────────────────────
     def detect_webcam(self):
+        import cv2
+
+        from governor import QualityGovernor
+        from scheduler import InferenceScheduler
+        from tracker import IoUTracker
+
+        try:
+            self.wait_for_model()
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de charger le modèle :\n{e}")
+            self.status_label.config(text="Erreur : modèle non chargé.")
+            return
         self.status_label.config(text="Webcam active…")
         self.root.update()
 
@@ -281,63 +707,9 @@ class YoloApp:
             self.status_label.config(text="Erreur : webcam non disponible.")
             return
 
-        prev_time = time.time()
         class_counts = Counter()
-        self.webcam_running = True
-
-        def update_frame():
-            if not self.webcam_running:
-                cap.release()
-                return
-
-            ret, frame = cap.read()
-            if not ret:
-                self.status_label.config(text="Erreur : lecture webcam.")
-                return
-
-            # YOLO inference
-            results = self.model(frame)
-            res = results[0]
-
-            # Count classes
-            boxes = res.boxes
-            names = res.names
-            if boxes is not None and len(boxes) > 0:
-                for cls_id in boxes.cls.tolist():
-                    class_counts[names[int(cls_id)]] += 1
-
-            # Annotated frame
-            annotated = res.plot()
-
-            # FPS calculation
-            nonlocal prev_time
-            current_time = time.time()
-            fps = 1.0 / (current_time - prev_time)
-            prev_time = current_time
-
-            # Add FPS text
-            cv2.putText(
-                annotated,
-                f"FPS: {fps:.1f}",
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1,
-                (0, 255, 0),
-                2,
-                cv2.LINE_AA,
-            )
-
-            # Convert OpenCV → Tkinter image
-            annotated = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(annotated)
-            img = img.resize((750, 450))
-            img_tk = ImageTk.PhotoImage(img)
-
-            self.display_label.configure(image=img_tk)
-            self.display_label.image = img_tk
-
-            # Schedule next frame
-            self.root.after(1, update_frame)
+        # Suivi : compte les objets (et non les détections) et leur temps de présence
+        tracker = IoUTracker()
 
         # Create a STOP button
         stop_button = tk.Button(
@@ -353,25 +725,57 @@ class YoloApp:
 
         def stop_webcam():
             """Stop webcam loop and generate report"""
-            self.webcam_running = False
+            self.stop_pipeline()
             stop_button.destroy()
-            report_path = self.generate_report_from_counter(class_counts, "Webcam (session)")
+            report_path = self.generate_report_from_counter(
+                class_counts, "Webcam (session)", tracks=tracker.summary(self.model.names)
+            )
             messagebox.showinfo(
                 "Webcam",
                 f"Session webcam terminée.\nRapport généré :\n{report_path}"
             )
             self.status_label.config(text="Webcam arrêtée.")
 
-        update_frame()
+        scheduler = InferenceScheduler(**WEBCAM_SCHEDULER)
+        governor = None
+        if WEBCAM_GOVERNOR:
+            governor = QualityGovernor(
+                **WEBCAM_GOVERNOR, imgsz_levels=self.governor_imgsz_levels(), scheduler=scheduler
+            )
+
+        # drop_oldest=True : la latence reste bornée même si l'inférence est lente
+        self.start_pipeline(
+            cap,
+            class_counts,
+            loop=False,
+            drop_oldest=True,
+            show_fps=True,
+            status_prefix="Webcam active –",
+            end_message="Erreur : lecture webcam.",
+            scheduler=scheduler,
+            tracker=tracker,
+            report=self.open_report_writer("Webcam (session)", "webcam", "webcam"),
+            governor=governor,
+            recorder=self.open_clip_recorder("webcam"),
+            metrics_source="webcam",
+        )
+
+    def governor_imgsz_levels(self):
+        """Tailles d'entrée essayées par le régulateur, de la taille configurée à 320."""
+        base = getattr(self.model, "imgsz", 640)
+        return tuple(dict.fromkeys(size for size in (base, 512, 416, 320) if size <= base))
 
 
     # ─────────────────────────────────────────────
-    # Afficher une image dans Tkinter
+    # Afficher une image (tableau OpenCV BGR) dans Tkinter
     # ─────────────────────────────────────────────
-    def show_image(self, path: Path):
-        img = Image.open(path)
+    def show_array(self, image_bgr):
+        import cv2
+        from PIL import Image, ImageTk
+
+        img = Image.fromarray(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB))
         # Resize en gardant une taille raisonnable
-        img = img.resize((750, 450))
+        img = img.resize(DISPLAY_SIZE)
         img_tk = ImageTk.PhotoImage(img)
 
         self.display_label.configure(image=img_tk)
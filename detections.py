@@ -0,0 +1,38 @@
+import numpy as np
+
+
+# ─────────────────────────────────────────────
+# Conversion des Results Ultralytics
+# ─────────────────────────────────────────────
+def result_arrays(res):
+    """
+    Extrait les détections d'un Results sous forme de tableaux NumPy :
+    (xyxy float32 [N, 4], conf float32 [N], cls int64 [N]).
+    """
+    boxes = res.boxes
+    if boxes is None or len(boxes) == 0:
+        return (
+            np.zeros((0, 4), dtype=np.float32),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.int64),
+        )
+    return (
+        boxes.xyxy.cpu().numpy().astype(np.float32, copy=False),
+        boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+        boxes.cls.cpu().numpy().astype(np.int64),
+    )
+
+
+def result_to_dicts(res):
+    """Liste de détections sérialisables : classe, confiance et boîte (x1, y1, x2, y2)."""
+    xyxy, conf, cls = result_arrays(res)
+    names = res.names
+    return [
+        {
+            "class": names[int(c)],
+            "class_id": int(c),
+            "confidence": round(float(p), 4),
+            "box": [round(float(v), 1) for v in box],
+        }
+        for box, p, c in zip(xyxy, conf, cls)
+    ]
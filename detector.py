@@ -0,0 +1,357 @@
+"""
+Détecteur commun à toutes les interfaces (Tkinter, Streamlit, scripts).
+
+Le backend est choisi par configuration (variables d'environnement) :
+    YOLO_WEIGHTS  modèle : nom du registre (MODEL_ZOO) ou chemin de poids
+                  PyTorch                      (défaut : nano)
+    YOLO_BACKEND  torch | onnx | openvino      (défaut : torch)
+    YOLO_HALF     1 pour exporter en FP16      (OpenVINO)
+    YOLO_INT8     1 pour exporter en INT8      (OpenVINO, calibration coco8)
+    YOLO_IMGSZ    taille d'entrée              (défaut : 640)
+    YOLO_SERVER   adresse d'un model_server.py (socket Unix ou hôte:port) :
+                  si défini, le modèle n'est pas chargé dans le processus
+    YOLO_CASCADE  grand modèle (nom ou poids) qui revérifie les détections
+                  douteuses de YOLO_WEIGHTS (voir cascade.py) ; vide = aucun
+    YOLO_CASCADE_CONF  confiance à partir de laquelle le petit modèle n'est
+                  pas revérifié             (défaut : 0.5)
+
+Le modèle est exporté une seule fois (à côté des poids) puis rechargé
+directement aux démarrages suivants.
+
+En ligne de commande :
+    python detector.py export --backend onnx
+    python detector.py parity --backend openvino Ydger.jpg park_picnic_people_1764681803186.png
+"""
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Registre des modèles : nom → poids Ultralytics (téléchargés au premier usage).
+# Partout où des poids sont attendus, un nom du registre convient aussi.
+MODEL_ZOO = {
+    "nano": "yolov8n.pt",
+    "small": "yolov8s.pt",
+    "medium": "yolov8m.pt",
+    "large": "yolov8l.pt",
+    "xlarge": "yolov8x.pt",
+}
+
+
+def resolve_weights(weights: str) -> str:
+    """Nom du registre → fichier de poids ; un chemin est rendu tel quel."""
+    return MODEL_ZOO.get(weights, weights)
+
+
+# ─────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "oui")
+
+
+def detector_config_from_env():
+    return {
+        "weights": os.environ.get("YOLO_WEIGHTS", "nano"),
+        "backend": os.environ.get("YOLO_BACKEND", "torch").strip().lower(),
+        "half": _env_flag("YOLO_HALF"),
+        "int8": _env_flag("YOLO_INT8"),
+        "imgsz": int(os.environ.get("YOLO_IMGSZ", "640")),
+        "server": os.environ.get("YOLO_SERVER", "").strip(),
+        "cascade": os.environ.get("YOLO_CASCADE", "").strip(),
+        "cascade_conf": float(os.environ.get("YOLO_CASCADE_CONF", "0.5")),
+    }
+
+
+# ─────────────────────────────────────────────
+# Export vers un runtime CPU optimisé
+# ─────────────────────────────────────────────
+def exported_path(weights: str, backend: str, half: bool = False, int8: bool = False) -> Path:
+    """
+    Chemin de l'export de `weights` pour ce backend, précision comprise
+    (`_int8`, `_fp16`) : un export FP32 n'est jamais repris pour du FP16.
+    """
+    stem = Path(resolve_weights(weights)).with_suffix("")
+    precision = "_int8" if int8 else "_fp16" if half else ""
+    if backend == "onnx":
+        return Path(f"{stem}{precision}.onnx")
+    if backend == "openvino":
+        return Path(f"{stem}{precision}_openvino_model")
+    return Path(weights)
+
+
+def export_model(weights: str, backend: str, half: bool = False, int8: bool = False,
+                 imgsz: int = 640, force: bool = False) -> Path:
+    """
+    Exporte les poids PyTorch vers `backend` si ce n'est pas déjà fait.
+    Retourne le chemin du modèle exporté.
+    """
+    from ultralytics import YOLO
+
+    weights = resolve_weights(weights)
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+    if backend == "torch":
+        return Path(weights)
+
+    target = exported_path(weights, backend, half, int8)
+    if target.exists() and not force:
+        return target
+
+    print(f"Export du modèle {weights} → {backend} (une seule fois)…")
+    # dynamic=True : l'inférence par lots (batching.py) reste possible
+    exported = Path(YOLO(weights).export(
+        format=backend, half=half, int8=int8, imgsz=imgsz, dynamic=True, device="cpu"
+    ))
+    if exported.resolve() != target.resolve():
+        # Ultralytics ne met pas toujours la précision dans le nom : l'export
+        # est rangé sous le nôtre pour être retrouvé au prochain démarrage
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists():
+            target.unlink()
+        os.replace(exported, target)
+    return target
+
+
+# ─────────────────────────────────────────────
+# Détecteur
+# ─────────────────────────────────────────────
+class Detector:
+    """
+    Enveloppe autour d'un YOLO Ultralytics, quel que soit le backend.
+    S'utilise comme le modèle : `detector(image_ou_liste)` → liste de Results.
+    """
+
+    def __init__(self, weights: str = "nano", backend: str = "torch",
+                 half: bool = False, int8: bool = False, imgsz: int = 640):
+        from ultralytics import YOLO
+
+        self.weights = resolve_weights(weights)
+        self.backend = backend
+        self.imgsz = imgsz
+        self.model_path = export_model(weights, backend, half, int8, imgsz)
+        self.model = YOLO(str(self.model_path), task="detect")
+
+    @property
+    def names(self):
+        return self.model.names
+
+    @property
+    def ckpt_path(self):
+        """Fichier réellement chargé (sert d'empreinte pour le cache)."""
+        return str(self.model_path)
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        return self.model(source, **kwargs)
+
+    def __repr__(self):
+        return f"Detector({self.model_path}, backend={self.backend})"
+
+
+def load_detector(**overrides):
+    """
+    Détecteur configuré par l'environnement (voir l'en-tête du module).
+    Avec YOLO_SERVER, renvoie un client du serveur partagé s'il répond
+    (la cascade éventuelle est alors celle du serveur), sinon charge le
+    modèle localement. Avec YOLO_CASCADE, renvoie un CascadeDetector.
+    """
+    config = detector_config_from_env()
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    server = config.pop("server")
+    cascade = config.pop("cascade")
+    cascade_conf = config.pop("cascade_conf")
+    if server:
+        from model_server import RemoteDetector
+
+        try:
+            return RemoteDetector(server)
+        except OSError as e:
+            print(f"Serveur de détection indisponible ({server}) : {e}. Chargement local du modèle.")
+    detector = Detector(**config)
+    if cascade and resolve_weights(cascade) != detector.weights:
+        from cascade import CascadeDetector
+
+        accurate = Detector(**dict(config, weights=cascade))
+        detector = CascadeDetector(detector, accurate, accept_conf=cascade_conf)
+    return detector
+
+
+# ─────────────────────────────────────────────
+# Chargement en arrière-plan (démarrage rapide des interfaces)
+# ─────────────────────────────────────────────
+class BackgroundDetector:
+    """
+    Charge le détecteur (import d'ultralytics/torch, lecture ou export des
+    poids) puis le chauffe par une inférence factice, dans un thread.
+    L'interface s'affiche tout de suite ; l'objet s'utilise comme le
+    détecteur et n'attend que si le chargement n'est pas terminé.
+
+        model = BackgroundDetector().start()
+        model.ready          # indicateur pour l'interface
+        model(frame)         # attend la fin du chargement si besoin
+    """
+
+    def __init__(self, warmup_shape=(480, 640, 3), **overrides):
+        import threading
+
+        self.overrides = overrides
+        self.warmup_shape = warmup_shape
+        self.error = None
+        self.load_s = None
+        self.warmup_s = None
+        self._model = None
+        self._started_at = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+
+    def start(self):
+        import time
+
+        self._started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _load(self):
+        import time
+
+        import numpy as np
+
+        try:
+            t0 = time.perf_counter()
+            model = load_detector(**self.overrides)
+            self.load_s = time.perf_counter() - t0
+            # Le premier appel paie l'initialisation du runtime : pas l'utilisateur
+            t0 = time.perf_counter()
+            if hasattr(model, "warmup"):
+                model.warmup(self.warmup_shape)  # cascade : les deux modèles
+            else:
+                model(np.zeros(self.warmup_shape, dtype=np.uint8), verbose=False)
+            self.warmup_s = time.perf_counter() - t0
+            self._model = model
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and self.error is None
+
+    @property
+    def ready_s(self):
+        """Durée entre start() et le modèle prêt (None tant qu'il ne l'est pas)."""
+        if not self.ready:
+            return None
+        return self.load_s + self.warmup_s
+
+    def wait(self, timeout: float = None):
+        """Retourne le détecteur chargé ; relève l'erreur de chargement s'il y en a eu une."""
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Le modèle n'est pas encore chargé.")
+        if self.error is not None:
+            raise RuntimeError(f"Échec du chargement du modèle : {self.error}") from self.error
+        return self._model
+
+    def __call__(self, source, **kwargs):
+        return self.wait()(source, **kwargs)
+
+    def __getattr__(self, name):
+        # names, ckpt_path, imgsz… : délégués au détecteur (après chargement)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.wait(), name)
+
+    def __repr__(self):
+        return repr(self._model) if self._model is not None else "BackgroundDetector(chargement…)"
+
+
+# ─────────────────────────────────────────────
+# Vérification de parité avec la référence PyTorch
+# ─────────────────────────────────────────────
+def compare_results(reference, candidate, iou_threshold: float = 0.5):
+    """
+    Compare deux Results sur la même image : part des boîtes de référence
+    retrouvées (même classe, IoU ≥ seuil), IoU moyen et écart de confiance max.
+    """
+    import numpy as np
+
+    from detections import result_arrays
+    from tracker import greedy_match, iou_matrix
+
+    ref_xyxy, ref_conf, ref_cls = result_arrays(reference)
+    cand_xyxy, cand_conf, cand_cls = result_arrays(candidate)
+
+    scores = iou_matrix(ref_xyxy, cand_xyxy)
+    scores[ref_cls[:, None] != cand_cls[None, :]] = 0.0
+    matches = greedy_match(scores, iou_threshold)
+
+    ious = [scores[r, c] for r, c in matches]
+    conf_diffs = [abs(ref_conf[r] - cand_conf[c]) for r, c in matches]
+    return {
+        "reference_boxes": len(ref_xyxy),
+        "candidate_boxes": len(cand_xyxy),
+        "matched": len(matches),
+        "recall": len(matches) / len(ref_xyxy) if len(ref_xyxy) else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "max_conf_diff": float(np.max(conf_diffs)) if conf_diffs else 0.0,
+    }
+
+
+def parity_check(candidate: Detector, images, reference: Detector = None,
+                 min_recall: float = 0.95, min_iou: float = 0.9):
+    """Lance la référence PyTorch et `candidate` sur `images`. Retourne (ok, rapports)."""
+    reference = reference or Detector(candidate.weights, "torch", imgsz=candidate.imgsz)
+    reports = {}
+    ok = True
+    for image in images:
+        ref = reference(str(image), verbose=False)[0]
+        cand = candidate(str(image), verbose=False)[0]
+        report = compare_results(ref, cand)
+        report["ok"] = report["recall"] >= min_recall and (
+            report["matched"] == 0 or report["mean_iou"] >= min_iou
+        )
+        ok = ok and report["ok"]
+        reports[str(image)] = report
+    return ok, reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export et vérification des backends YOLO.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("images", nargs="*", default=["Ydger.jpg"],
+                        help="Images pour la vérification de parité.")
+    parser.add_argument("--weights", default=None, help="Nom du registre (nano, small…) ou chemin.")
+    parser.add_argument("--backend", default=None, choices=BACKENDS)
+    parser.add_argument("--half", action="store_true", default=None)
+    parser.add_argument("--int8", action="store_true", default=None)
+    parser.add_argument("--imgsz", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Réexporter même si l'export existe.")
+    args = parser.parse_args(argv)
+
+    config = detector_config_from_env()
+    config.update({k: v for k, v in vars(args).items()
+                   if k in config and v is not None})
+    for key in ("server", "cascade", "cascade_conf"):
+        config.pop(key)
+
+    if args.command == "export":
+        path = export_model(config["weights"], config["backend"], config["half"],
+                            config["int8"], config["imgsz"], force=args.force)
+        print(f"Modèle prêt : {path}")
+        return 0
+
+    ok, reports = parity_check(Detector(**config), args.images)
+    for image, report in reports.items():
+        status = "OK" if report["ok"] else "ÉCART"
+        print(f"[{status}] {image} : {report['matched']}/{report['reference_boxes']} boîtes, "
+              f"IoU moyen {report['mean_iou']:.3f}, écart de confiance max {report['max_conf_diff']:.3f}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Régulateur de qualité pour les sources en direct (webcam, caméras).
+
+Il mesure le débit de frames affichées et la latence capture → résultat,
+et descend ou remonte une « échelle de qualité » pour tenir l'objectif
+(FPS cible et/ou latence maximale) :
+
+    niveau 0   imgsz 640, toutes les frames analysées, affichage plein
+    …          imgsz réduit (l'inférence coûte ~ imgsz²)
+    …          puis une frame analysée sur 2, 3… (les autres reprennent les détections)
+    dernier    puis affichage réduit
+
+Descente dès qu'une fenêtre de mesure est mauvaise, remontée seulement
+après plusieurs fenêtres confortables ; un niveau qui vient d'échouer
+demande deux fois plus de patience à chaque nouvel échec (pas d'oscillation).
+Chaque changement est affiché et gardé dans `history`.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+
+class QualityGovernor:
+    """
+    Lit les mesures via `observe()` (thread d'inférence) ; les consommateurs
+    lisent `imgsz`, `stride` et `display_scale`. `on_change(level)` est
+    appelé après chaque ajustement. Avec `scheduler` (InferenceScheduler),
+    son `stride` est mis à jour directement (jamais sous sa valeur initiale).
+    """
+
+    def __init__(self, target_fps: Optional[float] = 15.0, latency_slo_ms: Optional[float] = None,
+                 imgsz_levels=(640, 512, 416, 320), max_stride: int = 4,
+                 display_scales=(1.0, 0.75, 0.5), window: float = 2.0,
+                 upgrade_after: int = 3, scheduler=None, on_change=None, verbose: bool = True):
+        if target_fps is None and latency_slo_ms is None:
+            raise ValueError("Il faut un FPS cible ou une latence maximale.")
+        self.target_fps = target_fps
+        self.latency_slo_ms = latency_slo_ms
+        self.window = window
+        self.upgrade_after = upgrade_after
+        self.scheduler = scheduler
+        self.on_change = on_change
+        self.verbose = verbose
+
+        # Échelle : on dégrade d'abord la résolution d'entrée, puis le pas,
+        # puis l'affichage (ce que l'utilisateur remarque le plus).
+        full_display = display_scales[0]
+        self.levels = [{"imgsz": s, "stride": 1, "display_scale": full_display} for s in imgsz_levels]
+        self.levels += [{"imgsz": imgsz_levels[-1], "stride": k, "display_scale": full_display}
+                        for k in range(2, max_stride + 1)]
+        self.levels += [{"imgsz": imgsz_levels[-1], "stride": max(1, max_stride), "display_scale": s}
+                        for s in display_scales[1:]]
+
+        self.level = 0
+        self.history = []
+        self.last_fps = 0.0
+        self.last_latency_ms = 0.0
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._frames = 0
+        self._window_start = time.monotonic()
+        self._read_start = None
+        self._good_windows = 0
+        self._failures = {}  # niveau → nombre de remontées vers ce niveau ayant échoué
+        self._base_stride = scheduler.stride if scheduler is not None else 1
+        self._apply()
+
+    # ── réglages courants ─────────────────────
+    @property
+    def imgsz(self) -> int:
+        return self.levels[self.level]["imgsz"]
+
+    @property
+    def stride(self) -> int:
+        return self.levels[self.level]["stride"]
+
+    @property
+    def display_scale(self) -> float:
+        return self.levels[self.level]["display_scale"]
+
+    def describe(self) -> str:
+        return (f"niveau {self.level}/{len(self.levels) - 1} : imgsz {self.imgsz}, "
+                f"1 frame sur {self.stride}, affichage ×{self.display_scale:g}")
+
+    # ── mesures ───────────────────────────────
+    def observe(self, latency_s: float, frames_read: Optional[int] = None):
+        """Une frame livrée ; `frames_read` (compteur de la capture) sert à estimer la cadence source."""
+        with self._lock:
+            self._frames += 1
+            self._latencies.append(1000.0 * latency_s)
+            elapsed = time.monotonic() - self._window_start
+            if elapsed < self.window:
+                return
+            fps = self._frames / elapsed
+            source_fps = None
+            if frames_read is not None:
+                if self._read_start is not None:
+                    source_fps = (frames_read - self._read_start) / elapsed
+                self._read_start = frames_read
+            latency = float(np.percentile(self._latencies, 90))
+            self._frames = 0
+            self._latencies = []
+            self._window_start = time.monotonic()
+            self._decide(fps, latency, source_fps)
+
+    def _decide(self, fps: float, latency_ms: float, source_fps: Optional[float]):
+        self.last_fps, self.last_latency_ms = fps, latency_ms
+        # La source ne peut pas livrer plus que sa propre cadence
+        target = self.target_fps
+        if target is not None and source_fps:
+            target = min(target, source_fps)
+
+        reasons = []
+        if target is not None and fps < 0.9 * target:
+            reasons.append(f"{fps:.1f} FPS < {target:.1f}")
+        if self.latency_slo_ms is not None and latency_ms > self.latency_slo_ms:
+            reasons.append(f"latence p90 {latency_ms:.0f} ms > {self.latency_slo_ms:.0f}")
+        if reasons:
+            self._good_windows = 0
+            if self.history and self.history[-1]["to"] == self.level < self.history[-1]["from"]:
+                # La dernière remontée n'a pas tenu
+                self._failures[self.level] = self._failures.get(self.level, 0) + 1
+            if self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1, ", ".join(reasons))
+            return
+
+        comfortable = (
+            (target is None or fps >= 0.97 * target)
+            and (self.latency_slo_ms is None or latency_ms < 0.6 * self.latency_slo_ms)
+        )
+        self._good_windows = self._good_windows + 1 if comfortable else 0
+        patience = self.upgrade_after * 2 ** self._failures.get(self.level - 1, 0)
+        if self._good_windows >= patience and self.level > 0:
+            self._good_windows = 0
+            self._set_level(self.level - 1, f"marge : {fps:.1f} FPS, latence p90 {latency_ms:.0f} ms")
+
+    def _set_level(self, level: int, reason: str):
+        previous = self.level
+        self.level = level
+        self._apply()
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "from": previous,
+            "to": level,
+            "reason": reason,
+            **self.levels[level],
+        }
+        self.history.append(entry)
+        if self.verbose:
+            direction = "↓" if level > previous else "↑"
+            print(f"[qualité {direction}] {reason} → {self.describe()}")
+        if self.on_change is not None:
+            self.on_change(self.levels[level])
+
+    def _apply(self):
+        if self.scheduler is not None:
+            self.scheduler.stride = max(self._base_stride, self.stride)
+
+    def stats(self):
+        return {
+            "level": self.level,
+            **self.levels[self.level],
+            "fps": round(self.last_fps, 2),
+            "latency_p90_ms": round(self.last_latency_ms, 1),
+            "adjustments": len(self.history),
+        }
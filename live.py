@@ -0,0 +1,201 @@
+"""
+Flux en direct (webcam ou fichier) analysé en arrière-plan, pour une page web.
+
+Chaque session Streamlit possède son LiveSession : capture, inférence et
+suivi tournent dans les threads d'un FramePipeline, jamais dans le thread
+du script. La page vient chercher la dernière image à sa propre cadence
+(`latest_jpeg()`) : l'image n'est dessinée et compressée en JPEG, à la
+taille demandée, que lorsqu'une page l'a réclamée — pas à chaque frame.
+
+Le modèle est partagé entre les sessions ; `model_lock` sérialise les
+appels (le prédicteur Ultralytics n'est pas prévu pour des appels
+concurrents). Sans lecture de la page pendant `idle_timeout` secondes
+(onglet fermé, autre mode), la session s'arrête d'elle-même.
+"""
+import threading
+import time
+from collections import Counter
+
+import cv2
+
+from decoder import ThreadedDecoder
+from metrics import LoopMetrics
+from pipeline import FramePipeline
+from render import FrameRenderer
+from streams import RateMeter
+
+
+class PacedCapture:
+    """Lit un fichier à sa cadence native, comme une caméra."""
+
+    def __init__(self, cap, fps: float):
+        self.cap = cap
+        self.period = 1.0 / (fps or 30.0)
+        self._next = time.monotonic()
+
+    def read(self):
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._next = max(self._next + self.period, time.monotonic())
+        return self.cap.read()
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+class LiveSession:
+    """
+    `source` : index de webcam (int) ou chemin de fichier vidéo (lu en boucle
+    si `loop`). `scheduler` (InferenceScheduler), `governor` (QualityGovernor),
+    `analytics` (analytics.SessionRecorder) et `recorder` (clips.ClipRecorder)
+    sont optionnels.
+    """
+
+    def __init__(self, model, source, loop: bool = True, display_width: int = 640,
+                 jpeg_quality: int = 75, scheduler=None, governor=None, analytics=None,
+                 recorder=None, model_lock=None, idle_timeout: float = 15.0, metrics_source: str = "live"):
+        self.model = model
+        self.source = source
+        self.jpeg_quality = jpeg_quality
+        self.scheduler = scheduler
+        self.governor = governor
+        self.analytics = analytics
+        self.recorder = recorder
+        self.model_lock = model_lock or threading.Lock()
+        self.idle_timeout = idle_timeout
+
+        if isinstance(source, int):
+            cap = cv2.VideoCapture(source)
+        else:
+            decoder = ThreadedDecoder(source, loop=loop)
+            cap = PacedCapture(decoder, decoder.fps)
+        if not cap.isOpened():
+            raise RuntimeError(f"Impossible d'ouvrir la source : {source}")
+
+        self.renderer = FrameRenderer(width=display_width)
+        self.class_counts = Counter()
+        self.last_counts = Counter()
+        self.infer_rate = RateMeter()
+        self.stop_reason = None
+
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._jpeg = None
+        self._seq = 0
+        self._last_pull = time.monotonic()
+        self._stopped = False
+
+        self.display_width = display_width
+        if governor is not None:
+            governor.on_change = self._resize_display
+        self.pipeline = FramePipeline(
+            cap,
+            infer=self._infer,
+            scheduler=scheduler,
+            render=self._render,
+            on_result=self._on_result,
+            drop_oldest=True,
+            metrics=LoopMetrics(metrics_source),
+            deliver=False,
+        )
+
+    # ── cycle de vie ──────────────────────────
+    def start(self):
+        self.pipeline.start()
+        return self
+
+    def stop(self, reason: str = "arrêt demandé"):
+        """
+        Arrêt propre (idempotent) : threads joints, source libérée, session
+        d'analyse et clip en cours fermés.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self.stop_reason = reason
+        self.pipeline.stop()
+        if self.analytics is not None:
+            self.analytics.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    @property
+    def running(self) -> bool:
+        return not self._stopped and self.pipeline.running and not self.pipeline.finished
+
+    @property
+    def error(self):
+        return self.pipeline.error
+
+    # ── threads du pipeline ───────────────────
+    def _infer(self, frame):
+        kwargs = {"imgsz": self.governor.imgsz} if self.governor is not None else {}
+        with self.model_lock:
+            return self.model(frame, verbose=False, **kwargs)[0]
+
+    def _on_result(self, packet):
+        if self.governor is not None:
+            self.governor.observe(time.time() - packet.captured_at, self.pipeline.frames_read)
+        if time.monotonic() - self._last_pull > self.idle_timeout:
+            # Plus aucune page ne regarde ce flux
+            self.stop("plus consulté")
+            return
+        if self.recorder is not None:
+            self.recorder.add(packet.frame, packet.captured_at, packet.result)
+        if not packet.inferred:
+            return
+        self.infer_rate.tick()
+        res = packet.result
+        names = res.names
+        counts = Counter(names[int(c)] for c in res.boxes.cls.tolist()) if res.boxes is not None else Counter()
+        with self._lock:
+            self.last_counts = counts
+            self.class_counts.update(counts)
+        if self.analytics is not None:
+            self.analytics.write_result(packet.captured_at, res)
+
+    def _resize_display(self, level):
+        # Régulateur de qualité : images envoyées plus petites au dernier niveau
+        self.renderer.width = round(self.display_width * level["display_scale"])
+        self.renderer.set_display_size(None)
+
+    def _render(self, packet):
+        # Dessin + JPEG seulement si une page a demandé une image depuis la dernière
+        if not self._wanted.is_set() or packet.result is None:
+            return None
+        self._wanted.clear()
+        jpeg = self.renderer.render_jpeg(packet.frame, packet.result, self.jpeg_quality)
+        with self._lock:
+            self._jpeg = jpeg
+            self._seq += 1
+        return None
+
+    # ── côté page ─────────────────────────────
+    def latest_jpeg(self):
+        """(numéro, octets JPEG) de la dernière image prête, sans attendre ; en demande une nouvelle."""
+        self._last_pull = time.monotonic()
+        self._wanted.set()
+        with self._lock:
+            return self._seq, self._jpeg
+
+    def snapshot(self):
+        """État courant pour l'affichage (thread du script)."""
+        with self._lock:
+            summary = {
+                "last_counts": dict(self.last_counts),
+                "class_counts": dict(self.class_counts),
+            }
+        summary.update({
+            "running": self.running,
+            "fps": round(self.infer_rate.rate, 1),
+            "frames_read": self.pipeline.frames_read,
+            "error": self.error,
+            "stop_reason": self.stop_reason,
+        })
+        if self.governor is not None:
+            summary["quality"] = self.governor.describe()
+        if self.recorder is not None:
+            summary["clips"] = self.recorder.stats()
+        return summary
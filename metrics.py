@@ -0,0 +1,400 @@
+"""
+Métriques d'exécution communes à toutes les boucles de détection.
+
+Compteurs, jauges et histogrammes au format texte Prometheus :
+
+    yolo_frames_read_total{source}          frames lues
+    yolo_frames_inferred_total{source}      frames réellement passées au modèle
+    yolo_frames_dropped_total{source,queue} frames jetées (file pleine)
+    yolo_stage_seconds{source,stage}        latence par étape (histogramme)
+    yolo_queue_depth{source,queue}          profondeur des files du pipeline
+    yolo_detections_total{source,class}     détections par classe (débit : rate())
+    yolo_errors_total{source,stage}         erreurs rattrapées (la boucle continue)
+
+Exposition (configurée par l'environnement) :
+    METRICS_PORT            port du point d'accès local, 9108 par exemple
+                            (défaut : aucun, le point d'accès est désactivé)
+    METRICS_DUMP            fichier réécrit périodiquement (défaut : aucun)
+    METRICS_DUMP_INTERVAL   période d'écriture en secondes (défaut 10)
+    METRICS_PROFILE         intervalle (ms) du profileur par échantillonnage,
+                            démarré au lancement (défaut : arrêté)
+
+    METRICS_PORT=9108 python detect_yolo.py
+    curl 127.0.0.1:9108/metrics
+    curl -X POST 127.0.0.1:9108/profile/start   # profileur par échantillonnage
+    curl 127.0.0.1:9108/profile                 # piles agrégées (format flamegraph)
+    curl -X POST 127.0.0.1:9108/profile/stop
+
+Démarrer ou arrêter le profileur modifie l'état du processus : ces routes
+n'acceptent que POST (un GET, même d'un robot ou d'un aperçu de lien, ne
+doit rien déclencher).
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+# ─────────────────────────────────────────────
+# Types de métriques
+# ─────────────────────────────────────────────
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class CounterMetric(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class GaugeMetric(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class HistogramMetric(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, n + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), t, n)) for k, (c, t, n) in self._values.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [("le", f"{bound:g}")])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labels, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, labels=()) -> CounterMetric:
+        return self._get(CounterMetric, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels=()) -> GaugeMetric:
+        return self._get(GaugeMetric, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS) -> HistogramMetric:
+        return self._get(HistogramMetric, name, help_text, labels, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+# Registre partagé par tout le processus (GUI, Streamlit, API)
+REGISTRY = MetricsRegistry()
+
+
+# ─────────────────────────────────────────────
+# Instrumentation d'une boucle de détection
+# ─────────────────────────────────────────────
+class LoopMetrics:
+    """Raccourcis pour une source (« webcam », nom de fichier…)."""
+
+    def __init__(self, source: str, registry: MetricsRegistry = REGISTRY):
+        self.source = source
+        self._read = registry.counter("yolo_frames_read_total", "Frames lues.", ("source",))
+        self._inferred = registry.counter(
+            "yolo_frames_inferred_total", "Frames passées au modèle.", ("source",))
+        self._dropped = registry.counter(
+            "yolo_frames_dropped_total", "Frames jetées (file pleine).", ("source", "queue"))
+        self._stage = registry.histogram(
+            "yolo_stage_seconds", "Latence par étape.", ("source", "stage"))
+        self._depth = registry.gauge(
+            "yolo_queue_depth", "Profondeur des files du pipeline.", ("source", "queue"))
+        self._detections = registry.counter(
+            "yolo_detections_total", "Détections par classe.", ("source", "class"))
+        self._errors = registry.counter(
+            "yolo_errors_total", "Erreurs rattrapées.", ("source", "stage"))
+
+    def frame_read(self, n: int = 1):
+        self._read.inc(n, source=self.source)
+
+    def frames_inferred(self, n: int = 1):
+        self._inferred.inc(n, source=self.source)
+
+    def frames_dropped(self, n: int, queue: str):
+        if n:
+            self._dropped.inc(n, source=self.source, queue=queue)
+
+    def stage(self, stage: str, seconds: float):
+        self._stage.observe(seconds, source=self.source, stage=stage)
+
+    def queue_depth(self, queue: str, depth: int):
+        self._depth.set(depth, source=self.source, queue=queue)
+
+    def error(self, stage: str):
+        self._errors.inc(source=self.source, stage=stage)
+
+    def detections(self, res):
+        """Compte les détections d'un Results par classe."""
+        boxes = res.boxes
+        if boxes is None or len(boxes) == 0:
+            return
+        for name, count in Counter(res.names[int(c)] for c in boxes.cls.tolist()).items():
+            self._detections.inc(count, source=self.source, **{"class": name})
+
+
+# ─────────────────────────────────────────────
+# Profileur par échantillonnage
+# ─────────────────────────────────────────────
+class SamplingProfiler:
+    """
+    Relève toutes les `interval_ms` la pile de chaque thread (sys._current_frames)
+    et compte les piles identiques. Coût négligeable quand il est arrêté ;
+    quelques % quand il tourne. Sortie au format « piles repliées »
+    (une ligne `thread;f1;f2;… n`), lisible par flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, interval_ms: float = 5.0, max_depth: int = 40):
+        self.interval = interval_ms / 1000.0
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.started_at = None
+        # Le thread du profileur modifie `samples` pendant que les lectures le parcourent
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = None):
+        if self.running:
+            return
+        if interval_ms:
+            self.interval = interval_ms / 1000.0
+        with self._lock:
+            self.samples = Counter()
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples.update(stacks)
+
+    def snapshot(self) -> Counter:
+        """Copie des échantillons, cohérente même pendant que le profileur tourne."""
+        with self._lock:
+            return Counter(self.samples)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.snapshot().most_common())
+
+    def top(self, n: int = 15):
+        """Fonctions où le temps est passé (feuille de la pile), en part des échantillons."""
+        leaves = Counter()
+        for stack, count in self.snapshot().items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(name, count / total) for name, count in leaves.most_common(n)]
+
+
+PROFILER = SamplingProfiler()
+
+
+# ─────────────────────────────────────────────
+# Exposition : point d'accès HTTP local + fichier
+# ─────────────────────────────────────────────
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    profiler = PROFILER
+
+    def _reply(self, text: str, status: int = 200):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._reply(self.registry.render())
+        elif url.path == "/profile":
+            self._reply(self.profiler.collapsed())
+        elif url.path == "/profile/top":
+            self._reply("".join(f"{share:6.1%}  {name}\n" for name, share in self.profiler.top()))
+        elif url.path in ("/profile/start", "/profile/stop"):
+            self._reply(f"{url.path} : utiliser POST\n", 405)
+        else:
+            self._reply("routes : GET /metrics /profile /profile/top, POST /profile/start /profile/stop\n", 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/profile/start":
+            interval = parse_qs(url.query).get("interval_ms", [None])[0]
+            self.profiler.start(float(interval) if interval else None)
+            self._reply(f"profileur démarré ({1000 * self.profiler.interval:g} ms)\n")
+        elif url.path == "/profile/stop":
+            self.profiler.stop()
+            self._reply(f"profileur arrêté, {sum(self.profiler.snapshot().values())} échantillons\n")
+        else:
+            self._reply("routes POST : /profile/start /profile/stop\n", 404)
+
+    def log_message(self, format, *args):
+        pass  # pas de ligne par requête dans la console de l'application
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1"):
+    """Démarre le point d'accès dans un thread ; retourne le serveur."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class MetricsDumper:
+    """Réécrit périodiquement (écriture atomique) le texte des métriques dans un fichier."""
+
+    def __init__(self, path, interval: float = 10.0, registry: MetricsRegistry = REGISTRY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+        self._thread.start()
+
+    def dump(self):
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(self.registry.render(), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def close(self):
+        self._stop.set()
+        self.dump()
+
+
+_started = {}
+
+
+def start_from_env():
+    """
+    Démarre le point d'accès et/ou l'écriture périodique selon l'environnement
+    (rien sans METRICS_PORT ni METRICS_DUMP : les métriques sont à activer).
+    Idempotent (Streamlit réexécute le script) ; un port occupé n'est pas bloquant.
+    """
+    if "done" in _started:
+        return _started
+    _started["done"] = True
+    port = os.environ.get("METRICS_PORT", "").strip()
+    if port:
+        try:
+            _started["server"] = serve_metrics(int(port))
+            print(f"Métriques : http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"Point d'accès des métriques indisponible (port {port}) : {e}")
+    profile = os.environ.get("METRICS_PROFILE", "").strip()
+    if profile:
+        PROFILER.start(float(profile))
+        print(f"Profileur par échantillonnage démarré ({profile} ms)")
+    dump_path = os.environ.get("METRICS_DUMP", "").strip()
+    if dump_path:
+        interval = float(os.environ.get("METRICS_DUMP_INTERVAL", "10"))
+        _started["dumper"] = MetricsDumper(dump_path, interval)
+    return _started
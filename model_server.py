@@ -0,0 +1,331 @@
+"""
+Serveur de détection local : un seul processus garde le modèle chaud et
+répond aux interfaces (Tkinter, Streamlit, scripts).
+
+    python model_server.py --address /tmp/yolo.sock        # socket Unix
+    python model_server.py --address 127.0.0.1:8765        # TCP local (Windows)
+
+Côté clients, il suffit de définir YOLO_SERVER avec la même adresse :
+`detector.load_detector()` renvoie alors un RemoteDetector au lieu de
+charger le modèle dans le processus.
+
+Les frames reçues de plusieurs clients en même temps sont regroupées
+(micro-batching) : au plus `--max-batch` frames, en attendant au plus
+`--max-wait-ms` après la première.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_HEADER = struct.Struct("!II")  # taille de l'en-tête JSON, taille des données brutes
+
+
+# ─────────────────────────────────────────────
+# Protocole : en-tête JSON + données brutes
+# ─────────────────────────────────────────────
+def send_message(sock, header: dict, payload: bytes = b""):
+    head = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(head), len(payload)) + head + payload)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connexion fermée")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    head_size, payload_size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, head_size).decode("utf-8"))
+    payload = _recv_exact(sock, payload_size) if payload_size else b""
+    return header, payload
+
+
+def parse_address(address: str):
+    """"/chemin/socket" → (AF_UNIX, chemin) ; "hôte:port" → (AF_INET, (hôte, port))."""
+    if ":" in address and not address.startswith(("/", ".")):
+        host, port = address.rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+# ─────────────────────────────────────────────
+# Micro-batching
+# ─────────────────────────────────────────────
+class MicroBatcher:
+    """Regroupe les frames de plusieurs clients en un seul appel au modèle."""
+
+    def __init__(self, model, max_batch: int = 8, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.frames = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, params: dict) -> Future:
+        future = Future()
+        self._queue.put((frame, params, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Un appel par jeu de paramètres (conf, imgsz…)
+            groups = {}
+            for item in batch:
+                groups.setdefault(json.dumps(item[1], sort_keys=True), []).append(item)
+            for items in groups.values():
+                try:
+                    results = self.model([f for f, _, _ in items], verbose=False, **items[0][1])
+                    for (_, _, future), res in zip(items, results):
+                        future.set_result(res)
+                except Exception as e:
+                    for _, _, future in items:
+                        future.set_exception(e)
+                self.batches += 1
+                self.frames += len(items)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "mean_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+# ─────────────────────────────────────────────
+# Serveur
+# ─────────────────────────────────────────────
+class DetectionHandler(socketserver.BaseRequestHandler):
+    """Une connexion client : requêtes traitées l'une après l'autre."""
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            op = header.get("op")
+            if op == "hello":
+                send_message(self.request, {
+                    "names": {int(k): v for k, v in server.model.names.items()},
+                    "model": server.model_id,
+                })
+            elif op == "stats":
+                send_message(self.request, server.batcher.stats())
+            elif op == "detect":
+                # Toutes les frames du message sont soumises avant d'attendre la
+                # première réponse : elles peuvent partir dans un même lot
+                params = header.get("params", {})
+                futures, offset = [], 0
+                for shape in header["shapes"]:
+                    size = int(np.prod(shape))
+                    frame = np.frombuffer(payload, dtype=np.uint8, count=size, offset=offset).reshape(shape)
+                    futures.append(server.batcher.submit(frame, params))
+                    offset += size
+                try:
+                    boxes = [f.result().boxes.data[:, :6].cpu().numpy().astype(np.float32) for f in futures]
+                    reply = ({"counts": [len(b) for b in boxes]}, b"".join(b.tobytes() for b in boxes))
+                except Exception as e:
+                    reply = ({"error": str(e)}, b"")
+                try:
+                    send_message(self.request, *reply)
+                except OSError:
+                    return  # client parti (délai dépassé côté client)
+            else:
+                send_message(self.request, {"error": f"opération inconnue : {op}"})
+
+
+def make_server(address: str, model, max_batch: int, max_wait_ms: float):
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr):
+            # Ne supprime qu'une socket abandonnée, pas celle d'un serveur actif
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(addr)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(addr)
+            else:
+                raise OSError(f"Un serveur de détection écoute déjà sur {addr}")
+            finally:
+                probe.close()
+        server = socketserver.ThreadingUnixStreamServer(addr, DetectionHandler)
+    else:
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer(addr, DetectionHandler)
+    server.daemon_threads = True
+    server.model = model
+    server.model_id = getattr(model, "ckpt_path", str(model))
+    server.batcher = MicroBatcher(model, max_batch, max_wait_ms)
+    return server
+
+
+# ─────────────────────────────────────────────
+# Client
+# ─────────────────────────────────────────────
+class RemoteDetector:
+    """
+    Client du serveur, utilisable comme un Detector :
+    `remote(image_ou_liste)` → liste de Results Ultralytics.
+    Accepte des tableaux BGR, des chemins d'image ou des images PIL.
+    """
+
+    def __init__(self, address: str, timeout: float = 30.0):
+        self.address = address
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        with self._lock:
+            self._connect()
+
+    def _connect(self):
+        family, addr = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(addr)
+            send_message(sock, {"op": "hello"})
+            hello, _ = recv_message(sock)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self.names = {int(k): v for k, v in hello["names"].items()}
+        self.model_id = hello["model"]
+
+    def _exchange(self, header: dict, payload: bytes = b""):
+        """
+        Une requête, une réponse. Après une erreur (délai dépassé, connexion
+        coupée), la réponse en attente désynchroniserait les suivantes : la
+        connexion est fermée et rouverte au prochain appel.
+        """
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            try:
+                send_message(self._sock, header, payload)
+                return recv_message(self._sock)
+            except (OSError, ConnectionError):
+                self._sock.close()
+                self._sock = None
+                raise
+
+    @property
+    def ckpt_path(self):
+        return self.model_id
+
+    @staticmethod
+    def _to_bgr(source):
+        import cv2
+
+        if isinstance(source, np.ndarray):
+            return source
+        if isinstance(source, (str, os.PathLike)):
+            image = cv2.imread(str(source))
+            if image is None:
+                raise ValueError(f"image illisible : {source}")
+            return image
+        # Image PIL
+        return np.array(source.convert("RGB"))[:, :, ::-1]
+
+    def __call__(self, source, **kwargs):
+        from cache import result_from_cache
+
+        sources = source if isinstance(source, (list, tuple)) else [source]
+        frames = [np.ascontiguousarray(self._to_bgr(s), dtype=np.uint8) for s in sources]
+        params = {k: v for k, v in kwargs.items() if k in ("conf", "iou", "imgsz", "classes", "max_det")}
+
+        # Toutes les frames dans un seul message : le serveur les traite dans un même lot
+        header, payload = self._exchange(
+            {"op": "detect", "shapes": [f.shape for f in frames], "params": params},
+            b"".join(f.tobytes() for f in frames),
+        )
+        if "error" in header:
+            raise RuntimeError(f"Serveur de détection : {header['error']}")
+
+        results = []
+        boxes = np.frombuffer(payload, dtype=np.float32).reshape(-1, 6)
+        offset = 0
+        for s, frame, count in zip(sources, frames, header["counts"]):
+            path = str(s) if isinstance(s, (str, os.PathLike)) else ""
+            results.append(result_from_cache(frame, boxes[offset:offset + count], self.names, path))
+            offset += count
+        return results
+
+    def stats(self):
+        return self._exchange({"op": "stats"})[0]
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def __repr__(self):
+        return f"RemoteDetector({self.address}, model={self.model_id})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur de détection YOLO partagé.")
+    parser.add_argument("--address", default=os.environ.get("YOLO_SERVER", "/tmp/yolo.sock"),
+                        help="Chemin de socket Unix ou hôte:port.")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--backend", default=None, help="torch, onnx ou openvino.")
+    args = parser.parse_args(argv)
+
+    from detector import load_detector
+
+    model = load_detector(backend=args.backend, server="")
+    # Chauffe : le premier appel ne doit pas être payé par un client
+    model(np.zeros((480, 640, 3), dtype=np.uint8), verbose=False)
+
+    server = make_server(args.address, model, args.max_batch, args.max_wait_ms)
+    print(f"Serveur de détection prêt sur {args.address} ({model})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import hashlib
+import heapq
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+
+
+# ─────────────────────────────────────────────
+# Écriture asynchrone des images annotées
+# ─────────────────────────────────────────────
+class OutputWriter:
+    """
+    Écrit les images annotées sur disque dans un thread dédié.
+
+    - Nom déterministe : `<nom>_<empreinte du contenu>.jpg`, dans un
+      sous-dossier par jour (`root/AAAAMMJJ/`) pour garder des dossiers courts.
+    - Rétention : au-delà de `max_bytes` (ou de `max_age_days`), les fichiers
+      les plus anciens sont supprimés. L'inventaire du dossier n'est fait
+      qu'une fois, au démarrage du thread ; ensuite il est tenu à jour en mémoire.
+    """
+
+    def __init__(self, root, max_bytes: int = 500 * 1024 * 1024,
+                 max_age_days: float = None, jpeg_quality: int = 90, queue_size: int = 32):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.jpeg_quality = jpeg_quality
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._files = []  # tas (mtime, chemin, taille)
+        self._total_bytes = 0
+        self._thread = threading.Thread(target=self._run, name="yolo-output", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def content_name(stem: str, content: bytes) -> str:
+        return f"{stem}_{hashlib.sha256(content).hexdigest()[:12]}.jpg"
+
+    def path_for(self, name: str) -> Path:
+        return self.root / datetime.now().strftime("%Y%m%d") / name
+
+    def submit(self, image_bgr, name: str) -> Path:
+        """Programme l'écriture de `image_bgr` et retourne le chemin final (non bloquant)."""
+        path = self.path_for(name)
+        self._queue.put((image_bgr, path))
+        return path
+
+    def flush(self):
+        """Attend que toutes les écritures en attente soient terminées."""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    # ── thread d'écriture ─────────────────────
+    def _scan(self):
+        for path in self.root.rglob("*.jpg"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            heapq.heappush(self._files, (stat.st_mtime, str(path), stat.st_size))
+            self._total_bytes += stat.st_size
+
+    def _write(self, image_bgr, path: Path):
+        ok, buffer = cv2.imencode(".jpg", image_bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError(f"encodage JPEG impossible : {path}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture atomique : le fichier final est toujours complet
+        tmp_path = path.with_suffix(".jpg.tmp")
+        tmp_path.write_bytes(buffer.tobytes())
+        os.replace(tmp_path, path)
+        # Une image réécrite sous le même nom reste comptée une fois : sa
+        # précédente entrée est retirée quand elle arrive en tête du tas.
+        heapq.heappush(self._files, (time.time(), str(path), len(buffer)))
+        self._total_bytes += len(buffer)
+
+    def _enforce_retention(self):
+        oldest_allowed = time.time() - self.max_age_days * 86400 if self.max_age_days else None
+        while self._files:
+            mtime, path, size = self._files[0]
+            too_big = self._total_bytes > self.max_bytes
+            too_old = oldest_allowed is not None and mtime < oldest_allowed
+            if not (too_big or too_old):
+                break
+            heapq.heappop(self._files)
+            self._total_bytes -= size
+            try:
+                if os.path.getmtime(path) <= mtime:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _run(self):
+        self._scan()
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                image_bgr, path = item
+                self._write(image_bgr, path)
+                self._enforce_retention()
+            except Exception as e:
+                print(f"Erreur d’écriture de l’image annotée : {e}")
+            finally:
+                self._queue.task_done()
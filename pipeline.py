@@ -0,0 +1,343 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+import cv2
+
+
+# ─────────────────────────────────────────────
+# Mesure des temps par étape
+# ─────────────────────────────────────────────
+class StageTimings:
+    """
+    Accumule les durées (en secondes) de chaque étape du pipeline.
+    Thread-safe : les threads de capture, d'inférence et l'UI écrivent ici.
+    Avec `metrics` (metrics.LoopMetrics), chaque durée alimente aussi
+    l'histogramme de latence par étape.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            count, total, last, worst = self._stats.get(stage, (0, 0.0, 0.0, 0.0))
+            self._stats[stage] = (count + 1, total + seconds, seconds, max(worst, seconds))
+        if self.metrics is not None:
+            self.metrics.stage(stage, seconds)
+
+    def summary(self):
+        """Retourne {étape: {"count", "mean_ms", "last_ms", "max_ms"}}."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "mean_ms": 1000.0 * total / count if count else 0.0,
+                    "last_ms": 1000.0 * last,
+                    "max_ms": 1000.0 * worst,
+                }
+                for stage, (count, total, last, worst) in self._stats.items()
+            }
+
+    def format_line(self):
+        """Résumé court pour le label de statut."""
+        parts = [f"{stage} {s['mean_ms']:.1f} ms" for stage, s in self.summary().items()]
+        return " · ".join(parts)
+
+
+@dataclass
+class FramePacket:
+    """Une frame qui traverse le pipeline (capture → inférence → affichage)."""
+    index: int
+    frame: Any
+    captured_at: float
+    result: Any = None
+    inferred: bool = True  # False : détections reprises d'une frame précédente
+    display: Any = None
+    extra: dict = field(default_factory=dict)
+
+
+def put_with_policy(q: queue.Queue, item, drop_oldest: bool, stop_event: threading.Event):
+    """
+    Dépose `item` dans une file bornée.
+    - drop_oldest=True : si la file est pleine, on jette l'élément le plus ancien
+      (latence bornée pour la webcam). Retourne le nombre d'éléments jetés.
+    - drop_oldest=False : on attend qu'une place se libère (aucune perte, pour les vidéos).
+    """
+    dropped = 0
+    while not stop_event.is_set():
+        if drop_oldest:
+            try:
+                q.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    pass
+        else:
+            try:
+                q.put(item, timeout=0.1)
+                return dropped
+            except queue.Full:
+                continue
+    return dropped
+
+
+# ─────────────────────────────────────────────
+# Pipeline capture / inférence / rendu
+# ─────────────────────────────────────────────
+class FramePipeline:
+    """
+    Pipeline en trois étapes reliées par des files bornées :
+
+        thread capture  →  [capture_queue]  →  thread inférence  →  [output_queue]  →  UI
+
+    - Le thread de capture lit `cap` (cv2.VideoCapture déjà ouvert, ou
+      decoder.ThreadedDecoder : le décodage a alors lieu dans son propre
+      thread et la boucle sans `cap.set`).
+    - Le thread d'inférence appelle `infer(frame)` (ou `infer_batch(frames)`
+      sur des lots dont la taille est donnée par `batch_sizer`), puis
+      `render(packet)` (dessin des boîtes, conversion de couleurs, redimensionnement).
+    - L'UI récupère la dernière frame prête avec `get_latest()` et se charge
+      uniquement de construire l'objet d'affichage (PhotoImage, st.image…).
+
+    `scheduler` (InferenceScheduler, optionnel) permet de sauter l'inférence
+    sur certaines frames : elles reprennent alors les dernières détections.
+
+    `on_result(packet)` est appelé dans le thread d'inférence pour chaque frame
+    (comptage des classes, rapports…) ; `packet.inferred` indique si le modèle
+    a réellement tourné sur cette frame.
+
+    `metrics` (metrics.LoopMetrics, optionnel) reçoit les frames lues,
+    analysées et jetées, la profondeur des files, la latence par étape et
+    les détections par classe.
+
+    `deliver=False` : pas de file de sortie, le consommateur récupère ce
+    qu'il lui faut dans `on_result` / `render` (voir live.LiveSession).
+    """
+
+    def __init__(
+        self,
+        cap,
+        infer: Optional[Callable[[Any], Any]] = None,
+        infer_batch: Optional[Callable[[List[Any]], List[Any]]] = None,
+        batch_sizer=None,
+        batch_wait: float = 0.05,
+        scheduler=None,
+        render: Optional[Callable[[FramePacket], Any]] = None,
+        on_result: Optional[Callable[[FramePacket], None]] = None,
+        loop: bool = False,
+        drop_oldest: bool = True,
+        queue_size: int = 2,
+        timings: Optional[StageTimings] = None,
+        metrics=None,
+        deliver: bool = True,
+    ):
+        self.cap = cap
+        self.infer = infer
+        self.infer_batch = infer_batch
+        self.batch_sizer = batch_sizer
+        self.batch_wait = batch_wait
+        self.scheduler = scheduler
+        self._last_result = None
+        self.render = render
+        self.on_result = on_result
+        self.loop = loop
+        self.drop_oldest = drop_oldest
+        self.metrics = metrics
+        self.deliver = deliver
+        self.timings = timings or StageTimings(metrics)
+
+        batch = 1
+        if batch_sizer is not None:
+            batch = batch_sizer.max_batch_size if batch_sizer.adaptive else batch_sizer.batch_size
+        # Seule la file de capture doit pouvoir contenir un lot complet : la file de
+        # sortie reste courte (l'UI n'affiche que le paquet le plus récent)
+        self.capture_queue = queue.Queue(maxsize=max(queue_size, batch))
+        self.output_queue = queue.Queue(maxsize=queue_size)
+        if hasattr(cap, "reserve"):
+            # decoder.ThreadedDecoder : ses tampons ne doivent pas être réécrits tant
+            # qu'une frame est dans une file, dans le lot en cours, en attente de dépôt
+            # par le thread de capture ou encore tenue par l'UI (2)
+            cap.reserve(self.capture_queue.maxsize + batch + self.output_queue.maxsize + 3, self.timings)
+        self.dropped = {"capture": 0, "output": 0}
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.error = None
+
+        self._stop = threading.Event()
+        self._capture_done = threading.Event()
+        self._threads = []
+
+    # ── cycle de vie ──────────────────────────
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="yolo-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="yolo-inference", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout)
+        self.cap.release()
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    @property
+    def finished(self):
+        """Vrai quand la source est épuisée et que tout a été traité."""
+        return (
+            self._capture_done.is_set()
+            and not any(t.is_alive() for t in self._threads)
+            and self.output_queue.empty()
+        )
+
+    # ── consommateur (thread UI) ──────────────
+    def get_latest(self):
+        """
+        Retourne le paquet le plus récent prêt à afficher (ou None).
+        Les paquets plus anciens encore en file sont ignorés.
+        """
+        packet = None
+        while True:
+            try:
+                packet = self.output_queue.get_nowait()
+            except queue.Empty:
+                return packet
+
+    def get(self, timeout: Optional[float] = None):
+        """Retourne le prochain paquet dans l'ordre (ou None si rien avant `timeout`)."""
+        try:
+            return self.output_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    # ── threads internes ──────────────────────
+    def _read_frame(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            # 🔁 Vidéo terminée → on repart de la frame 0
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def _capture_loop(self):
+        index = 0
+        try:
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ret, frame = self._read_frame()
+                self.timings.add("capture", time.perf_counter() - t0)
+                if not ret:
+                    break
+                packet = FramePacket(index=index, frame=frame, captured_at=time.time())
+                index += 1
+                self.frames_read += 1
+                dropped = put_with_policy(self.capture_queue, packet, self.drop_oldest, self._stop)
+                self.dropped["capture"] += dropped
+                if self.metrics is not None:
+                    self.metrics.frame_read()
+                    self.metrics.frames_dropped(dropped, "capture")
+                    self.metrics.queue_depth("capture", self.capture_queue.qsize())
+        except Exception as e:
+            self.error = e
+        finally:
+            self._capture_done.set()
+
+    def _next_batch(self):
+        """
+        Récupère des paquets dans la file de capture jusqu'à ce que
+        `batch_sizer.batch_size` d'entre eux soient retenus par le planificateur :
+        la taille du lot est celle réellement envoyée au modèle, frames sautées
+        non comprises. Retourne (paquets, paquets retenus) ; listes vides si
+        rien n'est arrivé pendant 0,1 s.
+        """
+        size = self.batch_sizer.batch_size if self.batch_sizer is not None else 1
+        batch, selected = [], []
+        while len(selected) < size and not self._stop.is_set():
+            try:
+                # On attend la première frame, puis peu pour compléter le lot
+                packet = self.capture_queue.get(timeout=0.1 if not batch else self.batch_wait)
+            except queue.Empty:
+                if batch or self._capture_done.is_set():
+                    break
+                return batch, selected
+            batch.append(packet)
+            # Le planificateur choisit les frames à analyser ; les autres
+            # réutilisent les dernières détections (packet.inferred = False).
+            if self.scheduler is None or self.scheduler.should_infer(packet.frame):
+                selected.append(packet)
+        return batch, selected
+
+    def _run_inference(self, batch, selected):
+        if selected:
+            frames = [p.frame for p in selected]
+            t0 = time.perf_counter()
+            if self.infer_batch is not None:
+                results = self.infer_batch(frames)
+            else:
+                results = [self.infer(f) for f in frames]
+            elapsed = time.perf_counter() - t0
+            if self.batch_sizer is not None:
+                self.batch_sizer.record(len(frames), elapsed)
+            if self.scheduler is not None:
+                self.scheduler.record_inference(elapsed / len(frames))
+            # Temps moyen par frame, pour rester comparable au mode frame par frame
+            self.timings.add("inference", elapsed / len(frames))
+            for packet, result in zip(selected, results):
+                packet.result = result
+            if self.metrics is not None:
+                self.metrics.frames_inferred(len(selected))
+                for result in results:
+                    self.metrics.detections(result)
+
+        for packet in batch:
+            if packet.result is None:
+                packet.result = self._last_result
+                packet.inferred = False
+            else:
+                self._last_result = packet.result
+
+    def _inference_loop(self):
+        try:
+            while not self._stop.is_set():
+                batch, selected = self._next_batch()
+                if not batch:
+                    if self._capture_done.is_set() and self.capture_queue.empty():
+                        break
+                    continue
+
+                self._run_inference(batch, selected)
+
+                for packet in batch:
+                    if self.on_result is not None:
+                        self.on_result(packet)
+
+                    if self.render is not None:
+                        t2 = time.perf_counter()
+                        packet.display = self.render(packet)
+                        self.timings.add("render", time.perf_counter() - t2)
+
+                    self.frames_processed += 1
+                    if not self.deliver:
+                        continue
+                    dropped = put_with_policy(self.output_queue, packet, self.drop_oldest, self._stop)
+                    self.dropped["output"] += dropped
+                    if self.metrics is not None:
+                        self.metrics.frames_dropped(dropped, "output")
+                        self.metrics.queue_depth("output", self.output_queue.qsize())
+        except Exception as e:
+            self.error = e
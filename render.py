@@ -0,0 +1,153 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+_palette = None
+
+
+def class_colors(index: int, bgr: bool = False):
+    """
+    Palette d'Ultralytics, importée au premier dessin seulement : importer
+    ultralytics charge torch, ce qui ralentirait le démarrage des interfaces.
+    """
+    global _palette
+    if _palette is None:
+        try:
+            from ultralytics.utils.plotting import colors as _palette
+        except ImportError:  # même palette indisponible : couleur fixe
+            _palette = lambda index, bgr=False: (56, 56, 255)  # noqa: E731
+    return _palette(index, bgr)
+
+
+# ─────────────────────────────────────────────
+# Rendu direct à la résolution d'affichage
+# ─────────────────────────────────────────────
+class FrameRenderer:
+    """
+    Dessine les détections directement dans des tampons préalloués à la
+    taille d'affichage, au lieu de `res.plot()` (copie pleine résolution)
+    + `cvtColor` + `Image.fromarray` + `resize` à chaque frame.
+
+    - la frame est d'abord réduite (une seule fois) avec OpenCV, dans le tampon ;
+    - les boîtes, mises à l'échelle, sont dessinées dans ce même tampon ;
+    - la conversion BGR → RGB se fait dans un second tampon, lui aussi réutilisé.
+
+    Les tampons forment un anneau de `slots` emplacements : une frame rendue
+    reste valide tant que moins de `slots - 1` frames ont été rendues après
+    elle (file de sortie du pipeline + frame en cours d'affichage).
+
+    Si `display_size` est None, la taille est fixée à la première frame :
+    largeur `width`, hauteur selon le rapport d'aspect de la source.
+    """
+
+    def __init__(self, display_size=None, width: int = 960, slots: int = 4,
+                 line_width: int = 2, font_scale: float = 0.5):
+        self.display_size = display_size
+        self.width = width
+        self.slots = max(2, slots)
+        self.line_width = line_width
+        self.font_scale = font_scale
+
+        self._bgr = []
+        self._rgb = []
+        self._next = 0
+
+    def _allocate(self, frame):
+        if self.display_size is None:
+            h, w = frame.shape[:2]
+            self.display_size = (self.width, max(1, round(self.width * h / w)))
+        w, h = self.display_size
+        self._bgr = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(self.slots)]
+        self._rgb = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(self.slots)]
+
+    def set_display_size(self, display_size):
+        """
+        Change la taille d'affichage (régulateur de qualité) : nouveaux tampons
+        au prochain rendu. Les frames déjà rendues gardent leurs anciens tampons.
+        """
+        if display_size != self.display_size:
+            self.display_size = display_size
+            self._bgr = []
+            self._rgb = []
+            self._next = 0
+
+    def render(self, frame, xyxy, conf, cls, names, overlay: str = None, rgb: bool = True):
+        """
+        Retourne un tableau RGB (h, w, 3) à la taille d'affichage, annoté
+        (BGR avec `rgb=False`, par ex. avant un encodage JPEG par OpenCV).
+        Le tableau appartient au renderer : il sera réutilisé plus tard.
+        """
+        if not self._bgr:
+            self._allocate(frame)
+        slot = self._next
+        self._next = (self._next + 1) % self.slots
+        canvas = self._bgr[slot]
+
+        w, h = self.display_size
+        cv2.resize(frame, (w, h), dst=canvas, interpolation=cv2.INTER_AREA)
+
+        if len(xyxy):
+            scale = np.array([w / frame.shape[1], h / frame.shape[0]] * 2, dtype=np.float32)
+            boxes = (np.asarray(xyxy, dtype=np.float32) * scale).astype(np.int32)
+            for (x1, y1, x2, y2), p, c in zip(boxes.tolist(), conf, cls):
+                color = class_colors(int(c), True)
+                cv2.rectangle(canvas, (x1, y1), (x2, y2), color, self.line_width, cv2.LINE_AA)
+                label = f"{names[int(c)]} {float(p):.2f}"
+                (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, 1)
+                top = max(y1 - th - 4, 0)
+                cv2.rectangle(canvas, (x1, top), (x1 + tw + 2, top + th + 4), color, -1)
+                cv2.putText(canvas, label, (x1 + 1, top + th + 1), cv2.FONT_HERSHEY_SIMPLEX,
+                            self.font_scale, (255, 255, 255), 1, cv2.LINE_AA)
+
+        if overlay:
+            cv2.putText(canvas, overlay, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                        (0, 255, 0), 2, cv2.LINE_AA)
+
+        if not rgb:
+            return canvas
+        return cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB, dst=self._rgb[slot])
+
+    def render_result(self, frame, res, overlay: str = None, rgb: bool = True):
+        """Raccourci pour un Results Ultralytics (détections dessinées sur `frame`)."""
+        from detections import result_arrays
+
+        xyxy, conf, cls = result_arrays(res)
+        return self.render(frame, xyxy, conf, cls, res.names, overlay, rgb)
+
+    def render_jpeg(self, frame, res, quality: int = 75, overlay: str = None) -> bytes:
+        """Frame annotée à la taille d'affichage, compressée en JPEG (envoi au navigateur)."""
+        canvas = self.render_result(frame, res, overlay, rgb=False)
+        ok, data = cv2.imencode(".jpg", canvas, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise RuntimeError("Encodage JPEG impossible.")
+        return data.tobytes()
+
+
+# ─────────────────────────────────────────────
+# PhotoImage Tkinter mis à jour sur place
+# ─────────────────────────────────────────────
+class TkFrameDisplay:
+    """
+    Garde un seul ImageTk.PhotoImage attaché au label et y colle chaque
+    nouvelle frame (`paste`), au lieu d'en recréer un à chaque fois.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.photo = None
+        self.size = None
+
+    def show(self, rgb):
+        from PIL import ImageTk
+
+        h, w = rgb.shape[:2]
+        # Vue PIL sur le tableau NumPy, sans copie
+        image = Image.frombuffer("RGB", (w, h), rgb, "raw", "RGB", 0, 1)
+        if self.photo is None or self.size != (w, h):
+            self.photo = ImageTk.PhotoImage("RGB", (w, h))
+            self.size = (w, h)
+        if getattr(self.label, "image", None) is not self.photo:
+            # Le label a pu afficher autre chose entre-temps (mode image)
+            self.label.configure(image=self.photo)
+            self.label.image = self.photo  # empêcher le garbage collector
+        self.photo.paste(image)
@@ -0,0 +1,219 @@
+import csv
+import importlib.util
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+FORMATS = ("jsonl", "csv", "parquet")
+COLUMNS = ["frame", "timestamp", "class", "class_id", "confidence",
+           "x1", "y1", "x2", "y2", "track_id"]
+
+
+def available_formats():
+    """Formats utilisables ici : Parquet seulement si pyarrow (optionnel) est installé."""
+    return tuple(f for f in FORMATS if f != "parquet" or importlib.util.find_spec("pyarrow") is not None)
+
+
+# ─────────────────────────────────────────────
+# Noms de rapports
+# ─────────────────────────────────────────────
+def new_report_path(directory, prefix: str, ext: str) -> Path:
+    """
+    `<prefix>_<AAAAmmjj_HHMMSS>.<ext>` dans `directory`, suffixé `_2`, `_3`…
+    si le nom est déjà pris (deux rapports dans la même seconde). Le fichier
+    est créé vide (création exclusive) : le nom est réservé même entre threads.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    n = 1
+    while True:
+        path = directory / (f"{stem}.{ext}" if n == 1 else f"{stem}_{n}.{ext}")
+        try:
+            path.open("x").close()
+            return path
+        except FileExistsError:
+            n += 1
+
+
+# ─────────────────────────────────────────────
+# Rapport structuré en flux (JSONL / CSV / Parquet)
+# ─────────────────────────────────────────────
+class DetectionReportWriter:
+    """
+    Écrit une ligne par détection au fur et à mesure (frame, horodatage,
+    classe, confiance, boîte, identifiant de suivi éventuel).
+
+    Les lignes sont gardées dans un petit tampon, vidé toutes les
+    `flush_rows` lignes ou toutes les `flush_interval` secondes : la mémoire
+    reste constante quelle que soit la durée de la session.
+
+    À la fermeture, un résumé (frames, détections, comptes par classe) est
+    ajouté : dernière ligne `{"type": "summary", ...}` en JSONL, fichier
+    `<rapport>.summary.json` à côté pour CSV et Parquet.
+    Avec `zones` (zones.ZoneSet), le résumé donne aussi les comptes par zone.
+    Avec `analytics` (analytics.SessionRecorder), chaque frame est aussi
+    agrégée dans la base d'analyse ; la session est fermée avec le rapport.
+    Parquet nécessite `pyarrow` (optionnel).
+    """
+
+    def __init__(self, path, fmt: str = "jsonl", source: str = "",
+                 flush_rows: int = 500, flush_interval: float = 2.0, zones=None,
+                 analytics=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format de rapport inconnu : {fmt} (attendu : {', '.join(FORMATS)})")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.source = source
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self.frames = 0
+        self.detections = 0
+        self.class_counts = Counter()
+        self.zones = zones if zones is not None and zones.zones else None
+        self.zone_counts = {name: Counter() for name in self.zones.names} if self.zones else {}
+        self.analytics = analytics
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self._file = None
+        self._csv = None
+        self._parquet = None
+
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Le format Parquet nécessite pyarrow (pip install pyarrow).") from e
+        else:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            if fmt == "csv":
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(COLUMNS)
+
+    def write_frame(self, frame_index: int, timestamp: float, names, xyxy, conf, cls,
+                    track_ids=None, shape=None):
+        """
+        Ajoute les détections d'une frame (tableaux NumPy, cf. detections.result_arrays).
+        `shape` (hauteur, largeur) de la frame sert aux comptes par zone.
+        """
+        self.frames += 1
+        if self.analytics is not None:
+            self.analytics.write_frame(timestamp, names, xyxy, conf, cls, track_ids)
+        if self.zones is not None and shape is not None:
+            for zone, counts in self.zones.counts(xyxy, cls, names, shape).items():
+                self.zone_counts[zone].update(counts)
+        for i in range(len(cls)):
+            class_name = names[int(cls[i])]
+            x1, y1, x2, y2 = (round(float(v), 1) for v in xyxy[i])
+            self._buffer.append((
+                int(frame_index),
+                round(float(timestamp), 3),
+                class_name,
+                int(cls[i]),
+                round(float(conf[i]), 4),
+                x1, y1, x2, y2,
+                int(track_ids[i]) if track_ids is not None else None,
+            ))
+            self.class_counts[class_name] += 1
+        self.detections += len(cls)
+
+        if (len(self._buffer) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def write_result(self, frame_index: int, timestamp: float, res, track_ids=None):
+        """Raccourci pour un Results Ultralytics."""
+        from detections import result_arrays
+
+        xyxy, conf, cls = result_arrays(res)
+        self.write_frame(frame_index, timestamp, res.names, xyxy, conf, cls, track_ids,
+                         shape=res.orig_shape)
+
+    def flush(self):
+        rows, self._buffer = self._buffer, []
+        self._last_flush = time.monotonic()
+        if not rows:
+            return
+        if self.fmt == "jsonl":
+            for row in rows:
+                self._file.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n")
+            self._file.flush()
+        elif self.fmt == "csv":
+            self._csv.writerows(rows)
+            self._file.flush()
+        else:
+            self._write_parquet(rows)
+
+    def _write_parquet(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = list(zip(*rows))
+        table = pa.table({name: list(values) for name, values in zip(COLUMNS, columns)},
+                         schema=self._parquet_schema())
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(str(self.path), table.schema)
+        # Chaque vidage devient un row group : rien n'est gardé en mémoire
+        self._parquet.write_table(table)
+
+    @staticmethod
+    def _parquet_schema():
+        import pyarrow as pa
+
+        return pa.schema([
+            ("frame", pa.int64()), ("timestamp", pa.float64()),
+            ("class", pa.string()), ("class_id", pa.int32()), ("confidence", pa.float32()),
+            ("x1", pa.float32()), ("y1", pa.float32()), ("x2", pa.float32()), ("y2", pa.float32()),
+            ("track_id", pa.int64()),
+        ])
+
+    def summary(self):
+        summary = {
+            "type": "summary",
+            "source": self.source,
+            "started_at": self.started_at,
+            "ended_at": datetime.now().isoformat(timespec="seconds"),
+            "frames": self.frames,
+            "detections": self.detections,
+            "class_counts": dict(self.class_counts),
+        }
+        if self.zones is not None:
+            summary["zone_counts"] = {zone: dict(c) for zone, c in self.zone_counts.items()}
+        return summary
+
+    def close(self):
+        if self._closed:
+            return self.path
+        self._closed = True
+        self.flush()
+        summary = self.summary()
+        if self.fmt == "jsonl":
+            self._file.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        else:
+            summary_path = self.path.with_suffix(self.path.suffix + ".summary.json")
+            summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self.fmt == "parquet":
+            # Aucune détection : fichier Parquet vide mais valide
+            import pyarrow.parquet as pq
+            pq.ParquetWriter(str(self.path), self._parquet_schema()).close()
+        if self.analytics is not None:
+            self.analytics.close(report=self.path)
+        print(f"Rapport structuré généré : {self.path}")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,98 @@
+import math
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+# ─────────────────────────────────────────────
+# Planification de l'inférence frame par frame
+# ─────────────────────────────────────────────
+class InferenceScheduler:
+    """
+    Décide, pour chaque frame, s'il faut lancer YOLO ou réutiliser
+    les dernières détections.
+
+    Trois critères combinables :
+    - `stride` : au plus une inférence toutes les N frames ;
+    - `motion_threshold` : différence moyenne (0–255) entre une version
+      réduite en niveaux de gris de la frame et celle de la dernière frame
+      analysée ; en dessous du seuil, la scène est jugée statique ;
+    - `latency_budget_ms` : budget de temps par frame ; si la dernière
+      inférence a pris 3× le budget, on saute au moins 2 frames.
+
+    `max_skip` force une inférence après ce nombre de frames sautées,
+    même si rien ne bouge. La première frame est toujours analysée.
+    """
+
+    def __init__(self, stride: int = 1, motion_threshold: Optional[float] = None,
+                 latency_budget_ms: Optional[float] = None, max_skip: int = 30,
+                 motion_size=(64, 36)):
+        self.stride = max(1, stride)
+        self.motion_threshold = motion_threshold
+        self.latency_budget_ms = latency_budget_ms
+        self.max_skip = max(1, max_skip)
+        self.motion_size = motion_size
+
+        self.frames_seen = 0
+        self.frames_inferred = 0
+        self.last_motion = 0.0
+        self._since_inference = None  # None : aucune inférence encore
+        self._reference = None        # vignette de la dernière frame analysée
+        self._last_latency_ms = 0.0
+
+    @property
+    def enabled(self):
+        return self.stride > 1 or self.motion_threshold is not None or self.latency_budget_ms is not None
+
+    def effective_stride(self):
+        """Pas courant : le plus grand entre `stride` et celui imposé par le budget."""
+        stride = self.stride
+        if self.latency_budget_ms and self._last_latency_ms > 0:
+            stride = max(stride, math.ceil(self._last_latency_ms / self.latency_budget_ms))
+        return min(stride, self.max_skip)
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, self.motion_size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def should_infer(self, frame) -> bool:
+        self.frames_seen += 1
+        if self._since_inference is None:
+            return self._accept(frame)
+
+        self._since_inference += 1
+        if self._since_inference < self.effective_stride():
+            return False
+        if self._since_inference >= self.max_skip or self.motion_threshold is None:
+            return self._accept(frame)
+
+        # Score de mouvement : différence absolue moyenne sur la vignette
+        thumb = self._thumbnail(frame)
+        self.last_motion = float(np.mean(cv2.absdiff(thumb, self._reference)))
+        if self.last_motion >= self.motion_threshold:
+            return self._accept(frame, thumb)
+        return False
+
+    def _accept(self, frame, thumb=None):
+        self._since_inference = 0
+        self.frames_inferred += 1
+        if self.motion_threshold is not None:
+            self._reference = thumb if thumb is not None else self._thumbnail(frame)
+        return True
+
+    def record_inference(self, seconds: float):
+        """Durée (par frame) de la dernière inférence, pour le budget de latence."""
+        self._last_latency_ms = 1000.0 * seconds
+
+    def stats(self):
+        skipped = self.frames_seen - self.frames_inferred
+        ratio = skipped / self.frames_seen if self.frames_seen else 0.0
+        return {
+            "frames_seen": self.frames_seen,
+            "frames_inferred": self.frames_inferred,
+            "frames_skipped": skipped,
+            "skip_ratio": round(ratio, 3),
+        }
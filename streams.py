@@ -0,0 +1,341 @@
+"""
+Plusieurs caméras / flux sur un seul modèle partagé.
+
+    python streams.py 0 rtsp://camera-1/stream video0-115-2.mov --policy deadline
+
+Chaque source (index de webcam, fichier, URL RTSP) a son propre thread de
+capture qui ne garde que la dernière frame. Un moteur d'inférence unique
+prend les frames prêtes de plusieurs flux et les envoie au modèle par lots,
+en tourniquet (`round_robin`) ou par ancienneté de capture (`deadline`).
+Un fichier vidéo est lu à sa cadence native, comme une caméra (pratique
+pour les essais sans matériel).
+
+Une erreur du modèle ou de `on_result` est comptée pour les flux concernés
+(`errors`, yolo_errors_total) et le moteur continue avec les frames
+suivantes. Par flux, frames lues, analysées, perdues et frame en attente
+sont publiées dans les métriques communes (metrics.py, source = nom du flux).
+Le mode « 📡 Multi-flux » de app.py s'appuie sur ce module.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+
+import cv2
+
+from metrics import LoopMetrics
+from pipeline import FramePacket
+
+POLICIES = ("round_robin", "deadline")
+
+
+class RateMeter:
+    """Débit (événements/s) lissé sur une fenêtre glissante simple."""
+
+    def __init__(self, window: float = 2.0):
+        self.window = window
+        self._count = 0
+        self._start = time.monotonic()
+        self.rate = 0.0
+
+    def tick(self, n: int = 1):
+        self._count += n
+        elapsed = time.monotonic() - self._start
+        if elapsed >= self.window:
+            self.rate = self._count / elapsed
+            self._count = 0
+            self._start = time.monotonic()
+
+
+# ─────────────────────────────────────────────
+# Source : un thread de capture par flux
+# ─────────────────────────────────────────────
+class StreamSource:
+    def __init__(self, name: str, source, loop: bool = True):
+        self.name = name
+        self.source = int(source) if str(source).isdigit() else source
+        self.is_file = isinstance(self.source, str) and "://" not in self.source
+        self.loop = loop
+
+        self.frames_read = 0
+        self.frames_inferred = 0
+        self.dropped = 0
+        self.class_counts = Counter()
+        self.last_latency_ms = 0.0
+        self.read_rate = RateMeter()
+        self.infer_rate = RateMeter()
+        self.error = None         # erreur de capture (le flux s'arrête)
+        self.errors = 0           # erreurs d'inférence ou de traitement (le flux continue)
+        self.last_error = None
+        self.last_packet = None   # dernière frame analysée (affichage)
+        self.finished = False
+        self.metrics = LoopMetrics(name)
+
+        self._lock = threading.Lock()
+        self._latest = None
+        self._fresh = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, wake: threading.Event):
+        self._thread = threading.Thread(
+            target=self._run, args=(wake,), name=f"stream-{self.name}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _run(self, wake):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            self.error = f"impossible d'ouvrir {self.source}"
+            self.finished = True
+            return
+        # Fichier : lecture à la cadence native pour simuler une caméra
+        interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if self.is_file else 0.0
+        next_time = time.monotonic()
+        index = 0
+        try:
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret and self.is_file and self.loop:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                packet = FramePacket(index=index, frame=frame, captured_at=time.time())
+                index += 1
+                with self._lock:
+                    replaced = self._fresh
+                    if replaced:
+                        # La frame précédente n'a pas été analysée à temps
+                        self.dropped += 1
+                    self._latest = packet
+                    self._fresh = True
+                self.frames_read += 1
+                self.metrics.frame_read()
+                self.metrics.frames_dropped(int(replaced), "latest")
+                self.metrics.queue_depth("latest", 1)
+                self.read_rate.tick()
+                wake.set()
+
+                if interval:
+                    next_time += interval
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_time = time.monotonic()
+        finally:
+            cap.release()
+            self.finished = True
+
+    def pending_since(self):
+        """Heure de capture de la frame en attente, ou None."""
+        with self._lock:
+            return self._latest.captured_at if self._fresh else None
+
+    def take(self):
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            packet = self._latest
+        self.metrics.queue_depth("latest", 0)
+        return packet
+
+    def record_error(self, stage: str, error: Exception):
+        self.errors += 1
+        self.last_error = f"{stage} : {error}"
+        self.metrics.error(stage)
+        if self.errors == 1:
+            # Une seule ligne par flux : une erreur qui se répète ne noie pas la console
+            print(f"Flux {self.name} : erreur ({self.last_error}), le flux continue.")
+
+    def stats(self):
+        return {
+            "frames_read": self.frames_read,
+            "frames_inferred": self.frames_inferred,
+            "dropped": self.dropped,
+            "read_fps": round(self.read_rate.rate, 2),
+            "inference_fps": round(self.infer_rate.rate, 2),
+            "latency_ms": round(self.last_latency_ms, 1),
+            "errors": self.errors,
+            "error": self.error or self.last_error,
+        }
+
+
+# ─────────────────────────────────────────────
+# Gestionnaire : un moteur d'inférence pour tous les flux
+# ─────────────────────────────────────────────
+class StreamManager:
+    """
+    Ouvre N sources et partage un seul modèle entre elles.
+    `on_result(stream, packet)` est appelé dans le thread du moteur.
+    `model_lock` : verrou partagé avec les autres utilisateurs du modèle
+    (sessions Streamlit, interface Tkinter). Les flux s'appellent
+    `<prefix>0`, `<prefix>1`… (noms des métriques). Avec `idle_timeout`,
+    tout s'arrête si personne n'appelle `touch()` pendant ce délai (page
+    Streamlit fermée).
+    """
+
+    def __init__(self, model, sources, max_batch: int = 8, policy: str = "round_robin",
+                 on_result=None, loop_files: bool = True, model_lock=None, prefix: str = "cam",
+                 idle_timeout: float = None, **predict_kwargs):
+        if policy not in POLICIES:
+            raise ValueError(f"Politique inconnue : {policy} (attendu : {', '.join(POLICIES)})")
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.policy = policy
+        self.on_result = on_result
+        self.predict_kwargs = dict(predict_kwargs, verbose=False)
+        self.model_lock = model_lock
+        self.streams = [
+            StreamSource(f"{prefix}{i}", source, loop=loop_files) for i, source in enumerate(sources)
+        ]
+        self.batches = 0
+        self.failed_batches = 0
+        self.idle_timeout = idle_timeout
+        self.stop_reason = None
+
+        self._last_touch = time.monotonic()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._next = 0
+        self._engine = None
+
+    def start(self):
+        for stream in self.streams:
+            stream.start(self._wake)
+        self._engine = threading.Thread(target=self._run, name="stream-engine", daemon=True)
+        self._engine.start()
+        return self
+
+    def stop(self, reason: str = "arrêt demandé"):
+        self.stop_reason = self.stop_reason or reason
+        self._stop.set()
+        self._wake.set()
+        for stream in self.streams:
+            stream.stop()
+        if self._engine is not None and self._engine is not threading.current_thread():
+            self._engine.join(timeout=2)
+
+    @property
+    def running(self) -> bool:
+        return self._engine is not None and self._engine.is_alive()
+
+    def touch(self):
+        """Appelé par l'affichage : le gestionnaire est encore consulté."""
+        self._last_touch = time.monotonic()
+
+    def _select(self):
+        """Choisit au plus `max_batch` flux ayant une frame en attente."""
+        ready = [(s, s.pending_since()) for s in self.streams]
+        ready = [(s, t) for s, t in ready if t is not None]
+        if self.policy == "deadline":
+            # La frame la plus ancienne est la plus proche de son échéance
+            ready.sort(key=lambda item: item[1])
+        else:
+            n = len(self.streams)
+            ready.sort(key=lambda item: (self.streams.index(item[0]) - self._next) % n)
+            self._next = (self._next + 1) % n
+        return [s for s, _ in ready[:self.max_batch]]
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.idle_timeout is not None and time.monotonic() - self._last_touch > self.idle_timeout:
+                self.stop("plus consulté")
+                return
+            selected = self._select()
+            if not selected:
+                if all(s.finished for s in self.streams):
+                    self.stop_reason = self.stop_reason or "sources terminées"
+                    return
+                self._wake.wait(timeout=0.1)
+                self._wake.clear()
+                continue
+
+            pairs = [(s, s.take()) for s in selected]
+            pairs = [(s, p) for s, p in pairs if p is not None]
+            if not pairs:
+                continue
+            t0 = time.perf_counter()
+            try:
+                results = self._predict([p.frame for _, p in pairs])
+            except Exception as e:
+                # Frame corrompue, mémoire, modèle distant injoignable… : ces
+                # frames sont perdues, les flux continuent avec les suivantes
+                self.failed_batches += 1
+                for stream, _ in pairs:
+                    stream.record_error("inférence", e)
+                continue
+            per_frame = (time.perf_counter() - t0) / len(pairs)
+            self.batches += 1
+            done = time.time()
+            for (stream, packet), res in zip(pairs, results):
+                packet.result = res
+                stream.frames_inferred += 1
+                stream.infer_rate.tick()
+                stream.last_latency_ms = 1000.0 * (done - packet.captured_at)
+                stream.last_packet = packet
+                stream.metrics.frames_inferred()
+                stream.metrics.stage("inference", per_frame)
+                stream.metrics.detections(res)
+                boxes = res.boxes
+                if boxes is not None and len(boxes) > 0:
+                    for cls_id in boxes.cls.tolist():
+                        stream.class_counts[res.names[int(cls_id)]] += 1
+                if self.on_result is not None:
+                    try:
+                        self.on_result(stream, packet)
+                    except Exception as e:
+                        stream.record_error("traitement", e)
+
+    def _predict(self, frames):
+        if self.model_lock is None:
+            return list(self.model(frames, **self.predict_kwargs))
+        with self.model_lock:
+            return list(self.model(frames, **self.predict_kwargs))
+
+    def stats(self):
+        return {stream.name: stream.stats() for stream in self.streams}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Détection sur plusieurs flux avec un modèle partagé.")
+    parser.add_argument("sources", nargs="+", help="Index de webcam, fichiers vidéo ou URL RTSP.")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--policy", choices=POLICIES, default="round_robin")
+    parser.add_argument("--stats-every", type=float, default=5.0, help="Secondes entre deux bilans.")
+    parser.add_argument("--duration", type=float, default=None, help="Arrêt après N secondes.")
+    args = parser.parse_args(argv)
+
+    from detector import load_detector
+
+    manager = StreamManager(load_detector(), args.sources, args.max_batch, args.policy).start()
+    start = time.time()
+    try:
+        while args.duration is None or time.time() - start < args.duration:
+            time.sleep(args.stats_every)
+            for name, stats in manager.stats().items():
+                print(f"{name} : lu {stats['read_fps']} FPS, analysé {stats['inference_fps']} FPS, "
+                      f"perdues {stats['dropped']}, latence {stats['latency_ms']} ms, "
+                      f"erreurs {stats['errors']}"
+                      + (f", erreur : {stats['error']}" if stats["error"] else ""))
+            if all(s.finished for s in manager.streams):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+    for stream in manager.streams:
+        print(f"{stream.name} ({stream.source}) : {dict(stream.class_counts)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
-from ultralytics import YOLO
+from detector import load_detector
 
-# Charger un modèle pré-entraîné
-model = YOLO("yolov8n.pt")
+# Charger un modèle pré-entraîné (backend choisi par configuration, voir detector.py)
+model = load_detector()
 
 # Image à analyser
 resultats = model("Ydger.jpg", show=True)
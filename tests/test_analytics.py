@@ -0,0 +1,48 @@
+from analytics import _time_ranges
+
+HOUR = 3600
+MINUTE = 60
+
+
+def test_no_bounds_reads_hours_only():
+    assert _time_ranges(None, None) == [("hours", None, None)]
+
+
+def test_partial_hours_at_both_edges():
+    # 00:30 → 03:15 : heures entières 01:00 → 03:00, minutes pour les bords
+    assert _time_ranges(30 * MINUTE, 3 * HOUR + 15 * MINUTE) == [
+        ("hours", 60, 180),
+        ("minutes", 30, 60),
+        ("minutes", 180, 195),
+    ]
+
+
+def test_aligned_bounds_need_no_minutes():
+    assert _time_ranges(HOUR, 3 * HOUR) == [("hours", 60, 180)]
+
+
+def test_open_start():
+    assert _time_ranges(None, 3 * HOUR + 15 * MINUTE) == [
+        ("hours", None, 180),
+        ("minutes", 180, 195),
+    ]
+
+
+def test_open_end():
+    assert _time_ranges(30 * MINUTE, None) == [
+        ("hours", 60, None),
+        ("minutes", 30, 60),
+    ]
+
+
+def test_range_inside_one_hour_uses_minutes():
+    assert _time_ranges(10 * MINUTE, 50 * MINUTE) == [("minutes", 10, 50)]
+
+
+def test_seconds_widen_to_whole_minutes():
+    # [61 s, 119 s) touche les minutes 1 (incluse) à 2 (exclue)
+    assert _time_ranges(61, 119) == [("minutes", 1, 2)]
+
+
+def test_hourly_disabled():
+    assert _time_ranges(30 * MINUTE, 3 * HOUR, hourly=False) == [("minutes", 30, 180)]
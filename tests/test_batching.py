@@ -0,0 +1,68 @@
+from batching import BatchSizer, make_batch_sizer, predict_batched
+
+
+def feed(sizer, per_frame_s):
+    """Simule des appels au modèle : `per_frame_s(taille)` = coût par frame."""
+    sizer.record(sizer.batch_size, 1.0)  # chauffe, ignorée
+    for _ in range(50):
+        if sizer.settled:
+            break
+        size = sizer.batch_size
+        sizer.record(size, size * per_frame_s(size))
+    return sizer
+
+
+def test_fixed_size_never_changes():
+    sizer = BatchSizer(batch_size=4)
+    assert sizer.settled
+    feed(sizer, lambda size: 0.01)
+    assert sizer.batch_size == 4
+
+
+def test_adaptive_stops_when_larger_batches_stop_helping():
+    # Gain net jusqu'à 8 frames, plateau ensuite
+    costs = {1: 0.010, 2: 0.006, 4: 0.004, 8: 0.003, 16: 0.003}
+    sizer = feed(BatchSizer(adaptive=True, max_batch_size=32), costs.get)
+    assert sizer.settled
+    assert sizer.batch_size == 8
+    assert set(sizer.per_frame_ms) == {1, 2, 4, 8, 16}
+
+
+def test_adaptive_falls_back_to_best_size():
+    # Plus lent dès 4 frames par lot (mémoire saturée) : retour à 2
+    costs = {1: 0.010, 2: 0.006, 4: 0.020}
+    sizer = feed(BatchSizer(adaptive=True), costs.get)
+    assert sizer.batch_size == 2
+
+
+def test_adaptive_respects_max_batch_size():
+    sizer = feed(BatchSizer(adaptive=True, max_batch_size=4), lambda size: 0.01 / size)
+    assert sizer.settled
+    assert sizer.batch_size == 4
+
+
+def test_incomplete_batches_are_not_measured():
+    sizer = BatchSizer(adaptive=True, samples_per_size=1)
+    sizer.record(1, 1.0)  # chauffe
+    sizer.record(1, 0.010)
+    assert sizer.batch_size == 2
+    sizer.record(1, 0.001)  # fin de vidéo : lot incomplet, ignoré
+    assert sizer.per_frame_ms == {1: 10.0}
+    assert sizer.batch_size == 2 and not sizer.settled
+
+
+def test_make_batch_sizer():
+    assert make_batch_sizer("auto").adaptive
+    assert make_batch_sizer("6").batch_size == 6
+
+
+def test_predict_batched_keeps_order_and_flushes_the_tail():
+    calls = []
+
+    def model(frames, **kwargs):
+        calls.append(len(frames))
+        return [frame * 10 for frame in frames]
+
+    pairs = list(predict_batched(model, range(7), BatchSizer(batch_size=3)))
+    assert pairs == [(i, i * 10) for i in range(7)]
+    assert calls == [3, 3, 1]
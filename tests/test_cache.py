@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import cache
+from cache import DetectionCache, cache_key, cached_predict
+from tiling import SlicedDetector
+
+
+class FakeModel:
+    """Détecteur sans détection, qui compte ses appels."""
+
+    names = {0: "person"}
+
+    def __init__(self, imgsz=640):
+        self.imgsz = imgsz
+        self.calls = 0
+
+    def __call__(self, source, **kwargs):
+        self.calls += 1
+        images = source if isinstance(source, list) else [source]
+        return [SimpleNamespace(boxes=None, orig_shape=image.shape[:2]) for image in images]
+
+
+@pytest.fixture(autouse=True)
+def no_torch(monkeypatch):
+    # Results reconstruit sans torch : seules la forme et l'absence de boîtes servent ici
+    monkeypatch.setattr(cache, "result_from_cache",
+                        lambda image, boxes, names, path="": SimpleNamespace(
+                            boxes=None, orig_shape=image.shape[:2]))
+
+
+def test_cache_key_depends_on_params():
+    assert cache_key(b"img", "w", {"imgsz": 640}) != cache_key(b"img", "w", {"imgsz": 320})
+    assert cache_key(b"img", "w", {"imgsz": 640}) == cache_key(b"img", "w", {"imgsz": 640})
+
+
+@pytest.mark.parametrize("tiled", [False, True])
+def test_cached_predict_misses_when_model_imgsz_changes(tmp_path, tiled):
+    detection_cache = DetectionCache(tmp_path / "cache.sqlite")
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    inner = FakeModel(imgsz=640)
+    model = SlicedDetector(inner, tile_size=32) if tiled else inner
+
+    _, hit = cached_predict(model, detection_cache, image, b"img", "w")
+    assert not hit
+    _, hit = cached_predict(model, detection_cache, image, b"img", "w")
+    assert hit
+
+    # YOLO_IMGSZ modifié : même image, mêmes poids, autre taille d'entrée effective
+    inner.imgsz = 320
+    calls = inner.calls
+    _, hit = cached_predict(model, detection_cache, image, b"img", "w")
+    assert not hit
+    assert inner.calls > calls
+    detection_cache.close()
+
+
+def test_sliced_detector_exposes_wrapped_imgsz():
+    assert SlicedDetector(FakeModel(imgsz=1280)).imgsz == 1280
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from tiling import nms, tile_grid
+
+
+def test_tile_grid_small_image_is_one_tile():
+    grid = tile_grid(480, 300, tile_size=640)
+    assert grid.tolist() == [[0, 0, 300, 480]]
+
+
+def test_tile_grid_last_tile_touches_the_edge():
+    grid = tile_grid(640, 1000, tile_size=640, overlap=0.2)
+    # Pas 512 : deux tuiles, la seconde recalée sur le bord droit (pas de tuile tronquée)
+    assert grid.tolist() == [[0, 0, 640, 640], [360, 0, 1000, 640]]
+
+
+def test_tile_grid_covers_the_image():
+    height, width = 1080, 1920
+    grid = tile_grid(height, width, tile_size=640, overlap=0.25)
+    covered = np.zeros((height, width), dtype=bool)
+    for x1, y1, x2, y2 in grid:
+        assert x2 - x1 == 640 and y2 - y1 == 640
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+
+
+@pytest.mark.parametrize("overlap", [-0.1, 1.0])
+def test_tile_grid_rejects_invalid_overlap(overlap):
+    with pytest.raises(ValueError):
+        tile_grid(1000, 1000, overlap=overlap)
+
+
+def test_nms_empty():
+    empty = np.zeros((0, 6), dtype=np.float32)
+    assert nms(empty).shape == (0, 6)
+
+
+def test_nms_keeps_best_per_class():
+    dets = np.array([
+        [0, 0, 10, 10, 0.6, 0],
+        [1, 1, 11, 11, 0.9, 0],   # supprime la précédente
+        [0, 0, 10, 10, 0.5, 1],   # autre classe : gardée
+        [50, 50, 60, 60, 0.7, 0],  # pas de recouvrement : gardée
+    ], dtype=np.float32)
+    kept = nms(dets, iou_threshold=0.5)
+    assert kept[:, 4].tolist() == pytest.approx([0.9, 0.7, 0.5])
+
+
+def test_nms_ios_merges_fragment_cut_by_a_tile():
+    dets = np.array([
+        [0, 0, 100, 100, 0.9, 0],
+        [0, 0, 30, 100, 0.8, 0],  # fragment : IoU 0.3, mais entièrement contenu
+    ], dtype=np.float32)
+    assert len(nms(dets, 0.5, "iou")) == 2
+    assert len(nms(dets, 0.5, "ios")) == 1
+
+
+def test_nms_rejects_unknown_metric():
+    with pytest.raises(ValueError):
+        nms(np.zeros((1, 6), dtype=np.float32), metric="giou")
@@ -0,0 +1,59 @@
+import numpy as np
+
+from tracker import IoUTracker
+
+NO_BOXES = np.zeros((0, 4), dtype=np.float32)
+NO_CLS = np.zeros(0, dtype=np.int64)
+
+
+def boxes(*rows):
+    return np.array(rows, dtype=np.float32)
+
+
+def test_ids_persist_while_boxes_move():
+    tracker = IoUTracker()
+    cls = np.array([0, 1])
+    first = tracker.update(boxes([0, 0, 10, 10], [50, 50, 70, 70]), cls, 0.0)
+    # Léger déplacement, ordre des détections inversé
+    second = tracker.update(boxes([52, 51, 72, 71], [1, 1, 11, 11]), cls[::-1], 0.1)
+    assert list(second) == [first[1], first[0]]
+
+
+def test_no_match_across_classes():
+    tracker = IoUTracker()
+    (first,) = tracker.update(boxes([0, 0, 10, 10]), np.array([0]), 0.0)
+    (second,) = tracker.update(boxes([0, 0, 10, 10]), np.array([1]), 0.1)
+    assert second != first
+
+
+def test_id_survives_missed_frames_then_expires():
+    tracker = IoUTracker(max_missed=2)
+    (first,) = tracker.update(boxes([0, 0, 10, 10]), np.array([0]), 0.0)
+    for t in (0.1, 0.2):
+        tracker.update(NO_BOXES, NO_CLS, t)
+    (again,) = tracker.update(boxes([0, 0, 10, 10]), np.array([0]), 0.3)
+    assert again == first
+
+    for t in (0.4, 0.5, 0.6):
+        tracker.update(NO_BOXES, NO_CLS, t)
+    (new,) = tracker.update(boxes([0, 0, 10, 10]), np.array([0]), 0.7)
+    assert new != first
+
+
+def test_retired_tracks_are_folded_into_summary():
+    tracker = IoUTracker(max_missed=0, min_hits=2)
+    # Objet confirmé (3 détections sur 2 s), puis fausse détection d'une frame
+    for t in (0.0, 1.0, 2.0):
+        tracker.update(boxes([0, 0, 10, 10]), np.array([0]), t)
+    tracker.update(NO_BOXES, NO_CLS, 3.0)
+    tracker.update(boxes([100, 100, 110, 110]), np.array([0]), 4.0)
+    tracker.update(NO_BOXES, NO_CLS, 5.0)
+    # Second objet encore actif
+    for t in (6.0, 10.0):
+        tracker.update(boxes([0, 0, 10, 10]), np.array([0]), t)
+
+    assert tracker.retired == {0: [1, 2.0, 2.0]}
+    assert len(tracker.active) == 1
+    assert tracker.summary({0: "person"}) == {
+        "person": {"objects": 2, "mean_dwell_s": 3.0, "max_dwell_s": 4.0}
+    }
@@ -0,0 +1,30 @@
+from video_jobs import plan_segments
+
+
+def assert_partition(segments, total):
+    assert segments[0][0] == 0 and segments[-1][1] == total
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end == start
+    assert all(start < end for start, end in segments)
+
+
+def test_equal_segments():
+    segments = plan_segments(1000, workers=2, min_length=100)
+    assert segments == [(0, 250), (250, 500), (500, 750), (750, 1000)]
+
+
+def test_short_video_is_one_segment():
+    assert plan_segments(150, workers=8, min_length=100) == [(0, 150)]
+    assert plan_segments(0, workers=4) == [(0, 0)]
+
+
+def test_segments_start_on_keyframes():
+    keyframes = [0, 240, 480, 720, 960]
+    segments = plan_segments(1000, workers=2, keyframes=keyframes, min_length=100)
+    assert_partition(segments, 1000)
+    assert all(start in keyframes for start, _ in segments)
+
+
+def test_duplicate_keyframe_targets_are_merged():
+    # Une seule image clé : tous les découpages retombent sur 0, un seul segment
+    assert plan_segments(1000, workers=4, keyframes=[0], min_length=100) == [(0, 1000)]
@@ -0,0 +1,44 @@
+import cv2
+import numpy as np
+
+from zones import anchor_points, points_in_polygon
+
+SQUARE = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float32)
+# Polygone concave en « U » : l'encoche (4..6, 4..10) est à l'extérieur
+U_SHAPE = np.array([[0, 0], [10, 0], [10, 10], [6, 10], [6, 4], [4, 4], [4, 10], [0, 10]],
+                   dtype=np.float32)
+
+
+def test_no_points():
+    assert points_in_polygon(np.zeros((0, 2)), SQUARE).shape == (0,)
+
+
+def test_square():
+    points = np.array([[5, 5], [-1, 5], [11, 5], [5, -1], [5, 11], [0.5, 9.5]])
+    assert points_in_polygon(points, SQUARE).tolist() == [True, False, False, False, False, True]
+
+
+def test_concave_polygon():
+    points = np.array([[2, 8], [5, 8], [8, 8], [5, 2]])
+    assert points_in_polygon(points, U_SHAPE).tolist() == [True, False, True, True]
+
+
+def test_horizontal_edges_do_not_divide_by_zero():
+    # Points à la hauteur exacte des arêtes horizontales du U
+    points = np.array([[2, 4], [5, 4], [8, 4]], dtype=np.float32)
+    with np.errstate(all="raise"):
+        inside = points_in_polygon(points, U_SHAPE)
+    assert inside.tolist()[::2] == [True, True]
+
+
+def test_matches_opencv_on_random_points():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-2, 12, size=(500, 2)).astype(np.float32)
+    expected = [cv2.pointPolygonTest(U_SHAPE, (float(x), float(y)), False) > 0 for x, y in points]
+    assert points_in_polygon(points, U_SHAPE).tolist() == expected
+
+
+def test_anchor_points():
+    xyxy = np.array([[0, 0, 10, 20]], dtype=np.float32)
+    assert anchor_points(xyxy, "bottom").tolist() == [[5, 20]]
+    assert anchor_points(xyxy, "center").tolist() == [[5, 10]]
@@ -0,0 +1,159 @@
+"""
+Inférence par tuiles pour les grandes images à petits objets.
+
+Le modèle réduit toute l'image à sa taille d'entrée (640 px) : sur une
+scène de 1024 px ou plus, les piétons lointains ne font plus que quelques
+pixels. Ici l'image est découpée en tuiles qui se chevauchent, analysées
+en un seul lot à leur résolution d'origine, puis les détections sont
+ramenées dans le repère de l'image et fusionnées par une NMS vectorisée
+(les objets à cheval sur deux tuiles ne sont comptés qu'une fois).
+Une passe sur l'image entière peut être ajoutée pour les grands objets.
+
+    sliced = SlicedDetector(model, tile_size=640, overlap=0.2)
+    res = sliced(image_bgr)[0]          # un Results Ultralytics classique
+"""
+import numpy as np
+
+MATCH_METRICS = ("iou", "ios")
+
+
+# ─────────────────────────────────────────────
+# Découpage
+# ─────────────────────────────────────────────
+def _starts(length: int, tile: int, step: int):
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, step))
+    # Dernière tuile collée au bord : pas de tuile tronquée
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height: int, width: int, tile_size: int = 640, overlap: float = 0.2) -> np.ndarray:
+    """Fenêtres (x1, y1, x2, y2) couvrant l'image avec le recouvrement demandé → int [T, 4]."""
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError(f"Recouvrement invalide : {overlap} (attendu : 0 ≤ overlap < 1)")
+    step = max(1, int(tile_size * (1.0 - overlap)))
+    tiles = [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _starts(height, tile_size, step)
+        for x in _starts(width, tile_size, step)
+    ]
+    return np.array(tiles, dtype=np.int64)
+
+
+# ─────────────────────────────────────────────
+# Fusion des détections
+# ─────────────────────────────────────────────
+def overlap_matrix(xyxy: np.ndarray, metric: str = "iou") -> np.ndarray:
+    """
+    Recouvrement deux à deux des boîtes [N, 4] → [N, N].
+    "iou" : intersection / union ; "ios" : intersection / plus petite aire
+    (fusionne aussi un fragment coupé au bord d'une tuile avec la boîte entière).
+    """
+    a = xyxy[:, None, :]
+    b = xyxy[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    if metric == "ios":
+        denom = np.minimum(area[:, None], area[None, :])
+    else:
+        denom = area[:, None] + area[None, :] - inter
+    return inter / np.maximum(denom, 1e-9)
+
+
+def nms(boxes: np.ndarray, iou_threshold: float = 0.5, metric: str = "iou") -> np.ndarray:
+    """
+    NMS par classe sur des détections [N, 6] (x1, y1, x2, y2, conf, cls).
+    La matrice de recouvrement est calculée en une fois ; la boucle ne fait
+    que masquer des lignes. Retourne les détections gardées, par confiance décroissante.
+    """
+    if metric not in MATCH_METRICS:
+        raise ValueError(f"Métrique inconnue : {metric} (attendu : {', '.join(MATCH_METRICS)})")
+    if len(boxes) == 0:
+        return boxes
+    boxes = boxes[np.argsort(-boxes[:, 4], kind="stable")]
+    suppress = overlap_matrix(boxes[:, :4], metric) > iou_threshold
+    # Jamais de suppression entre classes différentes, ni d'une boîte par une moins sûre
+    suppress &= boxes[:, 5][:, None] == boxes[:, 5][None, :]
+    suppress = np.triu(suppress, k=1)
+
+    keep = np.ones(len(boxes), dtype=bool)
+    for i in range(len(boxes)):
+        if keep[i]:
+            keep &= ~suppress[i]
+    return boxes[keep]
+
+
+def _boxes_data(res) -> np.ndarray:
+    if res.boxes is None or len(res.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    return res.boxes.data[:, :6].cpu().numpy().astype(np.float32)
+
+
+# ─────────────────────────────────────────────
+# Détecteur par tuiles
+# ─────────────────────────────────────────────
+class SlicedDetector:
+    """
+    Enveloppe un détecteur (Detector, RemoteDetector…) et s'utilise comme lui :
+    `sliced(image_bgr_ou_liste, **kwargs)` → liste de Results.
+    `tile_size` et `tile_overlap` peuvent aussi être passés à l'appel (ils
+    entrent alors dans la clé de `cache.cached_predict`).
+    """
+
+    def __init__(self, model, tile_size: int = 640, overlap: float = 0.2,
+                 iou_threshold: float = 0.5, metric: str = "iou", include_full: bool = True):
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.metric = metric
+        self.include_full = include_full
+
+    @property
+    def names(self):
+        return self.model.names
+
+    @property
+    def imgsz(self):
+        # Taille d'entrée de la passe sur l'image entière (entre dans la clé du cache)
+        return getattr(self.model, "imgsz", 640)
+
+    @property
+    def ckpt_path(self):
+        return getattr(self.model, "ckpt_path", str(self.model))
+
+    def predict_one(self, image_bgr, tile_size: int = None, tile_overlap: float = None, **kwargs):
+        from cache import result_from_cache
+
+        tile_size = tile_size or self.tile_size
+        overlap = self.overlap if tile_overlap is None else tile_overlap
+        kwargs.setdefault("verbose", False)
+        height, width = image_bgr.shape[:2]
+        grid = tile_grid(height, width, tile_size, overlap)
+
+        parts = []
+        if len(grid) > 1:
+            # Toutes les tuiles en un lot, à leur résolution d'origine
+            tiles = [image_bgr[y1:y2, x1:x2] for x1, y1, x2, y2 in grid]
+            results = self.model(tiles, **dict(kwargs, imgsz=tile_size))
+            for (x1, y1, _, _), res in zip(grid, results):
+                boxes = _boxes_data(res)
+                boxes[:, [0, 2]] += x1
+                boxes[:, [1, 3]] += y1
+                parts.append(boxes)
+        if self.include_full or len(grid) == 1:
+            parts.append(_boxes_data(self.model(image_bgr, **kwargs)[0]))
+
+        merged = nms(np.concatenate(parts), self.iou_threshold, self.metric)
+        return result_from_cache(image_bgr, merged, self.names)
+
+    def __call__(self, source, **kwargs):
+        sources = source if isinstance(source, (list, tuple)) else [source]
+        return [self.predict_one(image, **kwargs) for image in sources]
+
+    def __repr__(self):
+        return f"SlicedDetector({self.model!r}, tile={self.tile_size}, overlap={self.overlap})"
@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+# ─────────────────────────────────────────────
+# IoU vectorisé
+# ─────────────────────────────────────────────
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU entre chaque boîte de `a` [N, 4] et chaque boîte de `b` [M, 4] (xyxy) → [N, M]."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    a = a[:, None, :]
+    b = b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def greedy_match(scores: np.ndarray, threshold: float):
+    """
+    Association gloutonne : les paires (ligne, colonne) sont prises par score
+    décroissant, chaque ligne et chaque colonne au plus une fois.
+    Seules les paires au-dessus du seuil sont triées.
+    """
+    rows, cols = np.nonzero(scores >= threshold)
+    if len(rows) == 0:
+        return []
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    used_rows, used_cols = set(), set()
+    matches = []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+
+# ─────────────────────────────────────────────
+# Suivi d'objets par IoU
+# ─────────────────────────────────────────────
+@dataclass
+class Track:
+    track_id: int
+    cls: int
+    box: np.ndarray
+    first_seen: float
+    last_seen: float
+    hits: int = 1
+    missed: int = 0
+
+    @property
+    def dwell(self):
+        return self.last_seen - self.first_seen
+
+
+class IoUTracker:
+    """
+    Suivi léger par IoU : chaque détection est associée à la piste de même
+    classe qui la recouvre le plus (IoU ≥ `iou_threshold`), sinon une nouvelle
+    piste est créée. Une piste disparaît après `max_missed` mises à jour sans
+    détection. Un objet n'est compté qu'une fois confirmé (`min_hits` détections),
+    ce qui écarte les fausses détections d'une seule frame.
+
+    L'association est entièrement vectorisée (matrice IoU N×M). Une piste qui
+    disparaît est versée dans des totaux par classe puis oubliée : la mémoire
+    ne grandit pas avec la durée de la session.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 15, min_hits: int = 2):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+
+        self.active = []
+        # Pistes terminées et confirmées : classe → [objets, temps total, temps max]
+        self.retired = {}
+        self._next_id = 1
+
+    def update(self, xyxy: np.ndarray, cls: np.ndarray, timestamp: float):
+        """
+        Met à jour les pistes avec les détections d'une frame.
+        Retourne les identifiants attribués à chaque détection (même ordre).
+        """
+        ids = np.zeros(len(xyxy), dtype=np.int64)
+
+        if self.active and len(xyxy):
+            track_boxes = np.stack([t.box for t in self.active])
+            track_cls = np.array([t.cls for t in self.active])
+            scores = iou_matrix(track_boxes, xyxy)
+            # Pas d'association entre classes différentes
+            scores[track_cls[:, None] != cls[None, :]] = 0.0
+            matches = greedy_match(scores, self.iou_threshold)
+        else:
+            matches = []
+
+        matched_tracks = set()
+        for t_idx, d_idx in matches:
+            track = self.active[t_idx]
+            track.box = xyxy[d_idx]
+            track.last_seen = timestamp
+            track.hits += 1
+            track.missed = 0
+            matched_tracks.add(t_idx)
+            ids[d_idx] = track.track_id
+
+        still_active = []
+        for t_idx, track in enumerate(self.active):
+            if t_idx not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self._retire(track)
+                    continue
+            still_active.append(track)
+        self.active = still_active
+
+        for d_idx in np.flatnonzero(ids == 0).tolist():
+            track = Track(self._next_id, int(cls[d_idx]), xyxy[d_idx], timestamp, timestamp)
+            self._next_id += 1
+            self.active.append(track)
+            ids[d_idx] = track.track_id
+
+        return ids
+
+    def update_from_result(self, res, timestamp: float):
+        """Raccourci pour un Results Ultralytics."""
+        from detections import result_arrays
+
+        xyxy, _, cls = result_arrays(res)
+        return self.update(xyxy, cls, timestamp)
+
+    def _retire(self, track: Track):
+        if track.hits < self.min_hits:
+            return
+        stats = self.retired.setdefault(track.cls, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += track.dwell
+        stats[2] = max(stats[2], track.dwell)
+
+    def confirmed_tracks(self):
+        """Pistes actives confirmées (les pistes terminées sont dans `retired`)."""
+        return [t for t in self.active if t.hits >= self.min_hits]
+
+    def summary(self, names):
+        """
+        Résumé par classe : nombre d'objets uniques et temps de présence
+        (moyen et maximal, en secondes). `names` : dict id → nom de classe.
+        """
+        per_class = {}
+        for cls, (count, total, worst) in self.retired.items():
+            per_class[names[cls]] = [count, total, worst]
+        for track in self.confirmed_tracks():
+            stats = per_class.setdefault(names[track.cls], [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += track.dwell
+            stats[2] = max(stats[2], track.dwell)
+        return {
+            name: {
+                "objects": count,
+                "mean_dwell_s": float(total / count),
+                "max_dwell_s": float(worst),
+            }
+            for name, (count, total, worst) in sorted(per_class.items())
+        }
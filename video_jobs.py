@@ -0,0 +1,348 @@
+"""
+Analyse hors ligne d'une vidéo longue, en parallèle et avec reprise.
+
+    python video_jobs.py enregistrement.mp4 --workers 4
+
+1. La vidéo est copiée par morceaux dans `video_jobs/<empreinte>/`
+   (l'empreinte du contenu identifie la tâche : relancer = reprendre).
+   Les résultats vont dans un sous-dossier propre au pas entre frames et
+   au modèle (`stride<pas>_<empreinte des poids>/`) : changer l'un ou
+   l'autre relance l'analyse au lieu de reprendre des résultats étrangers.
+2. Elle est découpée en segments alignés sur les images clés (ffprobe si
+   disponible, sinon découpage régulier).
+3. Chaque segment est analysé dans un processus séparé qui écrit ses
+   résultats au fil de l'eau (`seg_XXXX.jsonl`) : après une interruption,
+   il repart de la dernière frame enregistrée.
+4. Les segments sont fusionnés dans l'ordre dans `results.jsonl`.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+
+BASE_DIR = Path(__file__).resolve().parent
+JOBS_DIR = BASE_DIR / "video_jobs"
+COPY_CHUNK = 1 << 20
+
+# Modèle chargé une seule fois par processus de travail
+_MODEL = None
+
+
+# ─────────────────────────────────────────────
+# Préparation de la tâche
+# ─────────────────────────────────────────────
+def store_upload(fileobj, suffix: str, jobs_dir: Path = JOBS_DIR) -> Path:
+    """
+    Copie un fichier (ou un upload Streamlit) par morceaux dans le dossier
+    de sa tâche. Le nom du dossier est l'empreinte du contenu.
+    """
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    # Nom unique : plusieurs copies peuvent avoir lieu en même temps (threads, sessions)
+    with tempfile.NamedTemporaryFile(dir=jobs_dir, suffix=".tmp", delete=False) as out:
+        tmp_path = Path(out.name)
+        while chunk := fileobj.read(COPY_CHUNK):
+            digest.update(chunk)
+            out.write(chunk)
+
+    job_dir = jobs_dir / digest.hexdigest()[:16]
+    job_dir.mkdir(exist_ok=True)
+    video_path = job_dir / f"video{suffix}"
+    if video_path.exists():
+        tmp_path.unlink()
+    else:
+        os.replace(tmp_path, video_path)
+    return video_path
+
+
+def model_fingerprint(model_config: dict) -> str:
+    """
+    Empreinte du modèle qu'utiliseront les processus de travail, calculée
+    sans le charger : configuration + contenu des fichiers de poids trouvés.
+    """
+    from cache import file_sha256
+    from detector import resolve_weights
+
+    digest = hashlib.sha256(json.dumps(model_config, sort_keys=True).encode("utf-8"))
+    for weights in (model_config.get("weights"), model_config.get("cascade")):
+        path = Path(resolve_weights(weights)) if weights else None
+        if path is not None and path.is_file():
+            digest.update(file_sha256(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def keyframe_indices(video_path: Path, fps: float):
+    """Index des images clés via ffprobe, ou None si ffprobe est absent."""
+    if shutil.which("ffprobe") is None:
+        return None
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+        "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", str(video_path),
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=300, check=True).stdout
+    except (subprocess.SubprocessError, OSError):
+        return None
+    times = []
+    for line in out.split():
+        try:
+            times.append(float(line.strip(",")))
+        except ValueError:
+            continue
+    return sorted({round(t * fps) for t in times}) or None
+
+
+def plan_segments(total_frames: int, workers: int, keyframes=None, min_length: int = 100):
+    """
+    Découpe [0, total_frames) en segments à peu près égaux, chaque début de
+    segment étant placé sur l'image clé la plus proche (si connues).
+    """
+    count = max(1, min(workers * 2, total_frames // max(1, min_length)))
+    starts = {0}
+    for i in range(1, count):
+        target = i * total_frames // count
+        if keyframes:
+            target = min(keyframes, key=lambda k: abs(k - target))
+        if 0 < target < total_frames:
+            starts.add(target)
+    starts = sorted(starts)
+    ends = starts[1:] + [total_frames]
+    return list(zip(starts, ends))
+
+
+# ─────────────────────────────────────────────
+# Processus de travail
+# ─────────────────────────────────────────────
+def init_worker(threads: int, model_config: dict):
+    """Threads PyTorch + chargement du modèle (déjà exporté par VideoJob.export_model)."""
+    global _MODEL
+    import torch
+    from detector import load_detector
+
+    torch.set_num_threads(threads)
+    _MODEL = load_detector(**model_config)
+
+
+def completed_frames(segment_path: Path):
+    """Dernière frame enregistrée dans un segment (les lignes tronquées sont ignorées)."""
+    last = None
+    valid_bytes = 0
+    if segment_path.exists():
+        with open(segment_path, "rb") as f:
+            for line in f:
+                try:
+                    last = json.loads(line)["index"]
+                except (ValueError, KeyError):
+                    break
+                valid_bytes += len(line)
+        # Une ligne coupée par l'interruption est retirée avant de reprendre
+        if valid_bytes != segment_path.stat().st_size:
+            with open(segment_path, "r+b") as f:
+                f.truncate(valid_bytes)
+    return last
+
+
+def process_segment(video_path: str, segment_path: str, start: int, end: int,
+                    batch_size: int, frame_stride: int):
+    """Analyse les frames [start, end) et les ajoute à `segment_path`. Reprend si possible."""
+    from batching import BatchSizer, predict_batched
+    from detections import result_to_dicts
+
+    segment_path = Path(segment_path)
+    done_marker = segment_path.with_suffix(".done")
+    if done_marker.exists():
+        return start, end, "déjà terminé"
+
+    last = completed_frames(segment_path)
+    first = start if last is None else last + 1
+    first += (-(first - start)) % frame_stride  # rester aligné sur le pas
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    indices = []
+
+    def frames():
+        index = first
+        while index < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if (index - start) % frame_stride == 0:
+                indices.append(index)
+                yield frame
+            index += 1
+
+    written = 0
+    with open(segment_path, "a", encoding="utf-8") as out:
+        for i, (_, res) in enumerate(
+            predict_batched(_MODEL, frames(), BatchSizer(batch_size=batch_size), verbose=False)
+        ):
+            index = indices[i]
+            out.write(json.dumps({
+                "index": index,
+                "timestamp": round(index / fps, 3) if fps else None,
+                "detections": result_to_dicts(res),
+            }, ensure_ascii=False) + "\n")
+            written += 1
+            if written % batch_size == 0:
+                # Point de reprise : tout ce qui est écrit survit à un arrêt brutal
+                out.flush()
+                os.fsync(out.fileno())
+    cap.release()
+    done_marker.touch()
+    return start, end, f"{written} frames"
+
+
+# ─────────────────────────────────────────────
+# Tâche complète
+# ─────────────────────────────────────────────
+class VideoJob:
+    """
+    `model` : réglages du détecteur (mêmes clés que detector.load_detector,
+    ex. {"weights": "small"}) ; le reste vient de l'environnement.
+    """
+
+    def __init__(self, video_path, workers: int = None, batch_size: int = 8, frame_stride: int = 1,
+                 model: dict = None):
+        from detector import detector_config_from_env
+
+        self.video_path = Path(video_path)
+        self.job_dir = self.video_path.parent
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.frame_stride = max(1, frame_stride)
+
+        # Modèle chargé localement par chaque processus de travail
+        self.model_config = detector_config_from_env()
+        self.model_config.update({k: v for k, v in (model or {}).items() if v is not None})
+        self.model_config["server"] = ""
+        # Résultats propres au pas et au modèle : une reprise ne mélange jamais deux réglages
+        self.run_dir = self.job_dir / f"stride{self.frame_stride}_{model_fingerprint(self.model_config)[:16]}"
+        self.run_dir.mkdir(exist_ok=True)
+
+        plan_path = self.job_dir / "plan.json"
+        if plan_path.exists():
+            # Reprise : même découpage que la première exécution
+            self.plan = json.loads(plan_path.read_text(encoding="utf-8"))
+        else:
+            cap = cv2.VideoCapture(str(self.video_path))
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            cap.release()
+            if total <= 0:
+                raise ValueError(f"Nombre de frames inconnu pour {self.video_path}")
+            keyframes = keyframe_indices(self.video_path, fps)
+            self.plan = {
+                "total_frames": total,
+                "fps": fps,
+                "keyframe_aligned": keyframes is not None,
+                "segments": plan_segments(total, self.workers, keyframes),
+            }
+            plan_path.write_text(json.dumps(self.plan), encoding="utf-8")
+
+    @property
+    def results_path(self):
+        return self.run_dir / "results.jsonl"
+
+    def segment_path(self, i: int) -> Path:
+        return self.run_dir / f"seg_{i:04d}.jsonl"
+
+    def run(self, on_progress=None):
+        """Traite les segments restants en parallèle puis fusionne. Retourne le résumé."""
+        if self.results_path.exists():
+            return self.summary()
+
+        self.export_model()
+        segments = self.plan["segments"]
+        workers = max(1, min(self.workers, len(segments)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        done = 0
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn"),
+                                 initializer=init_worker, initargs=(threads, self.model_config)) as pool:
+            futures = [
+                pool.submit(process_segment, str(self.video_path), str(self.segment_path(i)),
+                            start, end, self.batch_size, self.frame_stride)
+                for i, (start, end) in enumerate(segments)
+            ]
+            for future in as_completed(futures):
+                start, end, message = future.result()
+                done += 1
+                print(f"Segment [{start}, {end}) : {message}")
+                if on_progress is not None:
+                    on_progress(done, len(segments))
+        return self.merge()
+
+    def export_model(self):
+        """
+        Export ONNX / OpenVINO fait ici, une fois, avant le lancement des
+        processus : sinon chacun exporterait le même modèle au même endroit.
+        """
+        config = self.model_config
+        if config["backend"] == "torch":
+            return
+        from detector import export_model
+
+        for weights in (config["weights"], config.get("cascade")):
+            if weights:
+                export_model(weights, config["backend"], config["half"], config["int8"], config["imgsz"])
+
+    def merge(self):
+        """Concatène les segments dans l'ordre (écriture atomique)."""
+        tmp_path = self.results_path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "wb") as out:
+            for i in range(len(self.plan["segments"])):
+                with open(self.segment_path(i), "rb") as seg:
+                    shutil.copyfileobj(seg, out)
+        os.replace(tmp_path, self.results_path)
+        return self.summary()
+
+    def summary(self):
+        counts = Counter()
+        frames = 0
+        with open(self.results_path, encoding="utf-8") as f:
+            for line in f:
+                frames += 1
+                counts.update(d["class"] for d in json.loads(line)["detections"])
+        return {
+            "video": str(self.video_path),
+            "results": str(self.results_path),
+            "frames_analysed": frames,
+            "frame_stride": self.frame_stride,
+            "model": self.model_config["weights"],
+            "segments": len(self.plan["segments"]),
+            "keyframe_aligned": self.plan["keyframe_aligned"],
+            "class_counts": dict(counts),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse vidéo parallèle avec reprise.")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--frame-stride", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    source = Path(args.video)
+    with open(source, "rb") as f:
+        video_path = store_upload(f, source.suffix)
+    job = VideoJob(video_path, args.workers, args.batch_size, args.frame_stride)
+    print(json.dumps(job.run(), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
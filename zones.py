@@ -0,0 +1,205 @@
+"""
+Zones d'intérêt (polygones) et liste de classes utiles, appliquées dès l'inférence.
+
+Configuration JSON (voir zones.example.json) :
+
+    {
+      "classes": ["car", "truck", "person"],
+      "anchor": "bottom",
+      "zones": {
+        "voie_1": [[0.10, 0.55], [0.45, 0.55], [0.60, 1.0], [0.0, 1.0]]
+      }
+    }
+
+Coordonnées en pixels, ou relatives (toutes ≤ 1) à la taille de la frame.
+`anchor` : point de la boîte testé dans le polygone, "bottom" (milieu du
+bas, là où l'objet touche le sol) ou "center".
+
+RoiDetector enveloppe un détecteur : la frame est recadrée sur la boîte
+englobant toutes les zones, seules les classes demandées sont gardées par
+la NMS du modèle (`classes=`), puis les détections hors des polygones sont
+écartées par un test point-dans-polygone vectorisé.
+"""
+import json
+import math
+from collections import Counter
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+ANCHORS = ("bottom", "center")
+
+
+# ─────────────────────────────────────────────
+# Géométrie
+# ─────────────────────────────────────────────
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Test pair-impair de tous les points [N, 2] contre toutes les arêtes du polygone [M, 2] → bool [N]."""
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    x1, y1 = polygon[:, 0][None, :], polygon[:, 1][None, :]
+    x2, y2 = np.roll(polygon[:, 0], -1)[None, :], np.roll(polygon[:, 1], -1)[None, :]
+    crosses = (y1 > y) != (y2 > y)
+    dy = np.where(y2 == y1, 1e-9, y2 - y1)
+    x_cross = x1 + (y - y1) * (x2 - x1) / dy
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+
+def anchor_points(xyxy: np.ndarray, anchor: str = "bottom") -> np.ndarray:
+    cx = (xyxy[:, 0] + xyxy[:, 2]) / 2
+    cy = xyxy[:, 3] if anchor == "bottom" else (xyxy[:, 1] + xyxy[:, 3]) / 2
+    return np.stack([cx, cy], axis=1)
+
+
+# ─────────────────────────────────────────────
+# Ensemble de zones
+# ─────────────────────────────────────────────
+class ZoneSet:
+    """Polygones nommés + classes autorisées (noms de classes, None = toutes)."""
+
+    def __init__(self, zones: dict = None, classes=None, anchor: str = "bottom", margin: int = 16):
+        if anchor not in ANCHORS:
+            raise ValueError(f"Point d'ancrage inconnu : {anchor} (attendu : {', '.join(ANCHORS)})")
+        self.zones = {
+            name: np.asarray(polygon, dtype=np.float32) for name, polygon in (zones or {}).items()
+        }
+        for name, polygon in self.zones.items():
+            if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+                raise ValueError(f"Zone {name} : au moins 3 points (x, y) attendus.")
+        self.classes = list(classes) if classes else None
+        self.anchor = anchor
+        self.margin = margin
+        self._resolved = {}
+
+    @classmethod
+    def from_dict(cls, config: dict):
+        return cls(config.get("zones"), config.get("classes"), config.get("anchor", "bottom"),
+                   config.get("margin", 16))
+
+    @classmethod
+    def from_file(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    @property
+    def names(self):
+        return list(self.zones)
+
+    def class_ids(self, names: dict):
+        """Identifiants des classes autorisées pour ce modèle (None = toutes)."""
+        if self.classes is None:
+            return None
+        by_name = {v: k for k, v in names.items()}
+        unknown = [c for c in self.classes if c not in by_name]
+        if unknown:
+            raise ValueError(f"Classes inconnues du modèle : {', '.join(unknown)}")
+        return sorted(by_name[c] for c in self.classes)
+
+    def polygons(self, shape):
+        """Polygones en pixels pour une frame de taille `shape` (coordonnées relatives résolues)."""
+        key = tuple(shape[:2])
+        if key not in self._resolved:
+            height, width = key
+            resolved = {}
+            for name, polygon in self.zones.items():
+                if polygon.max() <= 1.0:
+                    polygon = polygon * np.array([width, height], dtype=np.float32)
+                resolved[name] = polygon
+            self._resolved[key] = resolved
+        return self._resolved[key]
+
+    def crop_box(self, shape):
+        """Boîte (x1, y1, x2, y2) englobant toutes les zones, avec une marge, ou None."""
+        if not self.zones:
+            return None
+        height, width = shape[:2]
+        points = np.concatenate(list(self.polygons(shape).values()))
+        x1, y1 = np.floor(points.min(axis=0)) - self.margin
+        x2, y2 = np.ceil(points.max(axis=0)) + self.margin
+        return (max(0, int(x1)), max(0, int(y1)), min(width, int(x2)), min(height, int(y2)))
+
+    def membership(self, xyxy: np.ndarray, shape) -> np.ndarray:
+        """Appartenance de chaque détection à chaque zone → bool [N, Z]."""
+        points = anchor_points(xyxy, self.anchor)
+        polygons = self.polygons(shape)
+        if not polygons:
+            return np.ones((len(xyxy), 0), dtype=bool)
+        return np.stack([points_in_polygon(points, p) for p in polygons.values()], axis=1)
+
+    def counts(self, xyxy, cls, names, shape):
+        """{zone: Counter(classe → nombre)} pour les détections d'une frame."""
+        inside = self.membership(xyxy, shape)
+        result = {}
+        for z, zone in enumerate(self.zones):
+            result[zone] = Counter(names[int(c)] for c in cls[inside[:, z]])
+        return result
+
+
+def load_zones(path):
+    """ZoneSet depuis un fichier JSON, ou None si le fichier n'existe pas."""
+    if path is None or not Path(path).is_file():
+        return None
+    return ZoneSet.from_file(path)
+
+
+# ─────────────────────────────────────────────
+# Détecteur restreint aux zones
+# ─────────────────────────────────────────────
+class RoiDetector:
+    """
+    Enveloppe un détecteur et s'utilise comme lui : `roi(frame_ou_liste)` (BGR) → Results
+    sur la frame entière, ne contenant que les classes autorisées dans les zones.
+    """
+
+    def __init__(self, model, zone_set: ZoneSet):
+        self.model = model
+        self.zone_set = zone_set
+
+    @cached_property
+    def class_ids(self):
+        # Au premier appel : le modèle peut encore être en cours de chargement
+        return self.zone_set.class_ids(self.model.names)
+
+    @property
+    def names(self):
+        return self.model.names
+
+    @property
+    def ckpt_path(self):
+        return getattr(self.model, "ckpt_path", str(self.model))
+
+    def __call__(self, source, **kwargs):
+        from cache import result_from_cache
+
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if self.class_ids is not None:
+            kwargs.setdefault("classes", self.class_ids)
+
+        # Recadrage sur l'union des zones ; les frames d'une même source ont
+        # la même taille, donc le même recadrage et un seul lot.
+        crops = []
+        for frame in frames:
+            box = self.zone_set.crop_box(frame.shape) or (0, 0, frame.shape[1], frame.shape[0])
+            crops.append((frame[box[1]:box[3], box[0]:box[2]], box))
+        side = max(max(c.shape[:2]) for c, _ in crops)
+        # Petite zone : entrée du réseau réduite d'autant (multiple de 32)
+        kwargs.setdefault("imgsz", min(getattr(self.model, "imgsz", 640), 32 * math.ceil(side / 32)))
+        results = self.model([c for c, _ in crops], **kwargs)
+
+        out = []
+        for frame, (_, (x1, y1, _, _)), res in zip(frames, crops, results):
+            if res.boxes is not None and len(res.boxes):
+                boxes = res.boxes.data[:, :6].cpu().numpy().astype(np.float32)
+            else:
+                boxes = np.zeros((0, 6), dtype=np.float32)
+            boxes[:, [0, 2]] += x1
+            boxes[:, [1, 3]] += y1
+            if self.zone_set.zones:
+                boxes = boxes[self.zone_set.membership(boxes[:, :4], frame.shape).any(axis=1)]
+            out.append(result_from_cache(frame, boxes, self.names))
+        return out
+
+    def __repr__(self):
+        return f"RoiDetector({self.model!r}, zones={self.zone_set.names}, classes={self.zone_set.classes})"